@@ -1,2 +1,24 @@
-from findhr.monitoring.monitoring import MultipartyFairnessMeasurementMPYC, MultipartyDataHandlerCSV, \
-    ServiceProviderHandlerCSV, MultipartyFairnessMeasurement, MultipartyDataCollection
\ No newline at end of file
+from findhr.monitoring.monitoring import MultipartyDataHandlerCSV, ServiceProviderHandlerCSV, \
+    MultipartyDataHandlerSQLite, ServiceProviderHandlerSQLite, MultipartyDataHandlerSharded, MultipartyFairnessMeasurement, \
+    MultipartyDataCollection
+from findhr.monitoring.share_store import ShareStore
+from findhr.monitoring.sqlite_store import SQLiteShareStore
+from findhr.monitoring.sharded_store import ShardedShareStore
+from findhr.monitoring.journal import ShareJournal
+from findhr.monitoring.result_cache import ResultCache
+from findhr.monitoring.streaming import StreamingFairnessMonitor
+from findhr.monitoring.service import FairnessMonitoringService
+from findhr.monitoring.tracing import Tracer, MeasurementTrace
+
+__all__ = ["MultipartyFairnessMeasurementMPYC", "MultipartyDataHandlerCSV", "ServiceProviderHandlerCSV",
+           "MultipartyDataHandlerSQLite", "ServiceProviderHandlerSQLite", "MultipartyDataHandlerSharded", "MultipartyFairnessMeasurement",
+           "MultipartyDataCollection", "ShareStore", "SQLiteShareStore", "ShardedShareStore", "ShareJournal", "StreamingFairnessMonitor",
+           "ResultCache", "FairnessMonitoringService", "Tracer", "MeasurementTrace"]
+
+
+def __getattr__(name):
+    # the MPC measurement loads the mpyc runtime: it is only imported when first used
+    if name == "MultipartyFairnessMeasurementMPYC":
+        from findhr.monitoring.secure_measurement import MultipartyFairnessMeasurementMPYC
+        return MultipartyFairnessMeasurementMPYC
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,467 @@
+# Loopback benchmark of the secure fairness metrics of MultipartyFairnessMeasurementMPYC.
+#
+#   python -m findhr.monitoring.benchmark --sizes 100 1000 --metrics pool_diversity group_exposure --parties 2
+#
+# The benchmark spawns the mpyc parties as local processes connected over localhost. Every party holds a synthetic
+# share store of the requested size: the protected attributes are drawn from a common seed, and each party keeps its
+# own component of them. For every pool size and metric, it reports the wall-clock time, the number of communication
+# rounds (communication steps of the mpyc runtime: steps running concurrently are counted separately, so this is an upper
+# bound on the round complexity), the number of messages and the bytes exchanged by the parties.
+#
+#   python -m findhr.monitoring.benchmark --sizes 100000 1000000 --shards 1 2 4
+#
+# benchmarks instead the pseudo two-party measurement over a share store split into shards (see sharded_store.py),
+# against the single-process store.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import types
+
+import numpy as np
+
+from findhr.monitoring.monitoring import MultipartyDataCollection, MultipartyFairnessMeasurement, SENSITIVE_ATTRIBUTE_CATALOGUE, REPORT_METRICS
+from findhr.monitoring.share_store import SNAPSHOT_SUFFIX, ShareStore
+from findhr.monitoring.sharded_store import ShardedShareStore
+
+BENCHMARK_PROVIDER_ID = "benchmark"
+
+# The metrics that can be benchmarked: the single-metric methods, and measure_report with all metrics
+BENCHMARK_METRICS = REPORT_METRICS + ("report",)
+
+# Modules that importing findhr.monitoring must not load:
+# they are only needed by the MPC measurement, the decryption of donations, plotting or loading CSV files
+HEAVY_MODULES = ("mpyc", "matplotlib", "scipy", "cryptography", "pandas")
+
+# The metrics that are counted in the shards of a sharded store
+SHARDED_METRICS = ("pool_diversity", "group_exposure", "report")
+
+# Groups measured by the benchmark
+BENCHMARK_GROUP = ("gender", "female")
+BENCHMARK_REPORT_GROUPS = [("gender", "female"), ("gender", "male"), (["gender", "disabled"], ["female", "True"])]
+
+
+def synthetic_attributes(n_users, seed=0):
+    """
+    Draws synthetic protected attributes for n_users users, uniformly over the values of SENSITIVE_ATTRIBUTE_CATALOGUE.
+
+    Returns
+    -------
+    user_ids, attributes : [string], {string: np.ndarray[int64]}
+        The user IDs ('0', '1', ...) and the numerical attribute values for every attribute in the catalogue.
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = [str(user_id) for user_id in range(n_users)]
+    attributes = {attribute_name: rng.choice(sorted(values.values()), size=n_users).astype(np.int64)
+                  for attribute_name, values in SENSITIVE_ATTRIBUTE_CATALOGUE.items()}
+    return user_ids, attributes
+
+
+def synthetic_share_store(n_users, party=0, n_parties=2, seed=0, provider_id=BENCHMARK_PROVIDER_ID):
+    """
+    Builds the share store of one party for synthetic protected attributes (see synthetic_attributes).
+    The components of all parties sum up to twice the attribute value, as for the two-party components generated
+    by MultipartyDataCollection. In a single-party setting the store holds the attribute values themselves.
+
+    Parameters
+    ----------
+    n_users : int
+        The number of users in the store.
+
+    party : int
+        The index of the party whose components are stored.
+
+    n_parties : int
+        The number of parties sharing the attributes.
+
+    seed : int
+        Seed of the attributes and of their split into components. All parties must use the same seed.
+
+    provider_id : string
+        The service provider ID under which the components are stored.
+
+    Returns
+    -------
+    store : ShareStore
+    """
+    user_ids, attributes = synthetic_attributes(n_users, seed)
+    rng = np.random.default_rng([seed, n_parties])
+    store = ShareStore()
+    for attribute_name, values in attributes.items():
+        if n_parties == 1:
+            components = [values]
+        else:
+            others = [rng.integers(-2**40, 2**40, size=n_users) for _ in range(n_parties - 1)]
+            components = [2 * values - sum(others)] + others
+        store.set_many(provider_id, user_ids, attribute_name, components[party])
+    return store
+
+
+def _synthetic_pool_stage(user_ids, seed=0):
+    rng = np.random.default_rng([seed, len(user_ids), 1])
+    targeted = rng.random(len(user_ids)) < 0.5
+    accepted = rng.random(len(user_ids)) < 0.3
+    return [(user_id, bool(t), bool(a)) for user_id, t, a in zip(user_ids, targeted, accepted)]
+
+
+class _TrafficCounter():
+
+    # counts the communication rounds, messages and bytes of this party, by wrapping the sending methods of the mpyc runtime.
+    # The messages of one communication step (an input, an output or an exchange of shares) are labeled by the same
+    # program counter, so a round is counted for every program counter this party sends messages with.
+
+    def __init__(self, mpc):
+        self._mpc = mpc
+        self.messages = 0
+        self._program_counters = set()
+        send_message, exchange_shares = mpc._send_message, mpc._exchange_shares
+
+        def _send_message(peer_pid, data):
+            self.messages += 1
+            self._program_counters.add(mpc._program_counter[0])
+            return send_message(peer_pid, data)
+
+        def _exchange_shares(in_shares):
+            self.messages += len(in_shares) - 1
+            self._program_counters.add(mpc._program_counter[0])
+            return exchange_shares(in_shares)
+
+        mpc._send_message, mpc._exchange_shares = _send_message, _exchange_shares
+
+    @property
+    def rounds(self):
+        return len(self._program_counters)
+
+    @property
+    def bytes(self):
+        return sum(peer.protocol.nbytes_sent for peer in self._mpc.parties if peer.pid != self._mpc.pid)
+
+
+async def _measure(fairness, metric, pool, pool_stage, k):
+    attribute_name, attribute_value = BENCHMARK_GROUP
+    if metric == "pool_diversity":
+        return await fairness.measure_pool_diversity(pool, attribute_name, attribute_value)
+    elif metric == "group_exposure":
+        return await fairness.measure_group_exposure(pool, attribute_name, attribute_value, "inverse_log")
+    elif metric in ("skew", "discounted_rep_diff"):
+        return await fairness.measure_topk_fairness(pool, attribute_name, attribute_value, k, method=metric)
+    elif metric == "accept_rate":
+        return await fairness.measure_accept_rate(pool, pool_stage, attribute_name, attribute_value)
+    elif metric == "report":
+        return await fairness.measure_report(pool, BENCHMARK_REPORT_GROUPS, k=k, pool_stage=pool_stage)
+    else:
+        raise ValueError(f"Unsupported benchmark metric: {metric}")
+
+
+async def run_party(sizes, metrics, k=10, repeats=1, batched=True, seed=0):
+    """
+    Runs the benchmark as one of the mpyc parties (the party setup is taken from the mpyc command line options).
+
+    Returns
+    -------
+    results : [dict]
+        One record per pool size, metric and repetition, with the time, rounds, messages and bytes measured by this party.
+    """
+    # the MPC measurement and the mpyc runtime are only imported by the parties
+    from mpyc.runtime import mpc
+    from findhr.monitoring.secure_measurement import MultipartyFairnessMeasurementMPYC
+
+    await mpc.start()
+    traffic = _TrafficCounter(mpc)
+    n_parties = len(mpc.parties)
+
+    results = []
+    for size in sizes:
+        handler = MultipartyDataCollection()
+        handler.local_data = synthetic_share_store(size, mpc.pid, n_parties, seed)
+        fairness = MultipartyFairnessMeasurementMPYC(BENCHMARK_PROVIDER_ID, handler, batched=batched)
+        pool = handler.local_data.users(BENCHMARK_PROVIDER_ID)
+        pool_stage = _synthetic_pool_stage(pool, seed)
+
+        for metric in metrics:
+            for repeat in range(repeats):
+                await mpc.barrier(f"{metric}-{size}-{repeat}")
+                start, start_rounds, start_messages, start_bytes = time.perf_counter(), traffic.rounds, traffic.messages, traffic.bytes
+                await _measure(fairness, metric, pool, pool_stage, k)
+                results.append({"party": mpc.pid, "parties": n_parties, "size": size, "metric": metric, "repeat": repeat,
+                                 "seconds": time.perf_counter() - start,
+                                 "rounds": traffic.rounds - start_rounds,
+                                 "messages": traffic.messages - start_messages,
+                                 "bytes": traffic.bytes - start_bytes})
+
+    await mpc.shutdown()
+    return results
+
+
+def _free_base_port(n_parties):
+    # a base port such that base_port, ..., base_port + n_parties - 1 are free on localhost
+    while True:
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            base_port = s.getsockname()[1]
+        if base_port + n_parties > 65535:
+            continue
+        try:
+            sockets = []
+            for port in range(base_port, base_port + n_parties):
+                sockets.append(socket.socket())
+                sockets[-1].bind(("localhost", port))
+            return base_port
+        except OSError:
+            continue
+        finally:
+            for s in sockets:
+                s.close()
+
+
+def _subprocess_environment():
+    # the environment of the processes spawned by the benchmark, which import this package
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+
+
+def run_loopback(sizes, metrics=BENCHMARK_METRICS, n_parties=2, k=10, repeats=1, batched=True, seed=0, timeout=None):
+    """
+    Runs the benchmark with n_parties mpyc parties, each in its own process, connected over localhost.
+
+    Parameters
+    ----------
+    sizes : [int]
+        The pool sizes to benchmark (every user of the synthetic store is in the pool).
+
+    metrics : [string], optional
+        The metrics to benchmark, from BENCHMARK_METRICS.
+
+    n_parties : int, optional
+        The number of mpyc parties (default 2).
+
+    k : int, optional
+        The cutoff rank of the top-k metrics.
+
+    repeats : int, optional
+        The number of times each measurement is repeated.
+
+    batched : bool, optional
+        Whether to use the batched mode of MultipartyFairnessMeasurementMPYC.
+
+    seed : int, optional
+        Seed of the synthetic data.
+
+    timeout : float, optional
+        Maximum number of seconds to wait for the parties.
+
+    Returns
+    -------
+    results : [dict]
+        One record per pool size and metric: the median wall-clock time over the repetitions (slowest party),
+        the number of communication rounds and of messages of the busiest party, and the total number of bytes sent by all parties.
+    """
+    for metric in metrics:
+        if metric not in BENCHMARK_METRICS:
+            raise ValueError(f"Unsupported benchmark metric: {metric}")
+
+    env = _subprocess_environment()
+    base_port = _free_base_port(n_parties)
+    arguments = ["--party", "--sizes", *map(str, sizes), "--metrics", *metrics, "--k", str(k),
+                 "--repeats", str(repeats), "--seed", str(seed)] + ([] if batched else ["--unbatched"])
+
+    processes = [subprocess.Popen([sys.executable, "-m", "findhr.monitoring.benchmark",
+                                   "-M", str(n_parties), "-I", str(party), "-B", str(base_port), "--no-log", *arguments],
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+                 for party in range(n_parties)]
+    records = []
+    try:
+        for party, process in enumerate(processes):
+            stdout, stderr = process.communicate(timeout=timeout)
+            if process.returncode:
+                raise RuntimeError(f"Benchmark party {party} failed:\n{stderr}")
+            records.extend(json.loads(line) for line in stdout.splitlines() if line.startswith("{"))
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+
+    results = []
+    for size in sizes:
+        for metric in metrics:
+            measured = [record for record in records if record["size"] == size and record["metric"] == metric]
+            seconds = [max(record["seconds"] for record in measured if record["repeat"] == repeat) for repeat in range(repeats)]
+            results.append({"parties": n_parties, "size": size, "metric": metric, "batched": batched,
+                            "seconds": statistics.median(seconds),
+                            "rounds": max(record["rounds"] for record in measured) if measured else 0,
+                            "messages": max(record["messages"] for record in measured) if measured else 0,
+                            "bytes": sum(record["bytes"] for record in measured) // repeats})
+    return results
+
+
+def run_sharded(sizes, shard_counts, metrics=SHARDED_METRICS, repeats=1, seed=0):
+    """
+    Benchmarks the pseudo two-party measurement over a share store split into shards, against the single-process store.
+    The third party holds the first component of synthetic attributes (see synthetic_share_store), and the pool
+    carries the second component. The measurements over the sharded stores must equal the single-process ones.
+
+    Parameters
+    ----------
+    sizes : [int]
+        The pool sizes (the store holds as many users as the pool).
+
+    shard_counts : [int]
+        The numbers of shards.
+
+    metrics : [string], optional
+        The metrics to measure, among SHARDED_METRICS ("report": pool diversity and group exposure of BENCHMARK_REPORT_GROUPS).
+
+    repeats : int, optional
+        The repetitions of each measurement (the median time is reported).
+
+    seed : int, optional
+        Seed of the synthetic data.
+
+    Returns
+    -------
+    results : [dict]
+        One record per number of shards (0 for the single-process store), size and metric, with the median time in seconds
+        and the speedup over the single-process store.
+    """
+    results = []
+    for size in sizes:
+        local_store = synthetic_share_store(size, 0, 2, seed)
+        remote_store = synthetic_share_store(size, 1, 2, seed)
+        user_ids = [str(user_id) for user_id in range(size)]
+        remote_secrets = remote_store.gather_many(BENCHMARK_PROVIDER_ID, user_ids, list(SENSITIVE_ATTRIBUTE_CATALOGUE))
+        pool = [(user_id, {attribute_name: int(secrets[0][idx]) for attribute_name, secrets in remote_secrets.items()})
+                for idx, user_id in enumerate(user_ids)]
+
+        # the shards load their partitions from a snapshot of the local store
+        snapshot_dir = tempfile.TemporaryDirectory()
+        snapshot_filename = os.path.join(snapshot_dir.name, "local" + SNAPSHOT_SUFFIX)
+        if shard_counts:
+            local_store.to_snapshot(snapshot_filename)
+
+        single_seconds, expected = {}, {}
+        for n_shards in [0] + list(shard_counts):
+            store = local_store if n_shards == 0 else ShardedShareStore(n_shards, snapshot_filename)
+            fairness = MultipartyFairnessMeasurement(BENCHMARK_PROVIDER_ID, types.SimpleNamespace(local_data=store, result_caches=()))
+            for metric in metrics:
+                seconds = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    if metric == "report":
+                        value = fairness.measure_report(pool, BENCHMARK_REPORT_GROUPS, metrics=("pool_diversity", "group_exposure"))
+                        value = [v for group_report in value.values() for v in group_report.values()]
+                    elif metric == "pool_diversity":
+                        value = [fairness.measure_pool_diversity(pool, *BENCHMARK_GROUP)]
+                    else:
+                        value = [fairness.measure_group_exposure(pool, *BENCHMARK_GROUP, "inverse_log")]
+                    seconds.append(time.perf_counter() - start)
+                if n_shards == 0:
+                    single_seconds[metric], expected[metric] = statistics.median(seconds), value
+                elif not np.allclose(value, expected[metric], rtol=0, atol=1e-12):
+                    raise RuntimeError(f"Sharded {metric} differs from the single-process store: {value} != {expected[metric]}")
+                results.append({"shards": n_shards, "size": size, "metric": metric, "seconds": statistics.median(seconds),
+                                "speedup": single_seconds[metric] / statistics.median(seconds)})
+            if n_shards:
+                store.close()
+        snapshot_dir.cleanup()
+    return results
+
+
+def measure_import_time(module="findhr.monitoring", repeats=5):
+    """
+    Measures the time to import a module in a fresh interpreter, and which heavy dependencies the import loads.
+
+    Parameters
+    ----------
+    module : string, optional
+        The module to import (default findhr.monitoring).
+
+    repeats : int, optional
+        The number of fresh interpreters the import is timed in.
+
+    Returns
+    -------
+    seconds, loaded : float, [string]
+        The fastest import time, and the modules of HEAVY_MODULES that were loaded by the import.
+    """
+    code = (f"import json, sys, time\n"
+            f"start = time.perf_counter()\n"
+            f"import {module}\n"
+            f"seconds = time.perf_counter() - start\n"
+            f"print(json.dumps([seconds, [name for name in {list(HEAVY_MODULES)!r} if name in sys.modules]]))\n")
+    times = []
+    for _ in range(repeats):
+        process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_subprocess_environment())
+        if process.returncode:
+            raise RuntimeError(f"Import of {module} failed:\n{process.stderr}")
+        seconds, loaded = json.loads(process.stdout.splitlines()[-1])
+        times.append(seconds)
+    return min(times), loaded
+
+
+def _parse_arguments(argv=None):
+    # NB: in the parties, the mpyc runtime has already consumed its own command line options (e.g. -M, -I), see main
+    parser = argparse.ArgumentParser(description="Loopback benchmark of the secure fairness metrics.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000], help="pool sizes")
+    parser.add_argument("--metrics", nargs="+", default=list(BENCHMARK_METRICS), choices=BENCHMARK_METRICS, help="metrics")
+    parser.add_argument("--parties", type=int, default=2, help="number of mpyc parties")
+    parser.add_argument("--k", type=int, default=10, help="cutoff rank of the top-k metrics")
+    parser.add_argument("--repeats", type=int, default=1, help="repetitions of each measurement")
+    parser.add_argument("--unbatched", action="store_true", help="secret share the attributes one by one")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--shards", type=int, nargs="+",
+                        help="benchmark the pseudo two-party measurement over a store split into these numbers of shards")
+    parser.add_argument("--import-time", action="store_true",
+                        help="only measure the time to import findhr.monitoring; fails if it loads a heavy dependency")
+    parser.add_argument("--import-budget", type=float, help="with --import-time, fail if the import takes longer (seconds)")
+    parser.add_argument("--party", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    if "--party" in (sys.argv[1:] if argv is None else argv):
+        # the mpyc runtime consumes its own command line options (e.g. -M, -I) when it is imported
+        from mpyc.runtime import mpc
+    args = _parse_arguments(argv)
+    if args.party:
+        results = mpc.run(run_party(args.sizes, args.metrics, args.k, args.repeats, not args.unbatched, args.seed))
+        for record in results:
+            print(json.dumps(record))
+        return
+
+    if args.import_time:
+        seconds, loaded = measure_import_time()
+        print(f"import findhr.monitoring: {seconds:.3f} s, heavy modules loaded: {', '.join(loaded) or 'none'}")
+        if loaded or (args.import_budget is not None and seconds > args.import_budget):
+            sys.exit(1)
+        return
+
+    if args.shards:
+        metrics = [metric for metric in args.metrics if metric in SHARDED_METRICS] or list(SHARDED_METRICS)
+        results = run_sharded(args.sizes, args.shards, metrics, args.repeats, args.seed)
+        print(f"{'shards':>7} {'size':>8} {'metric':<20} {'seconds':>10} {'speedup':>8}")
+        for result in results:
+            print(f"{result['shards']:>7} {result['size']:>8} {result['metric']:<20} {result['seconds']:>10.3f} {result['speedup']:>8.2f}")
+        if args.json:
+            with open(args.json, "w") as f_out:
+                json.dump(results, f_out, indent=2)
+        return
+
+    results = run_loopback(args.sizes, args.metrics, args.parties, args.k, args.repeats, not args.unbatched, args.seed)
+    print(f"{'parties':>7} {'size':>8} {'metric':<20} {'seconds':>10} {'rounds':>7} {'messages':>9} {'bytes':>12}")
+    for result in results:
+        print(f"{result['parties']:>7} {result['size']:>8} {result['metric']:<20} {result['seconds']:>10.3f} "
+              f"{result['rounds']:>7} {result['messages']:>9} {result['bytes']:>12}")
+    if args.json:
+        with open(args.json, "w") as f_out:
+            json.dump(results, f_out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# Compiled protected attribute catalogues.
+# A catalogue {attribute_name: {attribute_value: code}} is validated and encoded once, and the groups measured on it
+# are compiled into hashable group specifications that are cached, so that repeated measurements of the same groups
+# skip all validation and catalogue lookups.
+import itertools
+
+import numpy as np
+
+from findhr.monitoring import metrics as fairness_metrics
+
+_compiled_catalogues = {}
+
+
+class GroupSpec():
+
+    """
+    A validated, immutable and hashable protected group: one value for each of one or more attributes
+    (several attributes define an intersectional group).
+    A group specification unpacks as the pair (attribute_names, attribute_values), so it can be passed wherever
+    a group is given as a pair, e.g., measure_pool_diversity(pool, *group).
+
+    Attributes
+    ----------
+    attribute_names : (string)
+        The names of the attributes.
+
+    attribute_values : (string)
+        The values of the attributes, in the same order.
+
+    attribute_codes : (int)
+        The numerical codes of the values in the catalogue, in the same order.
+    """
+
+    __slots__ = ("attribute_names", "attribute_values", "attribute_codes", "_hash")
+
+    def __init__(self, attribute_names, attribute_values, attribute_codes):
+        self.attribute_names = tuple(attribute_names)
+        self.attribute_values = tuple(attribute_values)
+        self.attribute_codes = tuple(int(attribute_code) for attribute_code in attribute_codes)
+        self._hash = hash((self.attribute_names, self.attribute_values, self.attribute_codes))
+
+
+    def __iter__(self):
+        return iter((self.attribute_names, self.attribute_values))
+
+
+    def __eq__(self, other):
+        return isinstance(other, GroupSpec) and (self.attribute_names, self.attribute_values, self.attribute_codes) == \
+            (other.attribute_names, other.attribute_values, other.attribute_codes)
+
+
+    def __hash__(self):
+        return self._hash
+
+
+    def __repr__(self):
+        return f"GroupSpec({self.attribute_names!r}, {self.attribute_values!r})"
+
+
+    def mask(self, doubled_attributes, size):
+        """
+        Boolean array marking the pool members of the group, see metrics.group_mask.
+        """
+        return fairness_metrics.group_mask(doubled_attributes, self.attribute_names, self.attribute_codes, size)
+
+
+class CompiledCatalogue():
+
+    """
+    A protected attribute catalogue, validated and encoded once.
+
+    Attributes
+    ----------
+    attribute_names : (string)
+        The attributes of the catalogue.
+
+    attribute_values : {string: (string)}
+        The values of every attribute.
+
+    attribute_codes : {string: np.ndarray[int]}
+        The numerical codes of the values of every attribute, in the same order (read-only arrays).
+    """
+
+    def __init__(self, catalogue, encode=None):
+        """
+        Parameters
+        ----------
+        catalogue : {string: {string: int}}
+            The catalogue, e.g., SENSITIVE_ATTRIBUTE_CATALOGUE.
+
+        encode : callable, optional
+            A function (attribute_name, attribute_value) -> code replacing the codes of the catalogue,
+            e.g., a reimplemented _get_num_attribute_value.
+        """
+        self.attribute_names = tuple(catalogue)
+        self.attribute_values = {attribute_name: tuple(values) for attribute_name, values in catalogue.items()}
+        self._codes = {}
+        self.attribute_codes = {}
+        for attribute_name, values in catalogue.items():
+            codes = {attribute_value: int(encode(attribute_name, attribute_value) if encode else code)
+                     for attribute_value, code in values.items()}
+            self._codes[attribute_name] = codes
+            self.attribute_codes[attribute_name] = np.array(list(codes.values()), dtype=np.int64)
+            self.attribute_codes[attribute_name].flags.writeable = False
+        self._key = tuple((attribute_name, tuple(codes.items())) for attribute_name, codes in self._codes.items())
+        self._groups = {}
+
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledCatalogue) and self._key == other._key
+
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+    def code(self, attribute_name, attribute_value):
+        """
+        The numerical code of an attribute value.
+        """
+        return self._codes[attribute_name][attribute_value]
+
+
+    def group(self, attribute_names, attribute_values):
+        """
+        Validates a group and returns its (cached) specification.
+
+        Parameters
+        ----------
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute of the group.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order.
+
+        Returns
+        -------
+        group : GroupSpec
+        """
+        if isinstance(attribute_names, GroupSpec):
+            return attribute_names
+        if not isinstance(attribute_names, list) and not isinstance(attribute_names, tuple):
+            attribute_names = [attribute_names]
+        if not isinstance(attribute_values, list) and not isinstance(attribute_values, tuple):
+            attribute_values = [attribute_values]
+        key = (tuple(attribute_names), tuple(attribute_values))
+        group = self._groups.get(key)
+        if group is not None:
+            return group
+
+        assert len(attribute_names) == len(attribute_values), "Number of attribute names must be equal to the number of values"
+        for attribute_name, attribute_value in zip(attribute_names, attribute_values):
+            assert attribute_name in self._codes, f"Attribute '{attribute_name}' not in catalogue"
+            assert attribute_value in self._codes[attribute_name], f"Value '{attribute_value}' not valid for attribute '{attribute_name}'"
+
+        group = GroupSpec(attribute_names, attribute_values,
+                          [self._codes[attribute_name][attribute_value] for attribute_name, attribute_value in zip(*key)])
+        self._groups[key] = group
+        return group
+
+
+    def groups(self, attribute_names):
+        """
+        The specifications of all (intersectional) groups over the given attributes: one group for every combination
+        of their values, in catalogue order.
+        """
+        if not isinstance(attribute_names, list) and not isinstance(attribute_names, tuple):
+            attribute_names = [attribute_names]
+        for attribute_name in attribute_names:
+            assert attribute_name in self._codes, f"Attribute '{attribute_name}' not in catalogue"
+        return [self.group(attribute_names, attribute_values)
+                for attribute_values in itertools.product(*(self.attribute_values[attribute_name] for attribute_name in attribute_names))]
+
+
+def compile_catalogue(catalogue, encode=None):
+    """
+    Compiles a catalogue (see CompiledCatalogue). Catalogues with the same codes share one compiled catalogue,
+    and so the cache of their group specifications.
+    """
+    compiled = CompiledCatalogue(catalogue, encode)
+    if encode is not None:
+        return compiled
+    return _compiled_catalogues.setdefault(compiled._key, compiled)
@@ -0,0 +1,146 @@
+# Hybrid RSA + AES-GCM envelopes carrying many attribute donations.
+# A single RSA-OAEP decryption unwraps the AES key of the envelope, and the donations are then decrypted chunk by chunk,
+# so that large envelopes can be decoded while they are being read.
+#
+# An envelope is a sequence of lines:
+#   - a header, the JSON object {"version": 1, "key": <RSA-OAEP (SHA-256) encrypted 256-bit AES key>, "nonce": <8 random bytes>},
+#   - one line per chunk, the AES-GCM encryption of a JSON list of donations (as in store_encrypted_data).
+# Binary fields are base64-encoded. Chunk i is encrypted with the nonce (nonce || i), as a 4-byte big-endian integer,
+# and authenticates whether it is the last chunk, so that reordered, dropped or truncated chunks are detected.
+import base64
+import json
+import os
+
+ENVELOPE_VERSION = 1
+
+# number of donations per chunk
+CHUNK_SIZE = 256
+
+_NONCE_PREFIX_SIZE = 8
+_MAX_CHUNKS = 2**32
+_LAST_CHUNK, _NEXT_CHUNK = b"last", b"next"
+
+
+def _oaep():
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives import hashes
+    return padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+
+
+def _chunk_nonce(nonce_prefix, index):
+    return nonce_prefix + index.to_bytes(4, "big")
+
+
+def seal_envelope(donations, public_key, chunk_size=CHUNK_SIZE):
+    """
+    Encrypts a batch of donations into an envelope, e.g., for back-end distribution of the secret components.
+
+    Parameters
+    ----------
+    donations : [dict]
+        The donations, dictionaries {"providerId": ..., "userId": ..., attribute_name: secret_value, ...}.
+
+    public_key : RSAPublicKey
+        The public key of the receiving party.
+
+    chunk_size : int, optional
+        The number of donations per chunk (default CHUNK_SIZE).
+
+    Returns
+    -------
+    envelope : [string]
+        The lines of the envelope.
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    assert chunk_size > 0, "The chunk size must be positive"
+    donations = list(donations)
+    aes_key = AESGCM.generate_key(bit_length=256)
+    nonce_prefix = os.urandom(_NONCE_PREFIX_SIZE)
+    header = {"version": ENVELOPE_VERSION,
+              "key": base64.b64encode(public_key.encrypt(aes_key, _oaep())).decode("ascii"),
+              "nonce": base64.b64encode(nonce_prefix).decode("ascii")}
+
+    aesgcm = AESGCM(aes_key)
+    starts = range(0, max(len(donations), 1), chunk_size)
+    assert len(starts) <= _MAX_CHUNKS, "Too many chunks for a single envelope"
+    lines = [json.dumps(header)]
+    for index, start in enumerate(starts):
+        plaintext = json.dumps(donations[start:start + chunk_size]).encode("utf-8")
+        associated_data = _LAST_CHUNK if index == len(starts) - 1 else _NEXT_CHUNK
+        ciphertext = aesgcm.encrypt(_chunk_nonce(nonce_prefix, index), plaintext, associated_data)
+        lines.append(base64.b64encode(ciphertext).decode("ascii"))
+    return lines
+
+
+def open_envelope(envelope, private_key):
+    """
+    Streaming decoder of envelopes: yields the donations of an envelope as its chunks are read and authenticated.
+
+    Parameters
+    ----------
+    envelope : string | bytes | iterable of string | bytes
+        The whole envelope, or its lines (e.g., a file opened for reading, or the lines of an HTTP request body).
+
+    private_key : RSAPrivateKey
+        The private key of the receiving party.
+
+    Yields
+    ------
+    donation : dict
+        The decrypted donations, in order.
+
+    Raises
+    ------
+    ValueError
+        If the envelope is malformed, if a chunk does not authenticate, or if the envelope is truncated.
+        The donations yielded before the error belong to authentic chunks, but the envelope as a whole is not valid.
+    """
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    if isinstance(envelope, (str, bytes)):
+        envelope = envelope.splitlines()
+    lines = (line.strip() for line in envelope)
+    lines = (line for line in lines if line)
+
+    try:
+        header = json.loads(next(lines))
+    except StopIteration:
+        raise ValueError("Empty envelope")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid envelope header: {str(e)}")
+    if not isinstance(header, dict) or header.get("version") != ENVELOPE_VERSION:
+        raise ValueError("Unsupported envelope version")
+
+    try:
+        aes_key = private_key.decrypt(base64.b64decode(header["key"]), _oaep())
+        nonce_prefix = base64.b64decode(header["nonce"])
+    except Exception as e:
+        raise ValueError(f"Key decryption failed: {str(e)}")
+    if len(nonce_prefix) != _NONCE_PREFIX_SIZE:
+        raise ValueError("Invalid envelope nonce")
+
+    aesgcm = AESGCM(aes_key)
+    last = False
+    for index, line in enumerate(lines):
+        if last:
+            raise ValueError("Chunks after the last chunk of the envelope")
+        if index >= _MAX_CHUNKS:
+            raise ValueError("Too many chunks in the envelope")
+        ciphertext = base64.b64decode(line)
+        try:
+            plaintext = aesgcm.decrypt(_chunk_nonce(nonce_prefix, index), ciphertext, _NEXT_CHUNK)
+        except InvalidTag:
+            try:
+                plaintext = aesgcm.decrypt(_chunk_nonce(nonce_prefix, index), ciphertext, _LAST_CHUNK)
+            except InvalidTag:
+                raise ValueError(f"Chunk {index} of the envelope failed authentication")
+            last = True
+        donations = json.loads(plaintext.decode("utf-8"))
+        if not isinstance(donations, list):
+            raise ValueError(f"Chunk {index} of the envelope is not a list of donations")
+        yield from donations
+
+    if not last:
+        raise ValueError("Truncated envelope")
@@ -0,0 +1,56 @@
+# Stable fingerprints of measurement requests.
+# Two requests with the same method, pool, groups and parameters get the same fingerprint, in any process and session,
+# so identical requests can be recognized (e.g., coalesced while they run, or answered from a cache).
+import hashlib
+import struct
+
+import numpy as np
+
+from findhr.monitoring.catalogue import GroupSpec
+
+
+def _update(digest, value):
+    # canonical, type-tagged encoding of nested request arguments
+    if value is None or isinstance(value, (bool, np.bool_)):
+        digest.update(b"b" + repr(None if value is None else bool(value)).encode())
+    elif isinstance(value, (int, np.integer)):
+        digest.update(b"i" + str(int(value)).encode() + b";")
+    elif isinstance(value, (float, np.floating)):
+        digest.update(b"f" + struct.pack("<d", float(value)))
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        digest.update(b"s" + str(len(encoded)).encode() + b":" + encoded)
+    elif isinstance(value, GroupSpec):
+        digest.update(b"g")
+        _update(digest, tuple(value))
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest.update(b"a" + array.dtype.str.encode() + repr(array.shape).encode())
+        digest.update(array.tobytes() if array.dtype != object else repr(array.tolist()).encode())
+    elif isinstance(value, dict):
+        digest.update(b"d" + str(len(value)).encode() + b":")
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"l" + str(len(value)).encode() + b":")
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(b"r" + repr(value).encode())
+
+
+def request_fingerprint(*parts):
+    """
+    Stable hash of the arguments of a measurement request (e.g., provider ID, method, pool, groups and parameters).
+    Lists and tuples hash alike, dictionaries are hashed independently of their order, and NumPy arrays by their content.
+
+    Returns
+    -------
+    fingerprint : string
+        A hexadecimal BLAKE2b digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
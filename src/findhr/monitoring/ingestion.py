@@ -0,0 +1,159 @@
+# Bulk ingestion of encrypted attribute donations.
+# RSA private key operations are CPU-bound, so large batches of donations are decrypted across a pool of processes.
+# The private key is handed to the workers once, as PEM bytes, when they start.
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+# fields of a donation that are not protected attribute components
+DONATION_ID_FIELDS = ("providerId", "userId")
+
+# batches smaller than this are decrypted in the calling process: starting workers would cost more than it saves
+MIN_PARALLEL_BATCH = 64
+
+_worker_private_key = None
+
+
+def decrypt_payload(encrypted_data, private_key):
+    """
+    RSA decryption (OAEP with SHA-256) of a base64-encoded donation, and decoding to dictionary.
+    """
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives import hashes
+
+    decoded_data = base64.b64decode(encrypted_data)
+    decrypted_data = private_key.decrypt(
+        decoded_data,
+        padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    )
+    return json.loads(decrypted_data.decode('utf-8'))
+
+
+def validate_donation(data_dict):
+    """
+    Checks the format of a decrypted donation.
+
+    Returns
+    -------
+    donation, error : (string, string, {string: int}) | None, string | None
+        The provider ID, user ID and secret components of the donation, or an error message.
+    """
+    if not isinstance(data_dict, dict):
+        return None, "Invalid data format"
+
+    provider_id = data_dict.get("providerId")
+    user_id = data_dict.get("userId")
+    if not provider_id or not user_id:
+        return None, "Invalid data format"
+
+    components = {}
+    for attribute_name, secret_value in data_dict.items():
+        if attribute_name in DONATION_ID_FIELDS:
+            continue
+        try:
+            if isinstance(secret_value, (bool, float)):
+                raise ValueError
+            secret_value = int(secret_value)
+        except (TypeError, ValueError):
+            return None, f"Invalid secret value for attribute '{attribute_name}'"
+        if not -2**63 <= secret_value < 2**63:
+            return None, f"Secret value out of range for attribute '{attribute_name}'"
+        components[attribute_name] = secret_value
+    return (str(provider_id), str(user_id), components), None
+
+
+def _decrypt_and_validate(encrypted_data, decrypt, private_key):
+    try:
+        data_dict = decrypt(encrypted_data, private_key)
+    except Exception as e:
+        return None, f"Decryption failed: {str(e)}"
+    return validate_donation(data_dict)
+
+
+def _init_worker(private_key_pem):
+    global _worker_private_key
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    _worker_private_key = load_pem_private_key(private_key_pem, password=None)
+
+
+def _decrypt_in_worker(encrypted_data):
+    return _decrypt_and_validate(encrypted_data, decrypt_payload, _worker_private_key)
+
+
+def decrypt_donations(encrypted_payloads, private_key, workers=None, decrypt=None):
+    """
+    Decrypts and validates a batch of encrypted donations.
+
+    Parameters
+    ----------
+    encrypted_payloads : [string | bytes]
+        The base64-encoded, RSA-encrypted donations, as received from the donation frontend.
+
+    private_key : RSAPrivateKey
+        The private key of the receiving party.
+
+    workers : int, optional
+        The number of worker processes (default: the number of CPUs). With workers=1, or for small batches,
+        the donations are decrypted in the calling process.
+
+    decrypt : callable, optional
+        A replacement of decrypt_payload (e.g., a reimplemented decrypt_data of a handler).
+        Custom decryption functions are always run in the calling process.
+
+    Returns
+    -------
+    results : [((string, string, {string: int}) | None, string | None)]
+        For every payload, in order, the validated donation (see validate_donation) or an error message.
+    """
+    encrypted_payloads = list(encrypted_payloads)
+    workers = workers or os.cpu_count() or 1
+
+    if decrypt is not None or workers == 1 or len(encrypted_payloads) < MIN_PARALLEL_BATCH:
+        decrypt = decrypt or decrypt_payload
+        return [_decrypt_and_validate(encrypted_data, decrypt, private_key) for encrypted_data in encrypted_payloads]
+
+    from cryptography.hazmat.primitives import serialization
+    private_key_pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                                serialization.NoEncryption())
+    chunksize = max(1, len(encrypted_payloads) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(private_key_pem,)) as executor:
+        return list(executor.map(_decrypt_in_worker, encrypted_payloads, chunksize=chunksize))
+
+
+def merge_donations(store, donations, journal=None):
+    """
+    Stores validated donations, with one vectorized write per provider and attribute.
+    Later donations overwrite earlier components of the same user, as with consecutive calls of store.
+
+    Parameters
+    ----------
+    store : ShareStore
+        The store of the local secret components.
+
+    donations : [(string, string, {string: int})]
+        Validated donations, see validate_donation.
+
+    journal : ShareJournal, optional
+        The write-ahead log to append the components to.
+    """
+    columns = {}
+    for provider_id, user_id, components in donations:
+        for attribute_name, secret_value in components.items():
+            # dictionaries keep the last component of every user
+            columns.setdefault((provider_id, attribute_name), {})[user_id] = secret_value
+            if journal is not None:
+                journal.append(provider_id, user_id, attribute_name, secret_value)
+
+    for (provider_id, attribute_name), column in columns.items():
+        store.set_many(provider_id, list(column.keys()), attribute_name, list(column.values()))
+
+
+def donation_users(donations):
+    """
+    The users of validated donations, as a dictionary {provider_id: [user_id]}.
+    """
+    users = {}
+    for provider_id, user_id, _ in donations:
+        users.setdefault(provider_id, {})[user_id] = None
+    return {provider_id: list(user_ids) for provider_id, user_ids in users.items()}
@@ -0,0 +1,155 @@
+# Confidence intervals for fairness metrics measured on many groups at once.
+# Everything here is vectorized over the groups and does not depend on any plotting library (see plotting.py).
+from concurrent.futures import ThreadPoolExecutor
+import os
+from statistics import NormalDist
+import warnings
+
+import numpy as np
+
+# Rate metrics that can be bootstrapped by name
+BOOTSTRAP_METRICS = ("pool_diversity", "accept_rate")
+
+
+def _z_score(confidence):
+    return NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+
+
+def confidence_intervals(p, n, N=None, confidence=0.95, method="wald"):
+    """
+    Confidence intervals of rates (e.g., pool diversity or accept rates) of many groups.
+
+    Parameters
+    ----------
+    p : array_like[float]
+        The measured rate of every group.
+
+    n : array_like[int]
+        The sample size the rate of every group was measured on.
+
+    N : array_like[int], optional
+        (Optional) The size of the population of every group. If given, the finite population correction
+        sqrt((N - n) / (N - 1)) is applied.
+
+    confidence : float, optional
+        The confidence level (default 0.95).
+
+    method : string, optional
+        The interval. Supported options:
+            - "wald" : p +/- z * SE (default)
+            - "wilson" : the Wilson score interval, which stays within [0, 1] and behaves well for rates close to 0 or 1
+              and for small samples (with the finite population correction, n is replaced by the effective sample size)
+
+    Returns
+    -------
+    lower, upper, standard_error : np.ndarray[float], np.ndarray[float], np.ndarray[float]
+        The bounds of the intervals and the (Wald) standard error of every rate.
+    """
+    p = np.asarray(p, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    if not (p.shape == n.shape and (N is None or np.shape(N) == p.shape)):
+        raise ValueError("Lengths of p, n, and N (if provided) must be equal")
+
+    z_score = _z_score(confidence)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fpc = np.sqrt((np.asarray(N, dtype=np.float64) - n) / (np.asarray(N, dtype=np.float64) - 1)) if N is not None else 1.0
+        standard_error = np.sqrt(p * (1 - p) / n) * fpc
+
+        if method == "wald":
+            return p - z_score * standard_error, p + z_score * standard_error, standard_error
+        elif method == "wilson":
+            n_effective = n / fpc**2
+            z2_n = z_score**2 / n_effective
+            center = (p + z2_n / 2) / (1 + z2_n)
+            half_width = z_score / (1 + z2_n) * np.sqrt(p * (1 - p) / n_effective + z2_n / (4 * n_effective))
+            return np.clip(center - half_width, 0, 1), np.clip(center + half_width, 0, 1), standard_error
+        else:
+            raise ValueError(f"Unsupported confidence interval method: {method}")
+
+
+def _resample_counts(seed, batch_size, size, dtype):
+    # bootstrap resamples of a pool as the number of times every member is drawn, one row per resample
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, size, size=(batch_size, size)) + size * np.arange(batch_size)[:, None]
+    return np.bincount(draws.ravel(), minlength=batch_size * size).reshape(batch_size, size).astype(dtype)
+
+
+def bootstrap_confidence_intervals(metric, masks, targeted=None, accepted=None, n_resamples=1000, confidence=0.95,
+                                   seed=None, workers=None, batch_size=64):
+    """
+    Percentile bootstrap confidence intervals of a metric for many groups.
+    The pool is resampled with replacement; every resample is shared by all groups.
+
+    Parameters
+    ----------
+    metric : string or callable
+        The metric to bootstrap:
+            - "pool_diversity" : the fraction of the pool in every group
+            - "accept_rate" : the fraction of targeted group members who are accepted (requires targeted and accepted)
+            - a function f(masks, targeted, accepted, weights) returning the metric of every group, where weights holds
+              the number of times each pool member is drawn in the resample
+        The named metrics are computed for a whole batch of resamples with one matrix product.
+
+    masks : array_like[bool]
+        A (groups x pool size) matrix marking the members of every group, e.g., from group_mask.
+
+    targeted, accepted : array_like[bool], optional
+        The stage of every pool member, for "accept_rate" (see stage_flags).
+
+    n_resamples : int, optional
+        The number of bootstrap resamples (default 1000).
+
+    confidence : float, optional
+        The confidence level (default 0.95).
+
+    seed : int, optional
+        Seed of the resampling. The result does not depend on the number of workers.
+
+    workers : int, optional
+        The number of threads evaluating batches of resamples (default: the number of CPUs).
+
+    batch_size : int, optional
+        The number of resamples evaluated together.
+
+    Returns
+    -------
+    lower, upper : np.ndarray[float], np.ndarray[float]
+        The bounds of the interval of every group (nan if the metric is undefined in every resample).
+    """
+    masks = np.atleast_2d(np.asarray(masks, dtype=bool))
+    size = masks.shape[1]
+    if size == 0:
+        return np.full(len(masks), np.nan), np.full(len(masks), np.nan)
+
+    # the products of resample counts and 0/1 masks are sums of integers up to the pool size: single precision is exact below 2**24
+    dtype = np.float32 if size < 2**24 else np.float64
+    if metric == "pool_diversity":
+        numerators, denominators = masks.T.astype(dtype), None
+    elif metric == "accept_rate":
+        assert targeted is not None and accepted is not None, "The accept rate requires the targeted and accepted flags"
+        targeted, accepted = np.asarray(targeted, dtype=bool), np.asarray(accepted, dtype=bool)
+        numerators = (masks & (targeted & accepted)).T.astype(dtype)
+        denominators = (masks & targeted).T.astype(dtype)
+    elif not callable(metric):
+        raise ValueError(f"Unsupported bootstrap metric: {metric}")
+
+    def evaluate(batch_seed, batch_size):
+        weights = _resample_counts(batch_seed, batch_size, size, np.float64 if callable(metric) else dtype)
+        if callable(metric):
+            return np.array([metric(masks, targeted, accepted, w) for w in weights], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if denominators is None:
+                return (weights @ numerators).astype(np.float64) / size
+            return (weights @ numerators).astype(np.float64) / (weights @ denominators)
+
+    batch_sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    batch_seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        resampled = np.concatenate(list(executor.map(evaluate, batch_seeds, batch_sizes)))
+
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        # groups whose metric is undefined in every resample (e.g., never targeted) get nan bounds
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lower, upper = np.nanquantile(resampled, [alpha, 1 - alpha], axis=0)
+    return lower, upper
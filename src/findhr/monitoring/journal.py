@@ -0,0 +1,219 @@
+import csv
+import glob
+import os
+import time
+import zlib
+
+from findhr.monitoring.share_store import SNAPSHOT_SUFFIX
+
+
+def _sync_directory(filename):
+    # forces the renames and removals of the entries of the directory of filename to disk
+    fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ShareJournal():
+
+    """
+    Append-only write-ahead log for the CSV share handlers.
+
+    New secret components are appended to log segments next to the snapshot csv file instead of rewriting
+    the whole file, so the cost of saving a donation does not depend on the size of the store.
+    Segments are named <snapshot>.wal.<number> and hold rows of comma-separated values:
+    provider id, user id, attribute name, secret value, checksum. The checksum lets recovery stop at a record
+    that was only partially written before a crash.
+
+    Once the log grows larger than the snapshot, it is compacted: the full store is written to the snapshot
+    (atomically, via a temporary file) and the segments are removed. When the handler starts, the snapshot is
+    loaded and the log replayed on top of it.
+
+    Attributes
+    ----------
+    snapshot_filename : string
+        Name of the snapshot csv file (or binary snapshot, see ShareStore.to_snapshot) the log belongs to.
+
+    segment_size : int
+        Size in bytes after which a new log segment is started.
+
+    fsync_batch : int
+        Maximum number of records appended before the log is synced to disk.
+
+    fsync_interval : float
+        Maximum number of seconds between syncs of the log to disk.
+
+    compact_ratio : float
+        The log is compacted once its size exceeds compact_ratio times the size of the snapshot.
+
+    compact_min_bytes : int
+        The log is never compacted while it is smaller than this.
+    """
+
+    def __init__(self, snapshot_filename, segment_size=64 * 2**20, fsync_batch=1000, fsync_interval=1.0,
+                 compact_ratio=1.0, compact_min_bytes=2**20):
+
+        self.snapshot_filename = snapshot_filename
+        self.segment_size = segment_size
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+
+        self._pending = []
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._log_bytes = sum(os.path.getsize(segment) for segment in self.segments())
+        self._snapshot_bytes = os.path.getsize(snapshot_filename) if os.path.exists(snapshot_filename) else 0
+
+
+    def segments(self):
+        """
+        Returns the names of the existing log segments, oldest first.
+        """
+        segments = glob.glob(glob.escape(self.snapshot_filename) + '.wal.*')
+        return sorted(segments, key=lambda name: int(name.rsplit('.', 1)[1]))
+
+
+    def _segment_name(self, number):
+        return f"{self.snapshot_filename}.wal.{number:06d}"
+
+
+    @staticmethod
+    def _checksum(provider_id, user_id, attribute_name, secret_value):
+        return zlib.crc32(f"{provider_id},{user_id},{attribute_name},{secret_value}".encode('utf-8'))
+
+
+    def replay(self, store):
+        """
+        Applies all log segments to the store (crash recovery). Replay of a segment stops at the first
+        incomplete or corrupted record. The records of a segment are written with one set_many call per provider
+        and attribute, the last record of a component overwriting the earlier ones.
+
+        Parameters
+        ----------
+        store : ShareStore | ShardedShareStore
+            The store loaded from the snapshot.
+
+        Returns
+        -------
+        records : int
+            The number of replayed records.
+        """
+        records = 0
+        for segment in self.segments():
+            columns = {}    # (provider_id, attribute_name) -> {user_id: secret_value}
+            with open(segment, 'r', newline='') as f_in:
+                for row in csv.reader(f_in, delimiter=','):
+                    if len(row) != 5 or not row[3].lstrip('-').isdigit() or not row[4].isdigit():
+                        break
+                    provider_id, user_id, attribute_name, secret_value, checksum = row
+                    if self._checksum(provider_id, user_id, attribute_name, secret_value) != int(checksum):
+                        break
+                    columns.setdefault((provider_id, attribute_name), {})[user_id] = int(secret_value)
+                    records += 1
+            for (provider_id, attribute_name), column in columns.items():
+                store.set_many(provider_id, list(column), attribute_name, list(column.values()))
+        return records
+
+
+    def append(self, provider_id, user_id, attribute_name, secret_value):
+        """
+        Buffers a secret component to be written to the log by the next commit.
+        """
+        self._pending.append((provider_id, user_id, attribute_name, int(secret_value)))
+
+
+    def commit(self, sync=False):
+        """
+        Appends the buffered components to the current log segment.
+        The segment is synced to disk when fsync_batch records or fsync_interval seconds have accumulated
+        since the last sync, or if sync is set.
+        """
+        if self._pending:
+            f_out = self._open_segment()
+            start = f_out.tell()
+            writer = csv.writer(f_out, delimiter=',', lineterminator='\n')
+            writer.writerows((*row, self._checksum(*row)) for row in self._pending)
+            f_out.flush()
+            self._log_bytes += f_out.tell() - start
+            self._unsynced += len(self._pending)
+            self._pending = []
+
+        if self._file is not None and self._unsynced and (
+                sync or self._unsynced >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+
+    def sync(self):
+        """
+        Forces the current log segment to disk.
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+
+    def _open_segment(self):
+        if self._file is not None and self._file.tell() >= self.segment_size:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+        if self._file is None:
+            # always start a new segment, so records never follow a record torn by a crash
+            segments = self.segments()
+            number = int(segments[-1].rsplit('.', 1)[1]) + 1 if segments else 0
+            self._file = open(self._segment_name(number), 'a', newline='')
+        return self._file
+
+
+    def needs_compaction(self):
+        """
+        Whether the log has grown enough, relative to the snapshot, to be worth compacting.
+        Compacting only when the log is as large as the snapshot keeps the amortized cost per record constant.
+        """
+        return self._log_bytes > max(self.compact_min_bytes, self.compact_ratio * self._snapshot_bytes)
+
+
+    def compact(self, store):
+        """
+        Merges the log into the snapshot: writes the whole store to the snapshot file and removes the segments.
+
+        Parameters
+        ----------
+        store : ShareStore
+            The store holding the snapshot with all logged components applied.
+        """
+        self.commit(sync=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        temporary_filename = self.snapshot_filename + '.tmp'
+        store.save(temporary_filename, snapshot=self.snapshot_filename.endswith(SNAPSHOT_SUFFIX))
+        with open(temporary_filename, 'r+') as f_tmp:
+            os.fsync(f_tmp.fileno())
+        os.replace(temporary_filename, self.snapshot_filename)
+        # the new snapshot must be durable before the segments are removed: otherwise, after a power loss,
+        # the removals could persist without the rename, leaving the old snapshot without its log
+        _sync_directory(self.snapshot_filename)
+
+        # a crash before this point leaves segments that are already part of the snapshot:
+        # replaying them again is harmless, since they only overwrite components with their final values
+        for segment in self.segments():
+            os.remove(segment)
+        self._log_bytes = 0
+        self._snapshot_bytes = os.path.getsize(self.snapshot_filename)
+
+
+    def close(self):
+        self.commit(sync=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,422 @@
+# Vectorized fairness metric kernels.
+# The kernels work on a boolean group membership mask over a pool of candidates (in ranking order where relevant),
+# so every metric reduces to a few NumPy operations once the protected attributes have been reconstructed.
+import functools
+
+import numpy as np
+
+
+def group_mask(doubled_attributes, attribute_names, attribute_codes, size):
+    """
+    Boolean mask of the pool members that belong to a group.
+
+    Parameters
+    ----------
+    doubled_attributes : {string: np.ndarray[int64]}
+        For each attribute name, the sum of the two multiparty components of every pool member,
+        i.e., twice the value of the protected attribute.
+
+    attribute_names : [string]
+        The names of the attributes that define the group.
+
+    attribute_codes : [int]
+        The numerical catalogue values of the attributes in attribute_names, in the same order.
+
+    size : int
+        The size of the pool.
+
+    Returns
+    -------
+    mask : np.ndarray[bool]
+    """
+    mask = np.ones(size, dtype=bool)
+    for attribute_name, code in zip(attribute_names, attribute_codes):
+        mask &= doubled_attributes[attribute_name] == 2 * code
+    return mask
+
+
+def cell_index(doubled_attributes, attribute_names, attribute_codes, size):
+    """
+    Index of the intersectional group (cell) of every pool member, over all combinations of the values of several attributes.
+    Cells are numbered in the order of the cartesian product of the values (the last attribute varies fastest).
+
+    Parameters
+    ----------
+    doubled_attributes : {string: np.ndarray[int64]}
+        For each attribute name, twice the value of the protected attribute of every pool member (see group_mask).
+
+    attribute_names : [string]
+        The attributes spanning the cells.
+
+    attribute_codes : [np.ndarray[int]]
+        For each attribute in attribute_names, the numerical catalogue values of all its values.
+
+    size : int
+        The size of the pool.
+
+    Returns
+    -------
+    cells : np.ndarray[int64]
+        The cell of every pool member, or -1 for members with a value that is not in the catalogue.
+    """
+    cells = np.zeros(size, dtype=np.int64)
+    valid = np.ones(size, dtype=bool)
+    for attribute_name, codes in zip(attribute_names, attribute_codes):
+        doubled_codes = 2 * np.asarray(codes, dtype=np.int64)
+        assert len(np.unique(doubled_codes)) == len(doubled_codes), f"Values of attribute '{attribute_name}' must have distinct codes"
+        order = np.argsort(doubled_codes)
+        positions = np.minimum(np.searchsorted(doubled_codes[order], doubled_attributes[attribute_name]), len(order) - 1)
+        valid &= doubled_codes[order][positions] == doubled_attributes[attribute_name]
+        cells = cells * len(doubled_codes) + order[positions]
+    cells[~valid] = -1
+    return cells
+
+
+def cell_sums(cells, n_cells, weights=None):
+    """
+    Number of pool members (or sum of their weights) in every cell, with a single bincount.
+    """
+    valid = cells >= 0
+    return np.bincount(cells[valid], None if weights is None else np.asarray(weights, dtype=np.float64)[valid], minlength=n_cells)
+
+
+def cell_metrics(statistics, metrics, size, k=None, epsilon=1e-10, discounts_total=0.0):
+    """
+    Fairness metrics of all cells at once, from their statistics.
+
+    Parameters
+    ----------
+    statistics : {string: np.ndarray}
+        Per-cell statistics: "count" (members in the pool), "topk_count" (members in the top-k), 
+        "exposure" (sum of the browsing weights of the members), "discounted" (sum of the discounts of the members in the top-k),
+        "targeted" and "accepted" (targeted, and targeted and accepted members).
+
+    metrics : [string]
+        The metrics to compute, see REPORT_METRICS.
+
+    size, k, epsilon :
+        The size of the pool, the cutoff rank and the smoothing of "skew".
+
+    discounts_total : float
+        The sum of the discounts of the top-k positions, for "discounted_rep_diff".
+
+    Returns
+    -------
+    values : {string: np.ndarray[float]}
+        For each metric, its value for every cell (equal to the value of the scalar kernels for the corresponding group).
+    """
+    values = {}
+    for metric in metrics:
+        if metric == "pool_diversity":
+            values[metric] = statistics["count"] / size if size else np.zeros(len(statistics["count"]))
+        elif metric == "group_exposure":
+            values[metric] = np.asarray(statistics["exposure"], dtype=np.float64)
+        elif metric == "skew":
+            total_group_ratio = statistics["count"] / size if size else 0
+            topk_group_ratio = statistics["topk_count"] / k if k > 0 else 0
+            values[metric] = np.log((topk_group_ratio + epsilon) / (total_group_ratio + epsilon)) + np.zeros(len(statistics["count"]))
+        elif metric == "discounted_rep_diff":
+            values[metric] = 2 * np.asarray(statistics["discounted"], dtype=np.float64) - discounts_total
+        elif metric == "accept_rate":
+            targeted = np.asarray(statistics["targeted"], dtype=np.float64)
+            values[metric] = np.divide(statistics["accepted"], targeted, out=np.zeros(len(targeted)), where=targeted > 0)
+    return values
+
+
+def cell_table(groups, statistics, values):
+    """
+    Tidy table of the metrics of all cells: one row per cell, with a column per attribute, the counts and the metrics.
+    """
+    import pandas as pd
+
+    table = pd.DataFrame([dict(zip(group.attribute_names, group.attribute_values)) for group in groups],
+                         columns=list(groups[0].attribute_names) if groups else None)
+    for statistic in ("count", "targeted", "accepted"):
+        if statistic in statistics:
+            table[statistic] = np.asarray(statistics[statistic]).astype(np.int64)
+    for metric, metric_values in values.items():
+        table[metric] = metric_values
+    return table
+
+
+def pool_diversity(mask):
+    return float(np.count_nonzero(mask)) / len(mask) if len(mask) else 0
+
+
+# tables of positional weights are built for lengths rounded up to a power of two, and at least this long
+MIN_TABLE_LENGTH = 1024
+
+
+@functools.lru_cache(maxsize=64)
+def _weight_table(browsing_model, param, capacity):
+    # unnormalized weights of the first `capacity` positions under a predefined browsing model, shared by all shorter rankings
+    positions = np.arange(capacity, dtype=np.float64)
+    if browsing_model == 'inverse_log':
+        table = 1 / np.log2(positions + 2)
+    elif browsing_model == 'exp_decay':
+        table = param ** positions
+    else:
+        raise ValueError(f"Unsupported browsing model: {browsing_model}")
+    table.flags.writeable = False
+    return table
+
+
+def _table_capacity(length):
+    return max(MIN_TABLE_LENGTH, 1 << max(length - 1, 0).bit_length())
+
+
+def _model_param(browsing_model, param):
+    # the parameter of a predefined model, normalized so that equivalent calls share cache entries
+    if browsing_model == 'exp_decay':
+        return float(param) if param is not None else 0.8
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def _predefined_weights(browsing_model, length, param):
+    weights = _weight_table(browsing_model, param, _table_capacity(length))[:length]
+    weights = weights / weights.sum()
+    weights.flags.writeable = False
+    return weights
+
+
+def browsing_model_weights(browsing_model, length, param=None):
+    """
+    Normalized exposure weights for the first `length` ranking positions.
+    The weights of the predefined models are cached, and returned as read-only arrays shared by all calls.
+
+    Parameters
+    ----------
+    browsing_model : [float] or string
+        Exposure weights per position, or the name of a predefined model ('inverse_log' or 'exp_decay').
+        Lists shorter than the ranking are padded with zeros; all weights are normalized to sum to 1.
+
+    length : int
+        The length of the ranking.
+
+    param : float, optional
+        Parameter of the predefined model (gamma for 'exp_decay', default 0.8).
+    """
+    if isinstance(browsing_model, str):
+        return _predefined_weights(browsing_model, length, _model_param(browsing_model, param))
+
+    weights = np.asarray(browsing_model, dtype=np.float64)
+    weights = weights / weights.sum()
+    if len(weights) < length:
+        weights = np.concatenate([weights, np.zeros(length - len(weights))])
+    return weights[:length]
+
+
+def rank_discounts(k):
+    """
+    The discounts 1 / log2(i + 1) of the ranks i = 1..k, as a cached read-only array.
+    """
+    return _weight_table('inverse_log', None, _table_capacity(k))[:k]
+
+
+def group_exposure(mask, weights):
+    # mask is a group mask over a ranking, or a matrix of masks with one ranking per row
+    exposure = np.asarray(mask, dtype=np.float64) @ weights[:np.shape(mask)[-1]]
+    return float(exposure) if np.ndim(mask) == 1 else exposure
+
+
+def topk_skew(mask, k, epsilon=1e-10):
+    # mask is a group mask over a ranking, or a matrix of masks with one ranking per row
+    mask = np.asarray(mask, dtype=bool)
+    size = mask.shape[-1]
+    total_group_ratio = np.count_nonzero(mask, axis=-1) / size if size else 0
+    topk_group_ratio = np.count_nonzero(mask[..., :k], axis=-1) / k if k > 0 else 0
+    skew = np.log((topk_group_ratio + epsilon) / (total_group_ratio + epsilon))
+    return float(skew) if mask.ndim == 1 else skew
+
+
+def discounted_rep_diff(mask, k):
+    # mask is a group mask over a ranking, or a matrix of masks with one ranking per row
+    top_k = np.asarray(mask, dtype=bool)[..., :k]
+    discounts = rank_discounts(top_k.shape[-1])
+    drd = np.where(top_k, 1.0, -1.0) @ discounts
+    return float(drd) if top_k.ndim == 1 else drd
+
+
+def ranking_segments(rankings, offsets=None):
+    """
+    Flattens many rankings over the same pool into one array of pool indices, with the segment of every ranking.
+
+    Parameters
+    ----------
+    rankings : [[int]] | np.ndarray[int]
+        The rankings as lists of indices into the pool, or, with offsets, all rankings concatenated into one array.
+
+    offsets : np.ndarray[int], optional
+        With concatenated rankings, the boundaries of the rankings: ranking i is rankings[offsets[i]:offsets[i+1]].
+
+    Returns
+    -------
+    indices, starts, lengths, positions : np.ndarray[int64], ...
+        The flattened pool indices, the start and length of every ranking, and the position of every index in its ranking.
+    """
+    if offsets is not None:
+        indices, offsets = np.asarray(rankings, dtype=np.int64), np.asarray(offsets, dtype=np.int64)
+        assert len(offsets) > 0 and offsets[0] == 0 and offsets[-1] == len(indices) and np.all(np.diff(offsets) >= 0), \
+            "Offsets must increase from 0 to the number of indices"
+    else:
+        rankings = [np.asarray(ranking, dtype=np.int64) for ranking in rankings]
+        offsets = np.zeros(len(rankings) + 1, dtype=np.int64)
+        np.cumsum([len(ranking) for ranking in rankings], out=offsets[1:])
+        indices = np.concatenate(rankings) if rankings else np.zeros(0, dtype=np.int64)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    positions = np.arange(len(indices), dtype=np.int64) - np.repeat(starts, lengths)
+    return indices, starts, lengths, positions
+
+
+def topk_cuts(ks, size):
+    """
+    The cutoff ranks of a top-k curve (default: 1..size) and the number of ranked members in every top-k, min(k, size).
+    """
+    ks = np.arange(1, size + 1, dtype=np.int64) if ks is None else np.asarray(ks, dtype=np.int64).reshape(-1)
+    assert np.all(ks >= 0), "Cutoff ranks must be non-negative"
+    return ks, np.minimum(ks, size)
+
+
+def topk_curve_metrics(topk_counts, discounted_counts, count, size, ks, metrics, epsilon=1e-10):
+    """
+    Top-k metrics for many cutoff ranks, from the statistics of the group at every cut (see topk_cuts).
+    Every value equals topk_skew or discounted_rep_diff with the corresponding k.
+
+    Parameters
+    ----------
+    topk_counts : np.ndarray[int]
+        The number of group members in the top-k, for every k.
+
+    discounted_counts : np.ndarray[float]
+        The sum of the rank discounts of the group members in the top-k, for every k.
+
+    count : int
+        The number of group members in the pool.
+
+    size : int
+        The size of the pool.
+
+    ks : np.ndarray[int]
+        The cutoff ranks.
+
+    metrics : [string]
+        The metrics to compute: "skew" and/or "discounted_rep_diff".
+
+    epsilon : float, optional
+        Smoothing of "skew".
+
+    Returns
+    -------
+    values : {string: np.ndarray[float]}
+    """
+    cuts = np.minimum(ks, size)
+    values = {}
+    for metric in metrics:
+        if metric == "skew":
+            total_group_ratio = count / size if size else 0
+            topk_group_ratio = np.divide(topk_counts, ks, out=np.zeros(len(ks)), where=ks > 0)
+            values[metric] = np.log((topk_group_ratio + epsilon) / (total_group_ratio + epsilon))
+        elif metric == "discounted_rep_diff":
+            # sum of (+1 | -1) * discount over the top-k, as 2 * (discounts of the members) - (all discounts)
+            prefix_discounts = np.concatenate([[0.0], np.cumsum(rank_discounts(size))])
+            values[metric] = 2 * np.asarray(discounted_counts, dtype=np.float64) - prefix_discounts[cuts]
+    return values
+
+
+def topk_curves(mask, ks=None, metrics=("skew", "discounted_rep_diff"), epsilon=1e-10):
+    """
+    Top-k metrics of a ranking for many cutoff ranks in one pass: the prefix sums of the group mask and of its
+    rank discounts are computed once, and every k reads them at its cut, in O(len(mask) + len(ks)).
+
+    Parameters
+    ----------
+    mask : np.ndarray[bool]
+        The group mask over the ranking.
+
+    ks : [int], optional
+        The cutoff ranks (default: 1..len(mask)).
+
+    metrics, epsilon :
+        See topk_curve_metrics.
+
+    Returns
+    -------
+    values : {string: np.ndarray[float]}
+        For each metric, its value for every k.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    size = len(mask)
+    ks, cuts = topk_cuts(ks, size)
+    prefix_counts = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(mask, out=prefix_counts[1:])
+    prefix_discounted = np.zeros(size + 1, dtype=np.float64)
+    np.cumsum(np.where(mask, rank_discounts(size), 0.0), out=prefix_discounted[1:])
+    return topk_curve_metrics(prefix_counts[cuts], prefix_discounted[cuts], int(prefix_counts[-1]), size, ks, metrics, epsilon)
+
+
+def segment_sums(values, starts, lengths):
+    """
+    Sum of the values of every segment (ranking), with one np.add.reduceat. Empty segments sum to 0.
+    """
+    values = np.asarray(values)
+    if values.dtype == bool:
+        values = values.astype(np.int64)
+    if len(values) == 0:
+        return np.zeros(len(starts), dtype=np.result_type(values.dtype, np.int64))
+    sums = np.add.reduceat(values, np.minimum(starts, len(values) - 1))
+    sums[lengths == 0] = 0
+    return sums
+
+
+def ranking_weights(browsing_model, positions, lengths, param=None):
+    """
+    The normalized exposure weight of every element of flattened rankings (see ranking_segments),
+    equal to browsing_model_weights(browsing_model, length, param)[position] for the length of its ranking.
+    """
+    max_length = int(lengths.max()) if len(lengths) else 0
+    if not isinstance(browsing_model, str):
+        return browsing_model_weights(browsing_model, max_length, param)[positions]
+
+    table = _weight_table(browsing_model, _model_param(browsing_model, param), _table_capacity(max_length))
+    totals = np.cumsum(table[:max_length])
+    return table[positions] / np.repeat(totals[np.maximum(lengths, 1) - 1] if max_length else np.ones(len(lengths)), lengths)
+
+
+def accept_rate(mask, targeted, accepted):
+    count_actual_positive = int(np.count_nonzero(mask & targeted))
+    count_true_positive = int(np.count_nonzero(mask & targeted & accepted))
+    return count_true_positive / count_actual_positive if count_actual_positive else 0
+
+
+def stage_flags(user_ids, pool_stage):
+    """
+    Aligns the (targeted, accepted) flags of a pool stage with the users of a pool.
+
+    Parameters
+    ----------
+    user_ids : [string]
+        The user IDs of the pool, in pool order.
+
+    pool_stage : [(string, bool, bool)] | [(string, bool)]
+        A list of (user_id, targeted, accepted), or (user_id, accepted) with targeted set to True for everyone.
+        Users missing from the pool stage are neither targeted nor accepted.
+
+    Returns
+    -------
+    targeted, accepted : np.ndarray[bool], np.ndarray[bool]
+    """
+    if not pool_stage:
+        stage_dict = {}
+    elif len(pool_stage[0]) == 2:
+        # only one bool given - set targeted as 1 by default
+        stage_dict = {user: (1, accepted) for user, accepted in pool_stage}
+    elif len(pool_stage[0]) == 3:
+        stage_dict = {user: (targeted, accepted) for user, targeted, accepted in pool_stage}
+    else:
+        raise ValueError(f"wrong pool stage length: {len(pool_stage[0])}")
+
+    stages = [stage_dict.get(user_id, (False, False)) for user_id in user_ids]
+    targeted = np.fromiter((bool(targeted) for targeted, _ in stages), dtype=bool, count=len(stages))
+    accepted = np.fromiter((bool(accepted) for _, accepted in stages), dtype=bool, count=len(stages))
+    return targeted, accepted
@@ -1,16 +1,18 @@
-from collections import defaultdict
-import csv
+import os
 import sys
 import random
-import base64
-import json
-from mpyc.runtime import mpc
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import hashes
-import matplotlib.pyplot as plt
 import numpy as np
-import math
-from scipy.stats import norm
+
+from findhr.monitoring import ingestion
+from findhr.monitoring.catalogue import compile_catalogue
+from findhr.monitoring import metrics as fairness_metrics
+from findhr.monitoring.envelope import open_envelope
+from findhr.monitoring.journal import ShareJournal
+from findhr.monitoring.result_cache import cached_result
+from findhr.monitoring.share_store import ShareStore
+from findhr.monitoring.sharded_store import ShardedShareStore
+from findhr.monitoring.sqlite_store import SQLiteShareStore
+from findhr.monitoring.tracing import traced, trace_phase
 
 
 SENSITIVE_ATTRIBUTE_CATALOGUE = {
@@ -18,6 +20,208 @@ SENSITIVE_ATTRIBUTE_CATALOGUE = {
     'disabled': {"True": 1, "False": 0}
 }
 
+# Metrics supported by measure_report
+REPORT_METRICS = ("pool_diversity", "group_exposure", "skew", "discounted_rep_diff", "accept_rate")
+
+# Policies for pool members whose local components are missing:
+#   "unknown": they stay in the pool as members of no group, "drop": they are removed from the pool, "fail": a ValueError is raised
+MISSING_SHARE_POLICIES = ("unknown", "drop", "fail")
+
+# Share of the pool with all the components of the measured attributes, supported by measure_report in addition to REPORT_METRICS
+COVERAGE_METRIC = "coverage"
+
+# Metrics supported by measure_rankings
+RANKING_METRICS = ("pool_diversity", "group_exposure", "skew", "discounted_rep_diff")
+
+# fractional bits of the integer encoding of public weights in secure dot products (as in SecFxp(64))
+FIXED_POINT_BITS = 32
+
+
+
+class _ShareStorage():
+
+    """
+    Local storage of secret attribute components, shared by the CSV handlers of the third party and of the service providers:
+    the store and its journal, the invalidation of cached results, and the bulk ingestion of encrypted donations.
+
+    Attributes
+    ----------
+    result_caches : (ResultCache)
+        The result caches of the measurement handlers using this handler: storing a component of a user
+        invalidates the cached results over pools with the user.
+    """
+
+    result_caches = ()
+
+    def __init__(self, local_filename, journal=False):
+
+        self.local_filename = local_filename
+        self.journal = ShareJournal(local_filename) if journal else None
+        self.load_data(local_filename)
+
+
+    def load_data(self, local_filename):
+
+        """
+        Loads data from the local_filename csv file into self.local_data,
+        or memory-maps it if local_filename is a binary snapshot (see ShareStore.load).
+
+        Parameters
+        ----------
+        local_filename : string 
+            Name of a csv file (or of a snapshot file ending with SNAPSHOT_SUFFIX) to load data from.
+        """
+
+        # This creates a columnar store with three level key acess:
+        #    provider ID -> user ID -> attribute name -> local secret value
+        self.local_data = ShareStore.load(local_filename)
+
+        # crash recovery: re-apply the components saved since the last compaction
+        if self.journal is not None:
+            self.journal.replay(self.local_data)
+        self._clear_results()
+
+
+    def save_session_data(self):
+
+        """
+        Writes data from self.local_data dictionary to the self.local_filename csv file.
+        In journaled mode, only appends the components stored since the last call to the log, 
+        and compacts the log into the csv file once it has grown larger than the file.
+        """
+
+        if self.journal is None:
+            self.local_data.save(self.local_filename)
+            return
+
+        self.journal.commit()
+        if self.journal.needs_compaction():
+            self.journal.compact(self.local_data)
+
+
+    def _clear_results(self):
+        # drops all the cached results, when the store is (re)loaded
+        for result_cache in self.result_caches:
+            result_cache.clear()
+
+
+    def _invalidate_results(self, provider_id, user_ids):
+        # drops the cached results over pools with the given users
+        for result_cache in self.result_caches:
+            result_cache.invalidate_users(provider_id, user_ids)
+
+
+    def _store(self, provider_id, user_id, attribute_name, secret_protected_attribute):
+        """
+        Store the local component of the secret attribute.
+        """
+        self.local_data.set(provider_id, user_id, attribute_name, secret_protected_attribute)
+        if self.journal is not None:
+            self.journal.append(provider_id, user_id, attribute_name, secret_protected_attribute)
+        self._invalidate_results(provider_id, [user_id])
+
+
+    def _store_many(self, provider_id, user_ids, attribute_name, secret_protected_attributes):
+        # vectorized version of _store, with a single write to the store
+        self.local_data.set_many(provider_id, user_ids, attribute_name, secret_protected_attributes)
+        if self.journal is not None:
+            for user_id, secret_protected_attribute in zip(user_ids, np.asarray(secret_protected_attributes).tolist()):
+                self.journal.append(provider_id, user_id, attribute_name, secret_protected_attribute)
+        self._invalidate_results(provider_id, user_ids)
+
+
+    def decrypt_data(self, encrypted_data, private_key):
+        """
+        RSA decryption and decoding to dictionary.
+        """
+        return ingestion.decrypt_payload(encrypted_data, private_key)
+
+
+    def _store_donations(self, results):
+        # stores the valid donations of a batch (see ingestion.merge_donations) and saves the session data once
+        donations = [donation for donation, error in results if error is None]
+        if donations:
+            ingestion.merge_donations(self.local_data, donations, self.journal)
+            for provider_id, user_ids in ingestion.donation_users(donations).items():
+                self._invalidate_results(provider_id, user_ids)
+            self.save_session_data()
+        return [None if error is None else {"error": error} for _, error in results]
+
+
+    def store_encrypted_data(self, encrypted_data, private_key):
+        """
+        Decrypts and decodes a donation, stores its components and saves the session data.
+        The donation is validated as in store_encrypted_data_many: an invalid donation stores none of its components.
+
+        Parameters
+        ----------
+        encrypted_data : string | bytes
+            The base64-encoded, RSA-encrypted donation.
+
+        private_key : RSAPrivateKey
+            The private key of the receiving party.
+
+        Returns
+        -------
+        error : dict | None
+            None if the donation was stored, or {"error": message} if it could not be decrypted or is invalid.
+        """
+        return self._store_donations([ingestion._decrypt_and_validate(encrypted_data, self.decrypt_data, private_key)])[0]
+
+
+    def store_encrypted_data_many(self, encrypted_payloads, private_key, workers=None):
+        """
+        Bulk version of store_encrypted_data: decrypts many donations across a pool of processes,
+        stores all the valid ones and saves the session data once.
+        Invalid donations are skipped and do not prevent the others from being stored.
+
+        Parameters
+        ----------
+        encrypted_payloads : [string | bytes]
+            The base64-encoded, RSA-encrypted donations.
+
+        private_key : RSAPrivateKey
+            The private key of the receiving party.
+
+        workers : int, optional
+            The number of worker processes (default: the number of CPUs), see ingestion.decrypt_donations.
+
+        Returns
+        -------
+        errors : [dict | None]
+            For every payload, in order, None if it was stored, or {"error": message} as returned by store_encrypted_data.
+        """
+        # a reimplemented decrypt_data is used as is, in this process
+        decrypt = None if type(self).decrypt_data is _ShareStorage.decrypt_data else self.decrypt_data
+        return self._store_donations(ingestion.decrypt_donations(encrypted_payloads, private_key, workers=workers, decrypt=decrypt))
+
+
+    def store_encrypted_envelope(self, envelope, private_key):
+        """
+        Decrypts an envelope carrying many donations under one RSA-wrapped AES-GCM key (see envelope.py),
+        stores all its valid donations and saves the session data once.
+        The envelope is decoded while it is read, but nothing is stored unless the whole envelope is authentic.
+
+        Parameters
+        ----------
+        envelope : string | bytes | iterable of string | bytes
+            The envelope, or its lines (e.g., a file opened for reading).
+
+        private_key : RSAPrivateKey
+            The private key of the receiving party.
+
+        Returns
+        -------
+        errors : [dict | None] | dict
+            For every donation of the envelope, in order, None if it was stored or {"error": message} if it is invalid;
+            or a single {"error": message} if the envelope could not be decrypted.
+        """
+        try:
+            results = [ingestion.validate_donation(data_dict) for data_dict in open_envelope(envelope, private_key)]
+        except ValueError as e:
+            return {"error": f"Decryption failed: {str(e)}"}
+        return self._store_donations(results)
+
 
 
 class MultipartyDataCollection():
@@ -69,6 +273,56 @@ class MultipartyDataCollection():
         return (protected_attribute + secret, protected_attribute - secret)
 
 
+    @staticmethod
+    def _random_secrets(size, margin):
+        # uniform int64 secrets in [-(sys.maxsize - margin) - 1, sys.maxsize - margin] from the operating system CSPRNG:
+        # values outside of the range are drawn again (rejection sampling), so no value is more likely than another
+        secrets = np.frombuffer(os.urandom(8 * size), dtype=np.int64).copy()
+        low, high = -(sys.maxsize - margin) - 1, sys.maxsize - margin
+        rejected = np.flatnonzero((secrets < low) | (secrets > high))
+        while len(rejected):
+            secrets[rejected] = np.frombuffer(os.urandom(8 * len(rejected)), dtype=np.int64)
+            rejected = rejected[(secrets[rejected] < low) | (secrets[rejected] > high)]
+        return secrets
+
+
+    def generate_multiparty_data_many(self, provider_id, user_ids, attribute_name, attribute_values):
+        """
+        Vectorized version of generate_multiparty_data: generates the multiparty components of one attribute 
+        for many users at once (e.g., when onboarding historical donations), with secrets drawn from the CSPRNG
+        of the operating system (os.urandom) instead of the global random generator.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
+
+        user_ids : [string]
+            The identifiers of the users
+
+        attribute_name : string
+            The name of the attribute, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        attribute_values : [string]
+            The values of the attribute, in the same order as user_ids, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        Returns
+        -------
+        protected_attribute_components: (np.ndarray[int64], np.ndarray[int64])
+           Multiparty components of the protected attributes (local, remote), in the order of user_ids.
+        """
+        assert len(user_ids) == len(attribute_values), "Number of users must be equal to the number of attribute values"
+
+        catalogue = SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name]
+        values, inverse = np.unique(np.asarray(attribute_values, dtype=str), return_inverse=True)
+        for attribute_value in values.tolist():
+            assert attribute_value in catalogue, f"Value '{attribute_value}' not valid for attribute '{attribute_name}'"
+        protected_attributes = np.array([catalogue[attribute_value] for attribute_value in values.tolist()], dtype=np.int64)[inverse]
+
+        secrets = self._random_secrets(len(user_ids), len(catalogue))
+        return (protected_attributes + secrets, protected_attributes - secrets)
+
+
     def send_to_model_owner(self, provider_id, user_id, attribute_name, secret_protected_attribute):
         """
         This is an empty placeholder: the third party needs to reimplement it 
@@ -88,7 +342,7 @@ class MultipartyDataCollection():
 
 
 
-class MultipartyDataHandlerCSV(MultipartyDataCollection):
+class MultipartyDataHandlerCSV(_ShareStorage, MultipartyDataCollection):
 
     """
     Example handler for managing the collection and multiparty storage of protected attributes. 
@@ -101,58 +355,20 @@ class MultipartyDataHandlerCSV(MultipartyDataCollection):
     local_filename : string
         Name of a csv file to load data from, and save data to.
         The file contains rows of the following comma-separated values: provider id, user id, attribute name, secret value.
+        A name ending with SNAPSHOT_SUFFIX selects a binary snapshot instead, memory-mapped when loading (see ShareStore.to_snapshot).
 
-    local_data : defaultdict[defaultdict[defaultdict[int]]
-        A temporary dictionary for handling the local data. Has the following levels: local_data[provider_id][user_id][attribute_value] = secret_value.
-
-    """
-
-
-    def __init__(self, local_filename):
-
-        self.local_filename = local_filename
-        self.load_data(local_filename)
+    local_data : ShareStore
+        A columnar store for handling the local data. Supports the following levels of access: local_data[provider_id][user_id][attribute_value] = secret_value.
 
+    journal : ShareJournal | None
+        In journaled mode, the write-ahead log next to local_filename. save_session_data then appends the new components
+        to the log instead of rewriting the csv file, and the log is replayed on top of the csv file when loading.
 
-    def load_data(self, local_filename):
-
-        """
-        Loads data from the local_filename csv file into self.local_data
-
-        Parameters
-        ----------
-        local_filename : string 
-            Name of a csv file to load data from.
-        """
+    result_caches : (ResultCache)
+        The result caches of the measurement handlers using this handler: storing a component of a user
+        invalidates the cached results over pools with the user.
 
-        # This creates a dictionary with three level key acess:
-        #    provider ID -> user ID -> attribute name -> local secret value
-        self.local_data = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-
-        with open(local_filename, 'r') as f_in:
-            reader = csv.reader(f_in, delimiter=',')
-
-            for row in reader:
-                # provider ID -> user ID -> attribute name -> local secret value
-                if len(row) == 4:
-                    self.local_data[row[0]][row[1]][row[2]] = int(row[3])
-
-
-    def save_session_data(self):
-
-        """
-        Writes data from self.local_data dictionary to the self.local_filename csv file.
-        """
-
-        with open(self.local_filename, 'w') as f_out:
-
-            writer =csv.writer(f_out, delimiter=',')
-
-            for provider_id in self.local_data.keys():
-                for user_id in self.local_data[provider_id].keys():
-                    for attribute_name in self.local_data[provider_id][user_id].keys():
-                        secret_value = self.local_data[provider_id][user_id][attribute_name]
-                        writer.writerow([provider_id, user_id, attribute_name, secret_value])
+    """
 
 
     def send_to_model_owner(self, provider_id, user_id, attribute_name, secret_protected_attribute, provider_handler):
@@ -201,45 +417,55 @@ class MultipartyDataHandlerCSV(MultipartyDataCollection):
         secret_protected_attribute : int
             Randomized component of the protected attribute value
         """
-        self.local_data[provider_id][user_id][attribute_name] = secret_protected_attribute
+        self._store(provider_id, user_id, attribute_name, secret_protected_attribute)
 
 
-    def decrypt_data(self, encrypted_data, private_key):
+    def store_many(self, provider_id, user_ids, attribute_name, secret_protected_attributes):
         """
-        RSA decryption and decoding to dictionary.
+        Vectorized version of store: stores the local components of one attribute for many users
+        with a single write to the store.
         """
-        decoded_data = base64.b64decode(encrypted_data)
-        decrypted_data = private_key.decrypt(
-            decoded_data,
-            padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
-        )
-        return json.loads(decrypted_data.decode('utf-8'))
+        self._store_many(provider_id, user_ids, attribute_name, secret_protected_attributes)
 
-    
-    def store_encrypted_data(self, encrypted_data, private_key):
 
+    def generate_and_store_many(self, provider_id, user_ids, attribute_name, attribute_values, provider_handler=None):
         """
-        decrypt and decode data and save session data
-        """
-        try:
-            data_dict = self.decrypt_data(encrypted_data, private_key)
-        except Exception as e:
-            return {"error": f"Decryption failed: {str(e)}"}
+        Bulk onboarding of donations: generates the multiparty components of one attribute for many users
+        (see generate_multiparty_data_many), stores the local components and, given a service provider handler,
+        hands the remote components to it in bulk (see ServiceProviderHandlerCSV.receive_many).
+        save_session_data needs to be called afterwards, as after store.
 
-        provider_id = data_dict.get("providerId")
-        user_id = data_dict.get("userId")
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
 
-        if not provider_id or not user_id:
-            return {"error": "Invalid data format"}
+        user_ids : [string]
+            The identifiers of the users
+
+        attribute_name : string
+            The name of the attribute, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        attribute_values : [string]
+            The values of the attribute, in the same order as user_ids
+
+        provider_handler : ServiceProviderHandlerCSV instance, optional
+            instance of a service provider data handler receiving the remote components
+
+        Returns
+        -------
+        remote_components : np.ndarray[int64]
+            The remote components, in the order of user_ids.
+        """
+        local_components, remote_components = self.generate_multiparty_data_many(provider_id, user_ids, attribute_name, attribute_values)
+        self.store_many(provider_id, user_ids, attribute_name, local_components)
+        if provider_handler is not None:
+            provider_handler.receive_many(provider_id, user_ids, attribute_name, remote_components)
+        return remote_components
 
-        for attribute_name, secret_value in data_dict.items():
-            if attribute_name not in ["providerId", "userId"]:
-                self.store(provider_id, user_id, attribute_name, secret_value)
 
-        # store and reset
-        self.save_session_data()
 
-class ServiceProviderHandlerCSV():
+class ServiceProviderHandlerCSV(_ShareStorage):
 
     """
     Example handler for managing the storage of secret protected attribute components by a service provider. 
@@ -252,27 +478,19 @@ class ServiceProviderHandlerCSV():
     local_filename : string
         Name of a csv file to load data from, and save data to.
         The file contains rows of the following comma-separated values: provider id, user id, attribute name, secret value.
+        A name ending with SNAPSHOT_SUFFIX selects a binary snapshot instead, memory-mapped when loading (see ShareStore.to_snapshot).
 
-    local_data : defaultdict[defaultdict[defaultdict[int]]
-        A temporary dictionary for handling the local data. Has the following levels: local_data[provider_id][user_id][attribute_value] = secret_value.
+    local_data : ShareStore
+        A columnar store for handling the local data. Supports the following levels of access: local_data[provider_id][user_id][attribute_value] = secret_value.
 
-    """
+    journal : ShareJournal | None
+        In journaled mode, the write-ahead log next to local_filename. save_session_data then appends the new components
+        to the log instead of rewriting the csv file, and the log is replayed on top of the csv file when loading.
 
-    def __init__(self, local_filename):
-        self.local_filename = local_filename
-
-        # This creates a dictionary with three level key acess:
-        #    provider ID -> user ID -> attribute name -> local secret value
-        self.local_data = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-
-        with open(local_filename, 'r') as f_in:
-            reader = csv.reader(f_in, delimiter=',')
-
-            for row in reader:
-                # provider ID -> user ID -> attribute name -> local secret value
-                if len(row) == 4:
-                    self.local_data[row[0]][row[1]][row[2]] = int(row[3])
+    result_caches : (ResultCache)
+        The result caches invalidated when components are stored, see MultipartyDataHandlerCSV.
 
+    """
 
     def receive(self, provider_id, user_id, attribute_name, secret_protected_attribute):
 
@@ -300,66 +518,156 @@ class ServiceProviderHandlerCSV():
         self._store(provider_id, user_id, attribute_name, secret_protected_attribute)
 
 
-    def _store(self, provider_id, user_id, attribute_name, secret_protected_attribute):
+    def receive_many(self, provider_id, user_ids, attribute_name, secret_protected_attributes):
         """
-        Store the local component of the secret attribute.
+        Vectorized version of receive: stores the remote components of one attribute for many users
+        with a single write to the store.
+        """
+        self._store_many(provider_id, user_ids, attribute_name, secret_protected_attributes)
+
+
+
+
+class MultipartyDataHandlerSQLite(MultipartyDataHandlerCSV):
+
+    """
+    Example handler for managing the storage of secret protected attribute components by the third party,
+    backed by a SQLite database instead of a CSV file. It is a drop-in replacement of MultipartyDataHandlerCSV:
+    the components are stored on disk as they arrive and looked up with indexed queries, 
+    so the store is never loaded into memory as a whole, and saving a session only commits the new components.
+
+    Attributes
+    ----------
+    local_filename : string
+        Name of the SQLite database file (created if missing).
+
+    local_data : SQLiteShareStore
+        The database of components. Supports the same access as the ShareStore of MultipartyDataHandlerCSV.
+
+    journal : None
+        The database keeps its own write-ahead log.
+    """
+
+    def __init__(self, local_filename):
+        # no journal: the database keeps its own write-ahead log
+        super().__init__(local_filename)
+
+
+    def load_data(self, local_filename):
+
+        """
+        Opens the local_filename SQLite database as self.local_data.
+
+        Parameters
+        ----------
+        local_filename : string 
+            Name of the SQLite database file.
         """
-        self.local_data[provider_id][user_id][attribute_name] = secret_protected_attribute
+
+        self.local_data = SQLiteShareStore(local_filename)
+        self._clear_results()
 
 
     def save_session_data(self):
 
         """
-        Writes data from self.local_data dictionary to the self.local_filename csv file.
+        Commits the components stored since the last call to the database.
         """
 
-        with open(self.local_filename, 'w') as f_out:
+        self.local_data.commit()
 
-            writer =csv.writer(f_out, delimiter=',')
 
-            for provider_id in self.local_data.keys():
-                for user_id in self.local_data[provider_id].keys():
-                    for attribute_name in self.local_data[provider_id][user_id].keys():
-                        secret_value = self.local_data[provider_id][user_id][attribute_name]
-                        writer.writerow([provider_id, user_id, attribute_name, secret_value])
 
+class ServiceProviderHandlerSQLite(ServiceProviderHandlerCSV):
+
+    """
+    Example handler for managing the storage of secret protected attribute components by a service provider,
+    backed by a SQLite database instead of a CSV file. It is a drop-in replacement of ServiceProviderHandlerCSV, 
+    see MultipartyDataHandlerSQLite.
+
+    Attributes
+    ----------
+    local_filename : string
+        Name of the SQLite database file (created if missing).
+
+    local_data : SQLiteShareStore
+        The database of components. Supports the same access as the ShareStore of ServiceProviderHandlerCSV.
+
+    journal : None
+        The database keeps its own write-ahead log.
+    """
+
+    def __init__(self, local_filename):
+        # no journal: the database keeps its own write-ahead log
+        super().__init__(local_filename)
+
+
+    def load_data(self, local_filename):
 
-    def decrypt_data(self, encrypted_data, private_key):
         """
-        RSA decryption and decoding to dictionary.
+        Opens the local_filename SQLite database as self.local_data.
         """
-        decoded_data = base64.b64decode(encrypted_data)
-        decrypted_data = private_key.decrypt(
-            decoded_data,
-            padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
-        )
-        return json.loads(decrypted_data.decode('utf-8'))
 
-    
-    def store_encrypted_data(self, encrypted_data, private_key):
+        self.local_data = SQLiteShareStore(local_filename)
+        self._clear_results()
+
+
+    def save_session_data(self):
+
         """
-        decrypt and decode data and save session data
+        Commits the components stored since the last call to the database.
         """
-        try:
-            data_dict = self.decrypt_data(encrypted_data, private_key)
-        except Exception as e:
-            return {"error": f"Decryption failed: {str(e)}"}
 
-        provider_id = data_dict.get("providerId")
-        user_id = data_dict.get("userId")
+        self.local_data.commit()
 
-        if not provider_id or not user_id:
-            return {"error": "Invalid data format"}
 
-        for attribute_name, secret_value in data_dict.items():
-            if attribute_name not in ["providerId", "userId"]:
-                self._store(provider_id, user_id, attribute_name, secret_value)
 
-        # store and reset
-        self.save_session_data()
-    
-    
+class MultipartyDataHandlerSharded(MultipartyDataHandlerCSV):
 
+    """
+    Example handler for managing the storage of secret protected attribute components by the third party,
+    with the components partitioned by user across worker processes (see ShardedShareStore). It is a drop-in replacement 
+    of MultipartyDataHandlerCSV, using the same csv file (or binary snapshot) and journal: every shard loads the components
+    of its own users from the file, and MultipartyFairnessMeasurement then reconstructs the protected attributes and counts
+    the group members of a pool in the shards, in parallel.
+
+    Attributes
+    ----------
+    local_filename : string
+        Name of a csv file to load data from, and save data to.
+
+    n_shards : int
+        The number of shards (and worker processes).
+
+    local_data : ShardedShareStore
+        The sharded store. Supports the same access as the ShareStore of MultipartyDataHandlerCSV.
+
+    journal : ShareJournal | None
+        In journaled mode, the write-ahead log next to local_filename, see MultipartyDataHandlerCSV.
+    """
+
+    def __init__(self, local_filename, n_shards, journal=False):
+        self.n_shards = n_shards
+        super().__init__(local_filename, journal)
+
+
+    def load_data(self, local_filename):
+
+        """
+        Loads data from the local_filename csv file (or binary snapshot, see ShareStore.load) into n_shards shards,
+        each worker process reading the components of its own users.
+
+        Parameters
+        ----------
+        local_filename : string 
+            Name of a csv file with the following comma-separated values: provider id, user id, attribute name, secret value.
+        """
+
+        self.local_data = ShardedShareStore(self.n_shards, local_filename)
+
+        if self.journal is not None:
+            self.journal.replay(self.local_data)
+        self._clear_results()
 
 
 
@@ -369,11 +677,21 @@ class MultipartyFairnessMeasurement():
     Handler for managing the the measurement of fairness in a multi-party regime. 
     The protected attribute components are stored in two places: locally with the third party, and remotely with the service provider.
     Summing the two components allows the third party to recreate the value of the sensitive attribute.
+
+    SENSITIVE_ATTRIBUTE_CATALOGUE is compiled when the handler is created (see catalogue.py): the groups are validated
+    and encoded once, and repeated measurements of a group reuse its cached specification.
+
+    With a result cache (see result_cache.py), the results of the measure_* methods are cached under the fingerprint
+    of the request (provider, pool, groups, metric and parameters). Storing a component of a user with the data handler
+    invalidates the cached results over pools with the user.
+
+    With a tracer (see tracing.py), every call of a measure_* method records the time spent in share lookup, reconstruction
+    and group checks, and the number of users and attributes looked up.
     
     """
 
 
-    def __init__(self, api_key, data_handler):
+    def __init__(self, api_key, data_handler, result_cache=None, tracer=None):
 
         if self._authenticate(api_key):
             self.model_owner_id = api_key
@@ -382,6 +700,13 @@ class MultipartyFairnessMeasurement():
             raise Exception("Could not authenticate model owner")
 
         self.data_handler = data_handler
+        self.result_cache = result_cache
+        self.tracer = tracer
+        if result_cache is not None and result_cache not in getattr(data_handler, "result_caches", ()):
+            data_handler.result_caches = tuple(getattr(data_handler, "result_caches", ())) + (result_cache,)
+        # a reimplemented _get_num_attribute_value provides the codes of the catalogue values
+        encode = None if type(self)._get_num_attribute_value is MultipartyFairnessMeasurement._get_num_attribute_value else self._get_num_attribute_value
+        self.catalogue = compile_catalogue(SENSITIVE_ATTRIBUTE_CATALOGUE, encode)
 
 
     def _authenticate(self, api_key):
@@ -398,67 +723,145 @@ class MultipartyFairnessMeasurement():
         to retrieve secret attribute components from their storage (e.g., a database)
         """
 
-        # For now, we assume all the data is available. 
-        # Missing data will be handled in future versions of the library
+        # A component that is not stored reads as 0 here. The measure_* methods look up the components of a pool with
+        # the batched gather_many of the store instead, which finds the missing ones and applies the missing policy:
+        # "drop" removes the users from the pool, "unknown" sets their attribute sum to -1, which matches no group
+        # (a reimplementation of this method is taken to store every component)
         return self.data_handler.local_data[self.model_owner_id][user_id][attribute_name]
 
 
-    def _desecretize_attribute(self, user_id, attr_secr, attribute_name):
-
-        # This function sums the local and remote components of the protected attribute x.
-        # Since components were generated as follows: local = x + secr; remote = x - secr,
-        # summing them up gives us 2x -> hence the division by 2.
-
-        if isinstance(attr_secr, dict):
-            attr_secr = attr_secr[attribute_name]
-        return (attr_secr + self._get_internal_secret(user_id, attribute_name)) / 2
-
+    def _get_num_attribute_value(self, attribute_name, attribute_value):
+        """
+        This is a placeholder: the third party should reimplement it to match their attribute catalogue
+        """
 
-    def _reconstruct_attributes(self, pool, attribute_name):
-        return [(user_id, self._desecretize_attribute(user_id, attr_secr, attribute_name)) 
-            for (user_id, attr_secr) in pool]
+        return SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name][attribute_value]
 
 
-    def _get_num_attribute_value(self, attribute_name, attribute_value):
+    def _get_internal_secrets(self, user_ids, attribute_names):
         """
-        This is a placeholder: the third party should reimplement it to match their attribute catalogue
+        Batched version of _get_internal_secret: retrieves the local components of the given attributes for a whole pool.
+        Returns a dictionary {attribute_name: (secrets, found)} with an int64 array of components 
+        and a boolean array marking the users with a stored component.
+        """
+        if self.tracer is not None:
+            self.tracer.count(users=len(user_ids), attributes=len(attribute_names))
+        local_data = self.data_handler.local_data
+        with trace_phase(self.tracer, "lookup"):
+            if type(self)._get_internal_secret is MultipartyFairnessMeasurement._get_internal_secret and hasattr(local_data, 'gather_many'):
+                return local_data.gather_many(self.model_owner_id, user_ids, attribute_names)
+
+            # a reimplemented _get_internal_secret, or a handler without a columnar store: retrieve users one by one
+            return {attribute_name: (np.fromiter((self._get_internal_secret(user_id, attribute_name) for user_id in user_ids),
+                                                 dtype=np.int64, count=len(user_ids)),
+                                     np.ones(len(user_ids), dtype=bool))
+                    for attribute_name in attribute_names}
+
+
+    def _get_remote_secrets(self, attr_secrs, attribute_name):
+        # remote components are given either as one int per pool member, or as a dictionary {attribute_name: int}
+        try:
+            return np.array(attr_secrs, dtype=np.int64)
+        except TypeError:
+            return np.fromiter((attr_secr[attribute_name] if isinstance(attr_secr, dict) else attr_secr for attr_secr in attr_secrs),
+                               dtype=np.int64, count=len(attr_secrs))
+
+
+    def _get_valid_attribute_arrays(self, pool, attribute_names, missing="unknown"):
+        # batched desecritization of multiple attributes: sums the local and remote components of the whole pool
+        # with int64 array arithmetic. The sum is kept as is (2x), so the reconstructed values stay integers.
+        # Both components fit in int64 and 2x is small, so a wrap-around in the addition still gives exactly 2x.
+        # Also returns the validity of the pool members: whether all their local components are stored.
+        # Invalid members are handled by the missing policy: under "unknown" their sum is set to -1, which is odd,
+        # so it matches no group; under "drop" the sums only cover the valid members.
+        if missing not in MISSING_SHARE_POLICIES:
+            raise ValueError(f"Unsupported missing share policy: {missing}")
+
+        user_ids = [user_id for user_id, _ in pool]
+        attr_secrs = [attr_secr for _, attr_secr in pool]
+        internal_secrets = self._get_internal_secrets(user_ids, attribute_names)
+        with trace_phase(self.tracer, "reconstruction"):
+            valid = np.ones(len(pool), dtype=bool)
+            doubled_attributes = {}
+            for attribute_name in attribute_names:
+                secrets, found = internal_secrets[attribute_name]
+                valid &= found
+                doubled_attributes[attribute_name] = self._get_remote_secrets(attr_secrs, attribute_name) + secrets
+
+            if not valid.all():
+                if missing == "fail":
+                    raise ValueError(f"Missing shares for {len(pool) - np.count_nonzero(valid)} of {len(pool)} pool members")
+                for attribute_name, doubled in doubled_attributes.items():
+                    if missing == "drop":
+                        doubled_attributes[attribute_name] = doubled[valid]
+                    else:
+                        doubled[~valid] = -1
+        return doubled_attributes, valid
+
+
+    def reconstruct_attributes(self, pool, attribute_names, missing="unknown"):
         """
+        Reconstructs protected attributes of the pool members from their local and remote components,
+        e.g., to count group members incrementally (see StreamingFairnessMonitor).
 
-        return SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name][attribute_value]
+        Parameters
+        ----------
+        pool : [(string, int | {string: int})]
+            A list of tuples (user_id, remote_secret_component), as for the measure_* methods.
 
+        attribute_names : [string]
+            The names of the attributes to reconstruct.
 
-    def _get_desecritized_attribute_pool(self, user_pool, attribute_names):
-        # desecritize multiple attributes 
-        dict_desecr = {}
-        for attribute_name in attribute_names:
-            pool_desecr = self._reconstruct_attributes(user_pool, attribute_name)
-            dict_desecr[attribute_name] = {}
-            for user_id, attr in pool_desecr:
-                dict_desecr[attribute_name][user_id] = attr
-        return dict_desecr
-    
+        missing : string, optional
+            The policy for pool members with missing local components, see MISSING_SHARE_POLICIES.
+
+        Returns
+        -------
+        doubled_attributes : {string: np.ndarray[int64]}
+            For each attribute, the sums of the two components of the pool members, i.e., twice their attribute codes
+            (-1 for members with missing components under "unknown"), as expected by GroupSpec.mask.
 
-    def _check_user_attributes(self, user_id, attribute_names, attribute_values, attribute_desecr_dict):
-        # checks if all attribute values apply to the user
-        mult = 1
-        for attribute_name, attribute_value in zip(attribute_names, attribute_values):
-            mult *= attribute_desecr_dict[attribute_name][user_id] == self._get_num_attribute_value(attribute_name, attribute_value)
-        return mult
+        valid : np.ndarray[bool]
+            Whether all the local components of each pool member are stored.
+        """
+        return self._get_valid_attribute_arrays(pool, attribute_names, missing)
+
+
+    def _counts_in_shards(self):
+        # a sharded store counts the group members of a pool in its shards
+        return type(self)._get_internal_secret is MultipartyFairnessMeasurement._get_internal_secret and \
+            hasattr(self.data_handler.local_data, 'group_sums')
+
+
+    def _get_group_sums(self, pool, groups, weights=None, missing="unknown"):
+        # number of members (and sum of their weights) of every group in the pool, reconstructed and counted in the shards,
+        # and number of valid pool members. Members with missing components are members of no group ("unknown").
+        attribute_names = list(dict.fromkeys(name for group in groups for name in group.attribute_names))
+        attr_secrs = [attr_secr for _, attr_secr in pool]
+        remote_secrets = {attribute_name: self._get_remote_secrets(attr_secrs, attribute_name) for attribute_name in attribute_names}
+        if self.tracer is not None:
+            self.tracer.count(users=len(pool), attributes=len(attribute_names))
+        with trace_phase(self.tracer, "shards"):
+            counts, sums, covered = self.data_handler.local_data.group_sums(
+                self.model_owner_id, [user_id for user_id, _ in pool], remote_secrets,
+                [(group.attribute_names, group.attribute_codes) for group in groups], weights)
+        if missing == "fail" and covered < len(pool):
+            raise ValueError(f"Missing shares for {len(pool) - covered} of {len(pool)} pool members")
+        return counts, sums, covered
+
+
+    def _get_group_mask(self, pool, attribute_names, attribute_values, missing="unknown"):
+        # boolean array marking the pool members to which all attribute values apply
+        # (under the "drop" policy, over the members with all their components only)
+        group = self.catalogue.group(attribute_names, attribute_values)
+        doubled_attributes, valid = self._get_valid_attribute_arrays(pool, group.attribute_names, missing)
+        with trace_phase(self.tracer, "groups"):
+            return group.mask(doubled_attributes, np.count_nonzero(valid) if missing == "drop" else len(pool))
     
 
     def _assert_pool_attribute_names_values(self, pool, attribute_names, attribute_values, conditionals=None):
-        #assertions
-        if not isinstance(attribute_names, list) and not isinstance(attribute_names, tuple):
-            attribute_names = [attribute_names]
-        if not isinstance(attribute_values, list) and not isinstance(attribute_values, tuple):
-            attribute_values = [attribute_values]
-
-        assert len(attribute_names) == len(attribute_values), "Number of attribute names must be equal to the number of values"
-
-        for idx, attribute_name in enumerate(attribute_names):
-            assert attribute_name in SENSITIVE_ATTRIBUTE_CATALOGUE, f"Attribute '{attribute_name}' not in catalogue"
-            attribute_value = attribute_values[idx]
-            assert attribute_value in SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name], f"Value '{attribute_value}' not valid for attribute '{attribute_name}'"
+        #assertions (the group is validated only the first time it is measured)
+        attribute_names, attribute_values = self.catalogue.group(attribute_names, attribute_values)
 
         if conditionals: 
             assert (len(pool) == len(conditionals)), "Size of the conditionals array needs to be equal to the size of the pool"
@@ -466,7 +869,9 @@ class MultipartyFairnessMeasurement():
 
         return pool, attribute_names, attribute_values
 
-    def measure_pool_diversity(self, pool, attribute_names, attribute_values, conditionals=None):
+    @traced("model_owner_id")
+    @cached_result
+    def measure_pool_diversity(self, pool, attribute_names, attribute_values, conditionals=None, missing="unknown"):
         """
         Input fairness metric.
         Measures the fraction of members of a given protected group in a candidate pool (pool diversity).
@@ -488,6 +893,12 @@ class MultipartyFairnessMeasurement():
         conditionals : [bool], optional
             (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
             The implementation assumes that len(pool) == len(conditionals).
+
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"):
+                - "unknown" : they stay in the pool, as members of no group
+                - "drop" : they are removed from the pool, as with conditionals
+                - "fail" : a ValueError is raised
     
         Returns
         -------
@@ -498,25 +909,20 @@ class MultipartyFairnessMeasurement():
 
         pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
 
-        dict_desecr = self._get_desecritized_attribute_pool(pool, attribute_names)
-        
-        return float(len([user_id for (user_id, attr) in pool if self._check_user_attributes(user_id, attribute_names, attribute_values, dict_desecr)])) / len(pool) if pool else 0
+        if self._counts_in_shards():
+            counts, _, covered = self._get_group_sums(pool, [self.catalogue.group(attribute_names, attribute_values)], missing=missing)
+            size = covered if missing == "drop" else len(pool)
+            return float(counts[0]) / size if size else 0
 
+        group_mask = self._get_group_mask(pool, attribute_names, attribute_values, missing)
 
-    def _normalize_browsing_model(self, browsing_model_weights):
-        s = sum(browsing_model_weights)
-        return [float(x)/s for x in browsing_model_weights]
+        return fairness_metrics.pool_diversity(group_mask)
 
-    def _generate_browsing_model(self, model_name, length, param=None):
-        if model_name == 'inverse_log':
-            return [1 / math.log2(i + 2) for i in range(length)]
-        elif model_name == 'exp_decay':
-            gamma = param if param is not None else 0.8
-            return [gamma ** i for i in range(length)]
-        else:
-            raise ValueError(f"Unsupported browsing model: {model_name}")
 
-    def measure_group_exposure(self, pool, attribute_names, attribute_values, browsing_model, conditionals=None, browsing_param=None):
+    @traced("model_owner_id")
+    @cached_result
+    def measure_group_exposure(self, pool, attribute_names, attribute_values, browsing_model, conditionals=None, browsing_param=None,
+                               missing="unknown"):
         """
         Output fairness metric. 
         Measures the exposure of members of a given protected group in a given ranking under a selected browsing model.
@@ -548,6 +954,9 @@ class MultipartyFairnessMeasurement():
         
         browsing_param : float, optional
             (Optional) parameter to customize browsing model, such as gamma for exp_decay
+
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"), see measure_pool_diversity.
         
         Returns
         -------
@@ -558,22 +967,22 @@ class MultipartyFairnessMeasurement():
 
         pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
 
-        if isinstance(browsing_model, str):
-            browsing_model = self._generate_browsing_model(browsing_model, len(pool), browsing_param)
+        if self._counts_in_shards() and missing != "drop":
+            browsing_model = fairness_metrics.browsing_model_weights(browsing_model, len(pool), browsing_param)
+            _, sums, _ = self._get_group_sums(pool, [self.catalogue.group(attribute_names, attribute_values)], browsing_model, missing)
+            return float(sums[0])
 
-        if len(browsing_model) < len(pool):
-            browsing_model.extend([0] * (len(pool) - len(browsing_model)))
-        
-        browsing_model = self._normalize_browsing_model(browsing_model)
+        group_mask = self._get_group_mask(pool, attribute_names, attribute_values, missing)
 
-        ranking_desecr = self._get_desecritized_attribute_pool(pool, attribute_names)
+        # with dropped members, the ranking is the ranking of the remaining members
+        browsing_model = fairness_metrics.browsing_model_weights(browsing_model, len(group_mask), browsing_param)
 
-        return sum([
-            browsing_model[idx] * int(self._check_user_attributes(cand, attribute_names, attribute_values, ranking_desecr))
-                for idx, (cand, attr) in enumerate(pool)
-        ])
+        return fairness_metrics.group_exposure(group_mask, browsing_model)
 
-    def measure_topk_fairness(self, pool, attribute_names, attribute_values, k, method="skew", conditionals=None, epsilon=1e-10):
+    @traced("model_owner_id")
+    @cached_result
+    def measure_topk_fairness(self, pool, attribute_names, attribute_values, k, method="skew", conditionals=None, epsilon=1e-10,
+                              missing="unknown"):
         """
         Output fairness metric.
         Supports top-k group fairness metrics including skew and discounted representation difference.
@@ -606,43 +1015,85 @@ class MultipartyFairnessMeasurement():
         epsilon : float, optional
             (Optional) Small value to avoid division by zero or log(0).
 
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"), see measure_pool_diversity.
+
         Returns
         -------
         topk_fairness : float
             The top-k fairness metric for the specified method.
         """
 
+        if method not in ("skew", "discounted_rep_diff"):
+            raise ValueError(f"Unsupported top-k fairness method: {method}")
+
         pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
-        ranking_desecr = self._get_desecritized_attribute_pool(pool, attribute_names)
-        top_k_pool = pool[:k]
+        group_mask = self._get_group_mask(pool, attribute_names, attribute_values, missing)
 
-        def is_in_group(candidate):
-            return self._check_user_attributes(candidate, attribute_names, attribute_values, ranking_desecr)
+        if method == "skew":
+            return fairness_metrics.topk_skew(group_mask, k, epsilon)
 
-        group_indices = [is_in_group(cand) for cand, _ in pool]
-        topk_group_indices = [is_in_group(cand) for cand, _ in top_k_pool]
+        return fairness_metrics.discounted_rep_diff(group_mask, k)
 
-        total_group_ratio = sum(group_indices) / len(pool) if pool else 0
-        topk_group_ratio = sum(topk_group_indices) / k if k > 0 else 0
 
-        if method == "skew":
-            numerator = topk_group_ratio + epsilon
-            denominator = total_group_ratio + epsilon
-            return math.log(numerator / denominator)
-
-        elif method == "discounted_rep_diff":
-            drd = 0.0
-            for idx, (cand, _) in enumerate(top_k_pool):
-                pos = idx + 1
-                group_val = 1 if is_in_group(cand) else -1
-                drd += group_val / math.log2(pos + 1)
-            return drd
+    @traced("model_owner_id")
+    @cached_result
+    def measure_topk_curve(self, pool, attribute_names, attribute_values, ks=None, metrics=("skew", "discounted_rep_diff"), conditionals=None,
+                           epsilon=1e-10, missing="unknown"):
+        """
+        Output fairness metric.
+        Measures top-k fairness metrics for many cutoff ranks at once (e.g., the skew and discounted representation difference curves
+        for k = 1..len(pool)). The group membership of the ranking is reconstructed once, and the metrics of all cutoff ranks are read
+        from the prefix sums of the membership and of its rank discounts, in O(len(pool) + len(ks)).
+        Every value equals the one returned by measure_topk_fairness for the corresponding k.
 
-        else:
-            raise ValueError(f"Unsupported top-k fairness method: {method}")
+        Parameters
+        ----------
+        pool : [(string, int)]
+            A ranked list of candidates: an ordered list of (user_id, secret_attribute_remote).
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure top-k fairness for.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names.
+
+        ks : [int], optional
+            The cutoff ranks (default: 1..len(pool)).
+
+        metrics : [string], optional
+            The metrics to compute (default: both). Supported options:
+                - "skew" : see measure_topk_fairness
+                - "discounted_rep_diff" : see measure_topk_fairness
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation.
+            The implementation assumes that len(pool) == len(conditionals).
+
+        epsilon : float, optional
+            (Optional) Small value to avoid division by zero or log(0) in "skew".
+
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"), see measure_pool_diversity.
+
+        Returns
+        -------
+        curves : {string: np.ndarray[float]}
+            For each requested metric, its value for every cutoff rank, in the order of ks.
+        """
+        for metric in metrics:
+            if metric not in ("skew", "discounted_rep_diff"):
+                raise ValueError(f"Unsupported top-k fairness method: {metric}")
+
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+        group_mask = self._get_group_mask(pool, attribute_names, attribute_values, missing)
+
+        return fairness_metrics.topk_curves(group_mask, ks, metrics, epsilon)
 
 
-    def measure_accept_rate(self, pool, pool_stage, attribute_names, attribute_values, conditionals=None):
+    @traced("model_owner_id")
+    @cached_result
+    def measure_accept_rate(self, pool, pool_stage, attribute_names, attribute_values, conditionals=None, missing="unknown"):
         """
         Outcome fairnss metric. 
         For demographic parity, measure the proportion of individuals from a given protected group who are finally accepted (accept rate).
@@ -676,6 +1127,9 @@ class MultipartyFairnessMeasurement():
         conditionals : [bool], optional
             (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
             The implementation assumes that len(pool) == len(conditionals).
+
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"), see measure_pool_diversity.
         
         Returns
         -------
@@ -687,427 +1141,340 @@ class MultipartyFairnessMeasurement():
         pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
         
         if conditionals:
-            assert len(pool) == len(conditionals), "Size of conditionals array needs to be equal to the size of the pool"
-            pool = [p for p, cond in zip(pool, conditionals) if cond]
             pool_stage = [ps for ps, cond in zip(pool_stage, conditionals) if cond]
 
-        dict_desecr = self._get_desecritized_attribute_pool(pool, attribute_names)
-
-        selected_group = [user_id for user_id, attr in pool if self._check_user_attributes(user_id, attribute_names, attribute_values, dict_desecr)]
-        
-        if len(pool_stage[0]) == 2:
-            # only one bool given - set targeted as 1 by default
-            stage_dict = {user: (1, accepted) for user, accepted in pool_stage}
-        elif len(pool_stage[0]) == 3:
-            stage_dict = {user: (targeted, accepted) for user, targeted, accepted in pool_stage}
-        else:
-            raise ValueError(f"wrong pool stage length: {len(pool_stage[0])}")
-        count_actual_positive = 0
-        count_true_positive = 0
-        
-        # Check how many of the selected group reached the interview stage and then got the offer
-        for user_id in selected_group:
-            targeted, accepted = stage_dict.get(user_id, (False, False))
-            
-            if targeted:
-                count_actual_positive += 1
-                if accepted:
-                    count_true_positive += 1
-        
-        equal_opportunity = count_true_positive / count_actual_positive if count_actual_positive else 0
-        
-        return equal_opportunity
-
+        group = self.catalogue.group(attribute_names, attribute_values)
+        doubled_attributes, valid = self._get_valid_attribute_arrays(pool, group.attribute_names, missing)
+        user_ids = [user_id for user_id, _ in pool]
+        if missing == "drop":
+            user_ids = np.asarray(user_ids, dtype=object)[valid]
+        with trace_phase(self.tracer, "groups"):
+            group_mask = group.mask(doubled_attributes, len(user_ids))
 
-class MultipartyFairnessMeasurementMPYC():
-
-    """
-    Handler for managing the the measurement of fairness in a multi-party regime supported by mpyc library. 
-    The protected attribute components are stored in two parties.
-    Two-party computation enables the monitoring of fairness metrics without reconstructing sensitive attributes.
-    
-    """
-
-
-    def __init__(self, api_key, data_handler):
-
-        if self._authenticate(api_key):
-            self.provider_id = api_key
-
-        else:
-            raise Exception("Could not authenticate model owner")
-
-        self.data_handler = data_handler
-
-
-    def _authenticate(self, api_key):
-        """
-        This is a placeholder: the third party should reimplement it 
-        to check whether the provider's ID (e.g., an API key) is OK
-        """
-        return 1
-    
-    def _get_internal_secret(self, user_id, attribute_name):
-        """
-        This is a placeholder: the third party should reimplement it 
-        to retrieve secret attribute components from their storage (e.g., a database)
-        """
-
-        # For now, we assume all the data is available. 
-        return self.data_handler.local_data[self.provider_id][user_id][attribute_name]
-
-    def _get_attributes_pool_one_party(self, user_pool, attribute_name):
-        secint = mpc.SecInt(sys.maxsize.bit_length()+1)
-        internal_secret = [{user_id: self._get_internal_secret(user_id, attribute_name)} for user_id in user_pool]
-        internal_secret = {k: v for d in internal_secret for k, v in d.items()}
-        return [(user_id, secint(internal_secret[user_id])) for user_id in user_pool]
-
-    
-    def _get_secret_attributes_one_party(self, user_pool, attribute_names):
-        attribute_pool = {} 
-        for attribute_name in attribute_names:
-            pool_desecr = self._get_attributes_pool_one_party(user_pool, attribute_name)
-
-            attribute_pool[attribute_name] = {}
-            for user_id, attr in pool_desecr:
-                attribute_pool[attribute_name][user_id] = attr
-        
-        return attribute_pool # {attribute_name: {user_id: attr}}
-
-    async def _reconstruct_secret_attributes_pool(self, user_pool, attribute_name):
-        secint = mpc.SecInt(sys.maxsize.bit_length()+1)
-        internal_secret = [{user_id: self._get_internal_secret(user_id, attribute_name)} for user_id in user_pool]
-        internal_secret = {k: v for d in internal_secret for k, v in d.items()}
-        # secret sharing between TTP and SP + reconstruct secret value by adding remote secret and local secret divided by 2
-        return [(user_id, mpc.sum(mpc.input(secint(internal_secret[user_id])))/2) for user_id in user_pool]
-
-    async def _reconstruct_secret_attributes(self, user_pool, attribute_names):
-        attribute_pool_desecr = {} 
-        for attribute_name in attribute_names:
-            pool_desecr = await self._reconstruct_secret_attributes_pool(user_pool, attribute_name)
-
-            attribute_pool_desecr[attribute_name] = {}
-            for user_id, attr in pool_desecr:
-                attribute_pool_desecr[attribute_name][user_id] = attr
-        
-        return attribute_pool_desecr # {attribute_name: {user_id: attr}}
-
-    async def _get_desecritized_attribute_pool(self, user_pool, attribute_names):
-        if len(mpc.parties) == 1:
-            return self._get_secret_attributes_one_party(user_pool, attribute_names)
-        else:
-            return await self._reconstruct_secret_attributes(user_pool, attribute_names)
+        targeted, accepted = fairness_metrics.stage_flags(user_ids, pool_stage)
 
+        # Check how many of the selected group reached the interview stage and then got the offer
+        return fairness_metrics.accept_rate(group_mask, targeted, accepted)
 
-    def _get_num_attribute_value(self, attribute_name, attribute_value):
-        """
-        This is a placeholder: the third party should reimplement it to match their attribute catalogue
-        """
 
-        return SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name][attribute_value]
-    
-    def _check_user_attributes(self, user_id, attribute_names, attribute_values, attribute_desecr_dict):
-        #checks if all attribute values apply to the user
-        return mpc.prod(
-                (attribute_desecr_dict[attribute_name][user_id] == self._get_num_attribute_value(attribute_name, attribute_value))
-                for attribute_name, attribute_value in zip(attribute_names, attribute_values)
-                        )
-    
-    def _assert_pool_attribute_names_values(self, pool, attribute_names, attribute_values, conditionals=None):
+    def _assert_report_arguments(self, pool, groups, metrics, conditionals=None, k=None, pool_stage=None):
         #assertions
-        if not isinstance(attribute_names, list) and not isinstance(attribute_names, tuple):
-            attribute_names = [attribute_names]
-        if not isinstance(attribute_values, list) and not isinstance(attribute_values, tuple):
-            attribute_values = [attribute_values]
+        for metric in metrics:
+            if metric not in REPORT_METRICS and metric != COVERAGE_METRIC:
+                raise ValueError(f"Unsupported report metric: {metric}")
+        if "skew" in metrics or "discounted_rep_diff" in metrics:
+            assert k is not None, "Top-k metrics require the cutoff rank k"
+        if "accept_rate" in metrics:
+            assert pool_stage is not None, "The accept rate requires the pool stage"
 
-        assert len(attribute_names) == len(attribute_values), "Number of attribute names must be equal to the number of values"
-
-        for idx, attribute_name in enumerate(attribute_names):
-            assert attribute_name in SENSITIVE_ATTRIBUTE_CATALOGUE, f"Attribute '{attribute_name}' not in catalogue"
-            attribute_value = attribute_values[idx]
-            assert attribute_value in SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name], f"Value '{attribute_value}' not valid for attribute '{attribute_name}'"
+        groups = [self.catalogue.group(attribute_names, attribute_values) for attribute_names, attribute_values in groups]
 
         if conditionals: 
             assert (len(pool) == len(conditionals)), "Size of the conditionals array needs to be equal to the size of the pool"
             pool = [p for p, cond in zip(pool, conditionals) if cond]
+            if pool_stage is not None:
+                pool_stage = [ps for ps, cond in zip(pool_stage, conditionals) if cond]
 
-        return pool, attribute_names, attribute_values
+        return pool, groups, pool_stage
 
-    async def measure_pool_diversity(self, pool, attribute_names, attribute_values, conditionals=None):
-        """
-        Input fairness metric.
-        Measures the fraction of members of a given protected group in a candidate pool (pool diversity).
 
+    @traced("model_owner_id")
+    @cached_result
+    def measure_report(self, pool, groups, metrics=REPORT_METRICS, conditionals=None, browsing_model="inverse_log", browsing_param=None, 
+                       k=None, pool_stage=None, epsilon=1e-10, missing="unknown"):
+        """
+        Computes several fairness metrics for several groups in a single pass.
+        The protected attributes of the pool are reconstructed only once, and all requested metrics of all requested groups 
+        are computed from them. Every value equals the one returned by the corresponding measure_* method.
 
         Parameters
         ----------
-        pool : [string]
-            A list of candidates: an unordered list of user IDs generated by the service provider during attribute donation.
+        pool : [(string, int)]
+            A ranked list of candidates: an ordered list of pairs (user_id, secret_attribute_remote), 
+            where the user_id is the user ID generated by the service provider during attribute donation,
+            and secret_attribute_remote is the protected attribute component stored by the service provider
+            (a dictionary {attribute_name: secret_attribute_remote} if the groups use several attributes).
 
-        attribute_names : [string] | (string) | string
-            The names/name of the attributes/attribute to measure diversity for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+        groups : [(attribute_names, attribute_values)]
+            The groups to measure, as pairs of attribute names and values in the format accepted by measure_pool_diversity, 
+            e.g. [('gender', 'female'), ('gender', 'male'), (['gender', 'disabled'], ['female', 'True'])].
 
-        attribute_values : [string] | (string) | string
-            The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+        metrics : [string], optional
+            The metrics to compute (all by default). Supported options:
+                - "pool_diversity" : see measure_pool_diversity
+                - "group_exposure" : see measure_group_exposure, computed with browsing_model and browsing_param
+                - "skew", "discounted_rep_diff" : see measure_topk_fairness, computed with k and epsilon
+                - "accept_rate" : see measure_accept_rate, computed with pool_stage
+                - "coverage" : see measure_coverage, over the attributes of all the groups (the same for every group)
 
         conditionals : [bool], optional
             (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
             The implementation assumes that len(pool) == len(conditionals).
 
-        Returns
-        -------
-        pool_diversity : float
-            The fraction of the members of a selected group in the candidate pool. 
-            A float number in the [0,1] range.
-        """
+        browsing_model : [float] or string, optional
+            The browsing model for "group_exposure" (default 'inverse_log'), see measure_group_exposure.
 
-        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+        browsing_param : float, optional
+            (Optional) parameter to customize browsing model, such as gamma for exp_decay
 
-        attribute_pool_desecr = await self._get_desecritized_attribute_pool(pool, attribute_names)
+        k : int, optional
+            The cutoff rank for "skew" and "discounted_rep_diff".
 
-        count_attr = mpc.sum(
-            self._check_user_attributes(user_id, attribute_names, attribute_values, attribute_pool_desecr)
-            for user_id in pool
-        )
-        count_attr = await mpc.output(count_attr)
+        pool_stage : [(string, bool, bool)], optional
+            The pool stage for "accept_rate", see measure_accept_rate.
 
-        return count_attr / len(pool)
+        epsilon : float, optional
+            (Optional) Small value to avoid division by zero or log(0) in "skew".
 
+        missing : string, optional
+            The handling of pool members whose local components are missing (default "unknown"), see measure_pool_diversity.
 
-    def _normalize_browsing_model(self, browsing_model_weights):
-        s = sum(browsing_model_weights)
-        return [float(x)/s for x in browsing_model_weights]
+        Returns
+        -------
+        report : {((string), (string)): {string: float}}
+            For each group, keyed by the tuples (attribute_names, attribute_values), the value of each requested metric.
+        """
 
-    def _generate_browsing_model(self, model_name, length, param=None):
-        if model_name == 'inverse_log':
-            return [1 / math.log2(i + 2) for i in range(length)]
-        elif model_name == 'exp_decay':
-            gamma = param if param is not None else 0.8
-            return [gamma ** i for i in range(length)]
-        else:
-            raise ValueError(f"Unsupported browsing model: {model_name}")
-    
-    async def measure_group_exposure(self, pool, attribute_names, attribute_values, browsing_model, browsing_param=None):
+        pool, groups, pool_stage = self._assert_report_arguments(pool, groups, metrics, conditionals, k, pool_stage)
+
+        if self._counts_in_shards() and missing != "drop" and set(metrics) <= {"pool_diversity", "group_exposure", COVERAGE_METRIC}:
+            # both metrics only need the number of members and the sum of their exposure weights
+            if "group_exposure" in metrics:
+                browsing_model = fairness_metrics.browsing_model_weights(browsing_model, len(pool), browsing_param)
+            counts, sums, covered = self._get_group_sums(pool, groups, browsing_model if "group_exposure" in metrics else None, missing)
+            report = {}
+            for idx, group in enumerate(groups):
+                group_report = {}
+                for metric in metrics:
+                    if metric == "pool_diversity":
+                        group_report[metric] = float(counts[idx]) / len(pool) if len(pool) else 0
+                    elif metric == "group_exposure":
+                        group_report[metric] = float(sums[idx])
+                    elif metric == COVERAGE_METRIC:
+                        group_report[metric] = covered / len(pool) if len(pool) else 1.0
+                report[(group.attribute_names, group.attribute_values)] = group_report
+            return report
+
+        attribute_names = list(dict.fromkeys(name for group_names, _ in groups for name in group_names))
+        doubled_attributes, valid = self._get_valid_attribute_arrays(pool, attribute_names, missing)
+        coverage = float(np.mean(valid)) if len(pool) else 1.0
+        user_ids = [user_id for user_id, _ in pool]
+        if missing == "drop":
+            user_ids = np.asarray(user_ids, dtype=object)[valid]
+        if "group_exposure" in metrics:
+            browsing_model = fairness_metrics.browsing_model_weights(browsing_model, len(user_ids), browsing_param)
+        if "accept_rate" in metrics:
+            targeted, accepted = fairness_metrics.stage_flags(user_ids, pool_stage)
+
+        report = {}
+        for group in groups:
+            with trace_phase(self.tracer, "groups"):
+                group_mask = group.mask(doubled_attributes, len(user_ids))
+
+            group_report = {}
+            for metric in metrics:
+                if metric == "pool_diversity":
+                    group_report[metric] = fairness_metrics.pool_diversity(group_mask)
+                elif metric == "group_exposure":
+                    group_report[metric] = fairness_metrics.group_exposure(group_mask, browsing_model)
+                elif metric == "skew":
+                    group_report[metric] = fairness_metrics.topk_skew(group_mask, k, epsilon)
+                elif metric == "discounted_rep_diff":
+                    group_report[metric] = fairness_metrics.discounted_rep_diff(group_mask, k)
+                elif metric == "accept_rate":
+                    group_report[metric] = fairness_metrics.accept_rate(group_mask, targeted, accepted)
+                elif metric == COVERAGE_METRIC:
+                    group_report[metric] = coverage
+            report[(group.attribute_names, group.attribute_values)] = group_report
+
+        return report
+
+
+    @traced("model_owner_id")
+    @cached_result
+    def measure_coverage(self, pool, attribute_names, conditionals=None):
         """
-        Output fairness metric. 
-        Measures the exposure of members of a given protected group in a given ranking under a selected browsing model.
-        
+        Measures the share of the pool for which the third party holds the local components of the given attributes,
+        i.e., the share of the pool that the other metrics measure with the "drop" policy for missing shares.
 
         Parameters
         ----------
-        pool : [string]
-            A ranked list of candidates: an ordered list of user ID generated by the service provider during attribute donation
+        pool : [(string, int)]
+            A list of candidates, see measure_pool_diversity.
 
         attribute_names : [string] | (string) | string
-            The names/name of the attributes/attribute to measure group exposure for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
-
-        attribute_values : [string] | (string) | string
-            The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
-
-        browsing_model : [float] or string
-            A browsing behavior model indicating the exposure weights across ranking positions (will be normalized to sum to 1). This can be:
-                - A list of floats, where each value represents the exposure weight at a given position
-                - A string specifying a predefined model:
-                    'inverse_log' — assigns exposure proportionally to 1 / log2(position + 2)
-                    'exp_decay' — assigns exposure proportionally to gamma^position (gamma is specified via `browsing_param`, default 0.8)
+            The names/name of the attributes/attribute, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
 
         conditionals : [bool], optional
             (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
             The implementation assumes that len(pool) == len(conditionals).
-        
-        browsing_param : float, optional
-            (Optional) parameter to customize browsing model, such as gamma for exp_decay
-        
+
         Returns
         -------
-        group_exposure : float
-            The fraction of exposure the members of a selected group in the candidate pool get in a given ranking. 
-            A float number in the [0,1] range.
+        coverage : float
+            The fraction of the pool members with all the components, in the [0,1] range (1 for an empty pool).
         """
+        if not isinstance(attribute_names, list) and not isinstance(attribute_names, tuple):
+            attribute_names = [attribute_names]
+        for attribute_name in attribute_names:
+            assert attribute_name in self.catalogue.attribute_codes, f"Attribute '{attribute_name}' not in catalogue"
+        if conditionals:
+            assert (len(pool) == len(conditionals)), "Size of the conditionals array needs to be equal to the size of the pool"
+            pool = [p for p, cond in zip(pool, conditionals) if cond]
 
-        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, None)
-
-        if isinstance(browsing_model, str):
-            browsing_model = self._generate_browsing_model(browsing_model, len(pool), browsing_param)
-
-        browsing_model = self._normalize_browsing_model(browsing_model)
-
-        if len(browsing_model) < len(pool):
-            browsing_model.extend([0] * (len(pool) - len(browsing_model)))
+        _, valid = self._get_valid_attribute_arrays(pool, list(attribute_names))
+        return float(np.mean(valid)) if len(pool) else 1.0
 
-        attribute_ranking_desecr = await self._get_desecritized_attribute_pool(pool, attribute_names)
 
-        #self._get_num_attribute_value(attribute_name, attribute_value)
-        secfxp = mpc.SecFxp(64)
-        return await mpc.output(mpc.sum([
-            secfxp(browsing_model[idx]) * mpc.convert(self._check_user_attributes(user_id, attribute_names, attribute_values, attribute_ranking_desecr), secfxp)
-                for idx, user_id in enumerate(pool)
-        ]))
-    
-    async def measure_topk_fairness(self, pool, attribute_names, attribute_values, k, method="skew", conditionals=None, epsilon=1e-10):
+    @traced("model_owner_id")
+    @cached_result
+    def measure_all_groups(self, pool, attribute_names, metrics=("pool_diversity",), conditionals=None, browsing_model="inverse_log", 
+                           browsing_param=None, k=None, pool_stage=None, epsilon=1e-10, missing="unknown"):
         """
-        Output fairness metric.
-        Supports top-k group fairness metrics including skew and discounted representation difference.
+        Computes fairness metrics for every (intersectional) group over the given attributes, i.e., for every combination 
+        of their catalogue values (e.g., gender x disabled). The protected attributes of the pool are reconstructed only once,
+        every pool member is assigned to its cell, and the statistics of all cells are computed with a single bincount each.
+        Every value equals the one returned by measure_report for the corresponding group.
 
         Parameters
         ----------
-        pool : [string]
-            A ranked list of candidates: an ordered list of (user_id, secret_attribute_remote).
+        pool : [(string, int)]
+            A ranked list of candidates, see measure_report.
 
         attribute_names : [string] | (string) | string
-            The names/name of the attributes/attribute to measure top-k fairness for.
-
-        attribute_values : [string] | (string) | string
-            The values/value of the selected attributes in attribute_names.
-
-        k : int
-            The cutoff rank (e.g., top-10 means k=10).
-
-        method : string
-            The fairness metric to compute. Supported options:
-                - "skew" : Log ratio between group representation in top-k and expected distribution.
-                - "discounted_rep_diff" : Difference in discounted representation across ranks.
+            The names/name of the attributes/attribute spanning the groups, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
 
-        conditionals : [bool], optional
-            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
-            The implementation assumes that len(pool) == len(conditionals).
+        metrics : [string], optional
+            The metrics to compute (default: pool diversity only), see measure_report.
 
-        epsilon : float, optional
-            (Optional) Small value to avoid division by zero or log(0).
+        conditionals, browsing_model, browsing_param, k, pool_stage, epsilon, missing : optional
+            See measure_report.
 
         Returns
         -------
-        topk_fairness : float
-            The top-k fairness metric for the specified method.
+        table : pandas.DataFrame
+            One row per group, in the order of the cartesian product of the catalogue values, with a column per attribute,
+            the number of pool members in the group ("count"), the numbers of targeted and accepted group members 
+            ("targeted" and "accepted", with "accept_rate") and a column per metric.
         """
-
-        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
-        ranking_desecr = await self._get_desecritized_attribute_pool(pool, attribute_names)
-        top_k_pool = pool[:k]
-
-        def is_in_group(candidate):
-            return self._check_user_attributes(candidate, attribute_names, attribute_values, ranking_desecr)
-
-        group_indices = [is_in_group(cand) for cand in pool]
-        topk_group_indices = [is_in_group(cand) for cand in top_k_pool]
-
-        secfxp = mpc.SecFxp(64)
-        sum_group_indices = mpc.convert(sum(group_indices), secfxp)
-        sum_topk_group_indices = mpc.convert(sum(topk_group_indices), secfxp)
-
-        total_group_ratio = sum_group_indices / len(pool) if pool else secfxp(0)
-        topk_group_ratio = sum_topk_group_indices / k if k > 0 else secfxp(0)
-
-        if method == "skew":
-            numerator = await mpc.output(topk_group_ratio + epsilon)
-            denominator = await mpc.output(total_group_ratio + epsilon)
-            return math.log(numerator / denominator)
-
-        elif method == "discounted_rep_diff":
-            drd = 0.0
-            for idx, cand in enumerate(top_k_pool):
-                pos = idx + 1
-                group_val = mpc.convert(mpc.if_else(is_in_group(cand), 1, -1), secfxp)
-                drd += group_val / math.log2(pos + 1)
-            
-            drd = await mpc.output(drd)
-            return drd
-
-        else:
-            raise ValueError(f"Unsupported top-k fairness method: {method}")
-    
-    async def measure_accept_rate(self, pool, pool_stage, attribute_names, attribute_values, conditionals=None):
+        groups = self.catalogue.groups(attribute_names)
+        pool, groups, pool_stage = self._assert_report_arguments(pool, groups, metrics, conditionals, k, pool_stage)
+        attribute_names = groups[0].attribute_names
+        doubled_attributes, valid = self._get_valid_attribute_arrays(pool, attribute_names, missing)
+        user_ids = [user_id for user_id, _ in pool]
+        if missing == "drop":
+            user_ids = np.asarray(user_ids, dtype=object)[valid]
+        size = len(user_ids)
+        with trace_phase(self.tracer, "groups"):
+            cells = fairness_metrics.cell_index(doubled_attributes, attribute_names,
+                                                [self.catalogue.attribute_codes[attribute_name] for attribute_name in attribute_names], size)
+
+        statistics = {"count": fairness_metrics.cell_sums(cells, len(groups))}
+        discounts = fairness_metrics.rank_discounts(min(k, size) if k is not None else 0)
+        if "skew" in metrics:
+            statistics["topk_count"] = fairness_metrics.cell_sums(cells[:k], len(groups))
+        if "discounted_rep_diff" in metrics:
+            statistics["discounted"] = fairness_metrics.cell_sums(cells[:k], len(groups), discounts)
+        if "group_exposure" in metrics:
+            browsing_model = fairness_metrics.browsing_model_weights(browsing_model, size, browsing_param)
+            statistics["exposure"] = fairness_metrics.cell_sums(cells, len(groups), browsing_model)
+        if "accept_rate" in metrics:
+            targeted, accepted = fairness_metrics.stage_flags(user_ids, pool_stage)
+            statistics["targeted"] = fairness_metrics.cell_sums(cells, len(groups), targeted)
+            statistics["accepted"] = fairness_metrics.cell_sums(cells, len(groups), targeted & accepted)
+
+        values = fairness_metrics.cell_metrics(statistics, metrics, size, k, epsilon, float(discounts.sum()))
+        return fairness_metrics.cell_table(groups, statistics, values)
+
+
+    @traced("model_owner_id")
+    @cached_result
+    def measure_rankings(self, pool, rankings, attribute_names, attribute_values, metrics=("group_exposure",), offsets=None, 
+                         browsing_model="inverse_log", browsing_param=None, k=None, epsilon=1e-10, missing="unknown"):
         """
-        Outcome fairnss metric. 
-        For demographic parity, measure the proportion of individuals from a given protected group who are finally accepted (accept rate).
-        For equal opportunity, measure the proportion of qualified individuals from a given protected group who are correctly classified (true positive rate).
-        
+        Measures fairness metrics of a given group in many rankings over the same candidates (e.g., one ranking per job).
+        The protected attributes of every candidate are reconstructed only once, and the metrics of all rankings are computed
+        with segment reductions over the concatenated rankings.
+        Every value equals the one returned by the corresponding measure_* method for the ranked candidates.
+
         Parameters
         ----------
-        pool : [string]
-            A pool of candidates: an unordered list of user IDs generated by the service provider during attribute donation.
+        pool : [(string, int)]
+            The candidates: an unordered list of pairs (user_id, secret_attribute_remote), see measure_pool_diversity.
 
-        pool_stage : [(string, bool, bool)]
-            A pool of candidates: an unordered list of pairs (user_id, targeted, accepted), 
-            where the user_id is the user ID corresponding to the pool,
-            targeted is True/False indicating whether the candidate is selected as a target, 
-            and accepted is True/False indicating whether the candidate actually receives positive outcomes.
-            Example for demographic parity: 
-                targeted: all set 1, to include all potential candidates; 
-                accepted: final interview or recruitment decisions.
-            Example for equal opportunity: 
-                targeted: whether the candidate is qualified or not, e.g., based on evaluations by a group of experts; 
-                accepted: final interview or recruitment decisions.
+        rankings : [[int]] | np.ndarray[int]
+            The rankings, as lists of indices into the pool in ranking order, or, with offsets, all rankings concatenated into one array.
 
         attribute_names : [string] | (string) | string
-            The names/name of the attributes/attribute to measure outcome fairness for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+            The names/name of the attributes/attribute of the group, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
 
         attribute_values : [string] | (string) | string
             The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
 
-        conditionals : [bool], optional
-            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
-            The implementation assumes that len(pool) == len(conditionals).
-        
-        Returns
-        -------
-        accept rate : float
-            The fraction of the members of a selected group who receive positive outcomes. 
-            A float number in the [0,1] range.
-        """
-        
-        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
-
-        if conditionals:
-            pool_stage = [ps for ps, cond in zip(pool_stage, conditionals) if cond]
-
-        attribute_pool_desecr = await self._get_desecritized_attribute_pool(pool, attribute_names)
-                
-        stage_dict = {user: (targeted, accepted) for user, targeted, accepted in pool_stage}
-        count_actual_positive, count_true_positive = 0, 0
-        for user_id in pool:
-            targeted, accepted = stage_dict.get(user_id, (False, False))
-            count = self._check_user_attributes(user_id, attribute_names, attribute_values, attribute_pool_desecr)
-            count_actual_positive += (count & targeted)
-            count_true_positive += (count & (targeted & accepted))
-        count_actual_positive = await mpc.output(count_actual_positive)
-        count_true_positive = await mpc.output(count_true_positive)
-        return count_true_positive/count_actual_positive if count_actual_positive else 0
-    
+        metrics : [string], optional
+            The metrics to compute (default: group exposure only). Supported options:
+                - "pool_diversity" : see measure_pool_diversity
+                - "group_exposure" : see measure_group_exposure, computed with browsing_model and browsing_param
+                - "skew", "discounted_rep_diff" : see measure_topk_fairness, computed with k and epsilon
 
+        offsets : np.ndarray[int], optional
+            With concatenated rankings, the boundaries of the rankings: ranking i is rankings[offsets[i]:offsets[i+1]].
 
-    def _compute_confidence_intervals(self, p, n, N=None, confidence=0.95):
+        browsing_model, browsing_param, k, epsilon : optional
+            See measure_report.
 
-        if not (len(p) == len(n) and (N is None or len(N) == len(p))):
-            raise ValueError("Lengths of p, n, and N (if provided) must be equal")
-        
-        z_score = norm.ppf(1 - (1 - confidence) / 2)
-        SE = [np.sqrt(p[i] * (1 - p[i]) / n[i]) * (np.sqrt((N[i] - n[i]) / (N[i] - 1)) if N else 1) for i in range(len(p))]
-        CI = [(p[i] - z_score * SE[i], p[i] + z_score * SE[i]) for i in range(len(p))]
-        
-        return CI, SE
+        missing : string, optional
+            The handling of candidates whose local components are missing (default "unknown"), see measure_pool_diversity.
+            With "drop", they are removed from every ranking, and the candidates ranked below them move up.
 
-    def _plot_confidence_intervals(self, p, n, N=None, labels=None):
-        if len(p) > 20:
-            raise ValueError("Maximum allowed length for p and n is 20")
-        
-        CI, _ = self._compute_confidence_intervals(p, n, N)
-        groups = labels if labels else [f"Group {i+1}" for i in range(len(p))]
-        errors = [(p[i] - CI[i][0], CI[i][1] - p[i]) for i in range(len(p))]
-        
-        plt.figure(figsize=(12, 5))
-        colors = plt.cm.get_cmap("tab10", len(p)).colors
-        
-        plt.bar(groups, p, yerr=np.array(errors).T, capsize=8, color=colors, alpha=0.7)
-        
-        for i in range(len(groups)):
-            text = f"n={n[i]}"
-            if N:
-                text += f"\nN={N[i]}"
-            plt.text(i, p[i] + errors[i][1] + 0.02, text, ha='center', fontsize=10, color='black')
-
-        plt.ylabel("Rate")
-        plt.ylim(0, 1)
-        plt.xticks(rotation=45, ha="right")
-        plt.tight_layout()
-        plt.show()
\ No newline at end of file
+        Returns
+        -------
+        measurements : {string: np.ndarray[float]}
+            For each requested metric, its value in every ranking.
+        """
+        for metric in metrics:
+            if metric not in RANKING_METRICS:
+                raise ValueError(f"Unsupported ranking metric: {metric}")
+        if "skew" in metrics or "discounted_rep_diff" in metrics:
+            assert k is not None, "Top-k metrics require the cutoff rank k"
+        group = self.catalogue.group(attribute_names, attribute_values)
+        indices, starts, lengths, positions = fairness_metrics.ranking_segments(rankings, offsets)
+        assert np.all((indices >= 0) & (indices < len(pool))), "Rankings must hold indices into the pool"
+
+        # the candidates are reconstructed in pool order, so they are kept in place ("unknown") and dropped from the rankings
+        doubled_attributes, valid = self._get_valid_attribute_arrays(pool, group.attribute_names, "unknown" if missing == "drop" else missing)
+        if missing == "drop" and not valid.all():
+            kept = valid[indices]
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(fairness_metrics.segment_sums(kept, starts, lengths), out=offsets[1:])
+            indices, starts, lengths, positions = fairness_metrics.ranking_segments(indices[kept], offsets)
+        with trace_phase(self.tracer, "groups"):
+            in_group = group.mask(doubled_attributes, len(pool))[indices]
+        count_group = fairness_metrics.segment_sums(in_group, starts, lengths)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            group_ratio = np.where(lengths > 0, count_group / lengths, 0.0)
+
+        measurements = {}
+        for metric in metrics:
+            if metric == "pool_diversity":
+                measurements[metric] = group_ratio
+            elif metric == "group_exposure":
+                weights = fairness_metrics.ranking_weights(browsing_model, positions, lengths, browsing_param)
+                measurements[metric] = fairness_metrics.segment_sums(np.where(in_group, weights, 0.0), starts, lengths)
+            elif metric == "skew":
+                count_topk_group = fairness_metrics.segment_sums(in_group & (positions < k), starts, lengths)
+                topk_group_ratio = count_topk_group / k if k > 0 else 0
+                measurements[metric] = np.log((topk_group_ratio + epsilon) / (group_ratio + epsilon))
+            elif metric == "discounted_rep_diff":
+                discounts = fairness_metrics.rank_discounts(int(lengths.max()) if len(lengths) else 0)[positions]
+                signed_discounts = np.where(positions < k, np.where(in_group, discounts, -discounts), 0.0)
+                measurements[metric] = fairness_metrics.segment_sums(signed_discounts, starts, lengths)
+        return measurements
+
+
+def __getattr__(name):
+    # the MPC measurement is defined in its own module, so that the mpyc runtime is only loaded when it is first used
+    if name == "MultipartyFairnessMeasurementMPYC":
+        from findhr.monitoring.secure_measurement import MultipartyFairnessMeasurementMPYC
+        return MultipartyFairnessMeasurementMPYC
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
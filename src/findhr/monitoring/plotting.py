@@ -0,0 +1,61 @@
+# Plots of fairness metrics. This is the only module of findhr.monitoring that imports matplotlib,
+# so that monitoring services running on headless servers never load it.
+import matplotlib.pyplot as plt
+import numpy as np
+
+from findhr.monitoring.intervals import confidence_intervals
+
+
+def plot_confidence_intervals(p, n, N=None, labels=None, confidence=0.95, method="wald", show=True):
+    """
+    Bar plot of the rates of several groups with their confidence intervals.
+    Up to 20 groups are drawn as vertical bars annotated with their sample sizes;
+    more groups are drawn as horizontal bars, in a figure that grows with the number of groups.
+
+    Parameters
+    ----------
+    p, n, N, confidence, method :
+        See confidence_intervals.
+
+    labels : [string], optional
+        The names of the groups (default: Group 1, Group 2, ...).
+
+    show : bool, optional
+        Whether to show the figure (default True).
+
+    Returns
+    -------
+    figure : matplotlib.figure.Figure
+    """
+    p = np.asarray(p, dtype=np.float64)
+    lower, upper, _ = confidence_intervals(p, n, N, confidence, method)
+    groups = labels if labels else [f"Group {i+1}" for i in range(len(p))]
+    errors = np.stack([p - lower, upper - p])
+
+    if len(p) <= 20:
+        figure = plt.figure(figsize=(12, 5))
+        colors = plt.get_cmap("tab10")(np.arange(len(p)) % 10)
+        plt.bar(groups, p, yerr=errors, capsize=8, color=colors, alpha=0.7)
+
+        for i in range(len(groups)):
+            text = f"n={n[i]}"
+            if N is not None:
+                text += f"\nN={N[i]}"
+            plt.text(i, p[i] + errors[1][i] + 0.02, text, ha='center', fontsize=10, color='black')
+
+        plt.ylabel("Rate")
+        plt.ylim(0, 1)
+        plt.xticks(rotation=45, ha="right")
+    else:
+        figure = plt.figure(figsize=(10, max(5, 0.25 * len(p))))
+        positions = np.arange(len(p))
+        plt.barh(positions, p, xerr=errors, capsize=2, color=plt.get_cmap("tab10")(0), alpha=0.7)
+        plt.yticks(positions, groups, fontsize=8)
+        plt.gca().invert_yaxis()
+        plt.xlabel("Rate")
+        plt.xlim(0, 1)
+
+    plt.tight_layout()
+    if show:
+        plt.show()
+    return figure
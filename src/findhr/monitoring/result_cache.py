@@ -0,0 +1,241 @@
+# Cache of measurement results.
+# Dashboards query the same pools and groups again and again: a result is kept under the fingerprint of its request
+# (provider, pool, groups, metric and parameters), and dropped when a component of a user of its pool is stored.
+import collections
+import copy
+import functools
+import inspect
+import threading
+import time
+
+from findhr.monitoring.fingerprint import request_fingerprint
+
+# number of invalidated users remembered to validate the results of computations in progress (see ResultCache.put):
+# a computation that started before the oldest invalidation remembered is not cached
+INVALIDATION_HISTORY = 2**16
+
+
+class ResultCache():
+
+    """
+    LRU cache of measurement results with an optional time to live, invalidated per user.
+
+    Every result is indexed by the users of its pool, so that storing a component of a user (see
+    MultipartyDataHandlerCSV.store) drops exactly the results that depend on it, and a result computed while
+    one of the users of its pool was updated is not cached. The cache is thread-safe.
+    Results are cached and returned as copies, so that modifying a returned result does not modify the cached one.
+
+    Attributes
+    ----------
+    maxsize : int
+        The maximum number of results kept (the least recently used ones are evicted first).
+
+    ttl : float | None
+        The number of seconds a result is kept (None: until evicted or invalidated).
+
+    hits, misses, evictions, invalidations : int
+        The number of lookups answered from the cache, of lookups not answered, of results evicted
+        to make room or expired, and of results dropped because a user of their pool was updated.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        maxsize : int, optional
+            The maximum number of results kept (default 1024).
+
+        ttl : float, optional
+            The number of seconds a result is kept (default None: no expiry).
+
+        clock : callable, optional
+            The clock measuring the time to live (default time.monotonic).
+        """
+        assert maxsize > 0, "The size of the cache must be positive"
+        assert ttl is None or ttl > 0, "The time to live must be positive"
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expiry, provider_id, user_ids, result), in order of use
+        self._entries = collections.OrderedDict()
+        # (provider_id, user_id) -> keys of the results over a pool with the user
+        self._users = {}
+        self._generation = 0
+        # (provider_id, user_id) -> generation of the last invalidation of the user, oldest first
+        self._invalidated = collections.OrderedDict()
+        # computations started before this generation are not cached (invalidations forgotten, or the cache was cleared)
+        self._horizon = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    @property
+    def generation(self):
+        """
+        Counter of invalidations, to be passed to put by computations started at this point.
+        """
+        return self._generation
+
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups answered from the cache (0 before the first lookup).
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+    def stats(self):
+        """
+        The counters of the cache, as a dictionary.
+        """
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+
+    def _drop(self, key):
+        _, provider_id, user_ids, _ = self._entries.pop(key)
+        for user_id in user_ids:
+            keys = self._users.get((provider_id, user_id))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._users[(provider_id, user_id)]
+
+
+    def get(self, key):
+        """
+        Looks up a result.
+
+        Returns
+        -------
+        found : bool
+            Whether the result is cached (and not expired).
+
+        result :
+            The result, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self._clock():
+                self._drop(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[3]
+        return True, copy.deepcopy(result)
+
+
+    def put(self, key, result, provider_id, user_ids, generation=None):
+        """
+        Caches the result of a request over a pool.
+
+        Parameters
+        ----------
+        key : string
+            The fingerprint of the request, see fingerprint.request_fingerprint.
+
+        result :
+            The result.
+
+        provider_id : string
+            The identifier of the service provider.
+
+        user_ids : [string]
+            The users of the pool.
+
+        generation : int, optional
+            The generation of the cache when the computation of the result started: if users of the pool were invalidated
+            since, the result is not cached, as it may have been computed from replaced components.
+        """
+        provider_id = str(provider_id)
+        user_ids = frozenset(str(user_id) for user_id in user_ids)
+        result = copy.deepcopy(result)
+        with self._lock:
+            if generation is not None and (generation < self._horizon or any(
+                    self._invalidated.get((provider_id, user_id), -1) > generation for user_id in user_ids)):
+                return
+            if key in self._entries:
+                self._drop(key)
+            expiry = None if self.ttl is None else self._clock() + self.ttl
+            self._entries[key] = (expiry, provider_id, user_ids, result)
+            for user_id in user_ids:
+                self._users.setdefault((provider_id, user_id), set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+
+    def invalidate_users(self, provider_id, user_ids):
+        """
+        Drops the results over pools with any of the given users of a provider.
+        """
+        provider_id = str(provider_id)
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                user = (provider_id, str(user_id))
+                self._invalidated[user] = self._generation
+                self._invalidated.move_to_end(user)
+                for key in list(self._users.get(user, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+            while len(self._invalidated) > INVALIDATION_HISTORY:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._horizon = max(self._horizon, forgotten)
+
+
+    def clear(self):
+        """
+        Drops all results (the counters are kept).
+        """
+        with self._lock:
+            self._generation += 1
+            self._horizon = self._generation
+            self._invalidated.clear()
+            self._entries.clear()
+            self._users.clear()
+
+
+def cached_result(method):
+    """
+    Decorator of the measurement methods of MultipartyFairnessMeasurement: when the handler has a result cache,
+    the result is looked up under the fingerprint of the provider, the method and all its arguments (defaults included)
+    and cached over the users of the pool (the first argument).
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.result_cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        arguments = dict(arguments.arguments)
+        del arguments["self"]
+        key = request_fingerprint(self.model_owner_id, method.__name__, arguments)
+        found, result = cache.get(key)
+        if found:
+            if self.tracer is not None:
+                self.tracer.count(cache_hits=1)
+            return result
+
+        generation = cache.generation
+        result = method(self, *args, **kwargs)
+        pool = next(iter(arguments.values()))
+        cache.put(key, result, self.model_owner_id, [user_id for user_id, _ in pool], generation)
+        return result
+
+    return wrapper
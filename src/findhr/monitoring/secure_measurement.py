@@ -0,0 +1,674 @@
+import sys
+import math
+import numpy as np
+from mpyc.runtime import mpc
+
+from findhr.monitoring import metrics as fairness_metrics
+from findhr.monitoring.catalogue import compile_catalogue
+from findhr.monitoring.intervals import confidence_intervals
+from findhr.monitoring.monitoring import SENSITIVE_ATTRIBUTE_CATALOGUE, REPORT_METRICS, FIXED_POINT_BITS
+from findhr.monitoring.tracing import traced, trace_phase
+
+
+def _bytes_sent():
+    # bytes sent by this party to the other parties since the start of the mpyc runtime
+    return sum(peer.protocol.nbytes_sent for peer in mpc.parties if peer.pid != mpc.pid and peer.protocol is not None)
+
+
+class MultipartyFairnessMeasurementMPYC():
+
+    """
+    Handler for managing the the measurement of fairness in a multi-party regime supported by mpyc library. 
+    The protected attribute components are stored in two parties.
+    Two-party computation enables the monitoring of fairness metrics without reconstructing sensitive attributes.
+
+    In batched mode (the default), the components of all requested attributes of the whole pool are secret shared
+    with a single input of a secure array, so the number of communication rounds does not grow with the pool size.
+    With batched=False, the components are secret shared attribute by attribute.
+
+    With a tracer (see tracing.py), every call of a measure_* method records the time spent in share lookup, secure inputs,
+    group checks and secure outputs, the number of users and attributes looked up, of input and output rounds and of bytes sent.
+    As mpyc schedules the secure operations lazily, most of their time is recorded in the "output" phase.
+
+    SENSITIVE_ATTRIBUTE_CATALOGUE is compiled when the handler is created (see catalogue.py), 
+    so repeated measurements of a group reuse its cached specification.
+    
+    """
+
+
+    def __init__(self, api_key, data_handler, batched=True, tracer=None):
+
+        if self._authenticate(api_key):
+            self.provider_id = api_key
+
+        else:
+            raise Exception("Could not authenticate model owner")
+
+        self.data_handler = data_handler
+        self.batched = batched
+        self.tracer = tracer
+        # a reimplemented _get_num_attribute_value provides the codes of the catalogue values
+        encode = None if type(self)._get_num_attribute_value is MultipartyFairnessMeasurementMPYC._get_num_attribute_value else self._get_num_attribute_value
+        self.catalogue = compile_catalogue(SENSITIVE_ATTRIBUTE_CATALOGUE, encode)
+
+
+    def _authenticate(self, api_key):
+        """
+        This is a placeholder: the third party should reimplement it 
+        to check whether the provider's ID (e.g., an API key) is OK
+        """
+        return 1
+    
+    def _get_internal_secret(self, user_id, attribute_name):
+        """
+        This is a placeholder: the third party should reimplement it 
+        to retrieve secret attribute components from their storage (e.g., a database)
+        """
+
+        # For now, we assume all the data is available. 
+        return self.data_handler.local_data[self.provider_id][user_id][attribute_name]
+
+    def _get_internal_secrets(self, user_pool, attribute_names):
+        """
+        Batched version of _get_internal_secret: retrieves the local components of the given attributes for a whole pool,
+        as an int64 array with one row per attribute.
+        """
+        if self.tracer is not None:
+            self.tracer.count(users=len(user_pool), attributes=len(attribute_names))
+        local_data = self.data_handler.local_data
+        with trace_phase(self.tracer, "lookup"):
+            if type(self)._get_internal_secret is MultipartyFairnessMeasurementMPYC._get_internal_secret and hasattr(local_data, 'gather_many'):
+                internal_secrets = local_data.gather_many(self.provider_id, user_pool, attribute_names)
+                rows = [internal_secrets[attribute_name][0] for attribute_name in attribute_names]
+            else:
+                # a reimplemented _get_internal_secret, or a handler without a columnar store: retrieve users one by one
+                rows = [np.fromiter((self._get_internal_secret(user_id, attribute_name) for user_id in user_pool),
+                                    dtype=np.int64, count=len(user_pool))
+                        for attribute_name in attribute_names]
+            return np.array(rows, dtype=np.int64).reshape(len(attribute_names), len(user_pool))
+
+    def _input(self, secrets):
+        # secret shares the components of this party with the other parties, in one input round
+        if self.tracer is not None:
+            self.tracer.count(rounds=1)
+        with trace_phase(self.tracer, "input"):
+            return mpc.input(secrets)
+
+    async def _output(self, values):
+        # opens secure values to all parties, in one output round
+        if self.tracer is not None:
+            self.tracer.count(rounds=1)
+        with trace_phase(self.tracer, "output"):
+            return await mpc.output(values)
+
+    async def _reconstruct_secret_attribute_array(self, user_pool, attribute_names):
+        # secret sharing between TTP and SP of a secure array with one row per attribute and one column per user, in pool order:
+        # all attributes at once with a single input (batched), or row by row, with one input per attribute (batched=False)
+        # + reconstruct secret values by adding the components of all parties divided by 2
+        secint = mpc.SecInt(sys.maxsize.bit_length()+1)
+        internal_secrets = secint.array(self._get_internal_secrets(user_pool, attribute_names))
+        if len(mpc.parties) == 1:
+            return internal_secrets
+
+        if self.batched:
+            party_secrets = self._input(internal_secrets)
+        else:
+            party_rows = [self._input(internal_secrets[row]) for row in range(len(attribute_names))]
+            party_secrets = [mpc.np_stack([rows[party] for rows in party_rows]) for party in range(len(mpc.parties))]
+        return sum(party_secrets[1:], party_secrets[0]) / 2
+
+    def _get_num_attribute_value(self, attribute_name, attribute_value):
+        """
+        This is a placeholder: the third party should reimplement it to match their attribute catalogue
+        """
+
+        return SENSITIVE_ATTRIBUTE_CATALOGUE[attribute_name][attribute_value]
+    
+    def _check_group_array(self, attribute_rows, attribute_names, attribute_values):
+        # group membership: attribute_rows holds a secure array over the whole pool for each attribute,
+        # the result is a secure 0/1 array marking the pool members to which all attribute values apply
+        group = self.catalogue.group(attribute_names, attribute_values)
+        in_group = None
+        for attribute_name, attribute_code in zip(group.attribute_names, group.attribute_codes):
+            in_attribute = attribute_rows[attribute_name] == attribute_code
+            in_group = in_attribute if in_group is None else in_group * in_attribute
+        return in_group
+
+    async def _get_group_arrays(self, pool, groups):
+        """
+        Secure group membership of the pool members, for several groups.
+        The attributes of all groups are reconstructed together, only once.
+
+        Parameters
+        ----------
+        pool : [string]
+            A list of user IDs.
+
+        groups : [([string], [string])]
+            The groups as pairs of attribute names and attribute values (e.g., GroupSpec).
+
+        Returns
+        -------
+        in_groups : [secure array]
+            For each group, a secure 0/1 array over the pool (in pool order) marking the members of the group.
+        """
+        secint = mpc.SecInt(sys.maxsize.bit_length()+1)
+        if not pool:
+            return [secint.array(np.zeros(0, dtype=np.int64)) for _ in groups]
+
+        attribute_names = list(dict.fromkeys(name for group_names, _ in groups for name in group_names))
+        attribute_array = await self._reconstruct_secret_attribute_array(pool, attribute_names)
+        attribute_rows = {attribute_name: attribute_array[row] for row, attribute_name in enumerate(attribute_names)}
+        with trace_phase(self.tracer, "groups"):
+            return [self._check_group_array(attribute_rows, group_names, group_values) for group_names, group_values in groups]
+
+    async def _get_group_matrix(self, pool, groups):
+        # the secure group memberships of _get_group_arrays, as a 0/1 matrix with one row per group
+        in_groups = await self._get_group_arrays(pool, groups)
+        if not in_groups:
+            return mpc.SecInt(sys.maxsize.bit_length()+1).array(np.zeros((0, len(pool)), dtype=np.int64))
+        if len(in_groups) == 1:
+            return in_groups[0].reshape(1, len(pool))
+        return mpc.np_stack(in_groups)
+
+    def _fixed_point_weights(self, weights):
+        # public weights encoded as integers with FIXED_POINT_BITS fractional bits: their dot product with a secure 0/1 array
+        # is a local operation on secure integers, without any secure conversion or truncation
+        return np.rint(np.asarray(weights, dtype=np.float64) * 2**FIXED_POINT_BITS).astype(np.int64)
+
+    def _prefix_sums(self, values):
+        # inclusive prefix sums along the last axis of a secure array, with log2(n) vectorized additions of shifted copies
+        shift = 1
+        while shift < values.shape[-1]:
+            values = mpc.np_concatenate((values[..., :shift], values[..., shift:] + values[..., :-shift]), axis=-1)
+            shift *= 2
+        return values
+
+    def _truncated_sums(self, in_groups, weights, cuts):
+        # for every group (row of in_groups) and cut c, the sum of the weights of the group members among the first c positions:
+        # a public linear map of the memberships, evaluated locally on the shares
+        size = in_groups.shape[-1]
+        cuts = np.minimum(np.asarray(cuts, dtype=np.int64), size)
+        if len(cuts) <= max(size.bit_length(), 1):
+            # a few cuts: one product with the matrix of the weights truncated at every cut, in O(len(cuts) * size)
+            return in_groups @ np.where(np.arange(size) < cuts[:, None], weights, 0).T
+        # many cuts: the prefix sums of the weighted memberships, in O(size * log2(size)), read at every cut
+        prefix_sums = self._prefix_sums(in_groups * weights)
+        empty_prefix = type(in_groups).sectype.array(np.zeros((in_groups.shape[0], 1), dtype=np.int64))
+        return mpc.np_concatenate((empty_prefix, prefix_sums), axis=1)[:, cuts]
+
+    async def _open_group_statistics(self, in_groups, pool, metrics, browsing_model, browsing_param, k, pool_stage, counts=False):
+        # the statistics of the groups needed by the metrics (see metrics.cell_metrics), opened together in one output round,
+        # and the sum of the discounts of the top-k positions. The group counts are only opened if a metric needs them (or with counts).
+        top = min(k, len(pool)) if k is not None else 0
+        ones = np.ones(len(pool), dtype=np.int64)
+        names, terms = [], []
+        if counts or "pool_diversity" in metrics or "skew" in metrics:
+            names.append("count")
+            terms.append((ones, [len(pool)]))
+        if "skew" in metrics:
+            names.append("topk_count")
+            terms.append((ones, [top]))
+        if "discounted_rep_diff" in metrics:
+            names.append("discounted")
+            terms.append((self._fixed_point_weights(fairness_metrics.rank_discounts(len(pool))), [top]))
+        if "group_exposure" in metrics:
+            names.append("exposure")
+            terms.append((self._fixed_point_weights(fairness_metrics.browsing_model_weights(browsing_model, len(pool), browsing_param)), [len(pool)]))
+        if "accept_rate" in metrics:
+            targeted, accepted = fairness_metrics.stage_flags(pool, pool_stage)
+            names.extend(["targeted", "accepted"])
+            terms.extend([(targeted.astype(np.int64), [len(pool)]), ((targeted & accepted).astype(np.int64), [len(pool)])])
+
+        statistics = {name: values[:, 0] for name, values in zip(names, await self._open_truncated_sums(in_groups, terms))}
+        for name in ("exposure", "discounted"):
+            if name in statistics:
+                statistics[name] = statistics[name] / 2**FIXED_POINT_BITS
+        return statistics, float(fairness_metrics.rank_discounts(top).sum())
+
+    async def _open_truncated_sums(self, in_groups, terms):
+        """
+        Secure kernel of the measurements: opens public linear functions of the secure group memberships of a ranking.
+        All functions of all groups are evaluated as one linear map of the memberships, locally on the shares, and only their values
+        are opened, together in one output round.
+
+        Parameters
+        ----------
+        in_groups : secure array
+            A 0/1 matrix with one row per group and one column per pool member (in ranking order).
+
+        terms : [(np.ndarray[int64], [int])]
+            The functions, as pairs (weights, cuts) of integer weights of the positions (e.g., ones, or fixed point discounts)
+            and cuts: for every cut c, the sum of the weights of the group members among the first c positions.
+
+        Returns
+        -------
+        values : [np.ndarray[float]]
+            For each term, the opened sums, with one row per group and one column per cut.
+        """
+        n_groups, size = in_groups.shape
+        if not size or not n_groups or not terms:
+            return [np.zeros((n_groups, len(cuts))) for _, cuts in terms]
+
+        sums = mpc.np_concatenate([self._truncated_sums(in_groups, weights, cuts) for weights, cuts in terms], axis=1)
+        opened = np.asarray(await self._output(sums), dtype=np.float64).reshape(n_groups, -1)
+        return np.split(opened, np.cumsum([len(cuts) for _, cuts in terms])[:-1], axis=1)
+
+    def _assert_pool_attribute_names_values(self, pool, attribute_names, attribute_values, conditionals=None):
+        #assertions (the group is validated only the first time it is measured)
+        attribute_names, attribute_values = self.catalogue.group(attribute_names, attribute_values)
+
+        if conditionals: 
+            assert (len(pool) == len(conditionals)), "Size of the conditionals array needs to be equal to the size of the pool"
+            pool = [p for p, cond in zip(pool, conditionals) if cond]
+
+        return pool, attribute_names, attribute_values
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_pool_diversity(self, pool, attribute_names, attribute_values, conditionals=None):
+        """
+        Input fairness metric.
+        Measures the fraction of members of a given protected group in a candidate pool (pool diversity).
+
+
+        Parameters
+        ----------
+        pool : [string]
+            A list of candidates: an unordered list of user IDs generated by the service provider during attribute donation.
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure diversity for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
+            The implementation assumes that len(pool) == len(conditionals).
+
+        Returns
+        -------
+        pool_diversity : float
+            The fraction of the members of a selected group in the candidate pool. 
+            A float number in the [0,1] range (0 for an empty pool).
+        """
+
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+
+        in_groups = await self._get_group_matrix(pool, [(attribute_names, attribute_values)])
+        count, = await self._open_truncated_sums(in_groups, [(np.ones(len(pool), dtype=np.int64), [len(pool)])])
+
+        return count[0, 0] / len(pool) if pool else 0
+
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_group_exposure(self, pool, attribute_names, attribute_values, browsing_model, browsing_param=None):
+        """
+        Output fairness metric. 
+        Measures the exposure of members of a given protected group in a given ranking under a selected browsing model.
+        
+
+        Parameters
+        ----------
+        pool : [string]
+            A ranked list of candidates: an ordered list of user ID generated by the service provider during attribute donation
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure group exposure for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        browsing_model : [float] or string
+            A browsing behavior model indicating the exposure weights across ranking positions (will be normalized to sum to 1). This can be:
+                - A list of floats, where each value represents the exposure weight at a given position
+                - A string specifying a predefined model:
+                    'inverse_log' — assigns exposure proportionally to 1 / log2(position + 2)
+                    'exp_decay' — assigns exposure proportionally to gamma^position (gamma is specified via `browsing_param`, default 0.8)
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
+            The implementation assumes that len(pool) == len(conditionals).
+        
+        browsing_param : float, optional
+            (Optional) parameter to customize browsing model, such as gamma for exp_decay
+        
+        Returns
+        -------
+        group_exposure : float
+            The fraction of exposure the members of a selected group in the candidate pool get in a given ranking. 
+            A float number in the [0,1] range.
+        """
+
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, None)
+
+        browsing_model = fairness_metrics.browsing_model_weights(browsing_model, len(pool), browsing_param)
+
+        in_groups = await self._get_group_matrix(pool, [(attribute_names, attribute_values)])
+
+        # exposure as one secure dot product of the group membership with the (public) browsing model
+        exposure, = await self._open_truncated_sums(in_groups, [(self._fixed_point_weights(browsing_model), [len(pool)])])
+        return exposure[0, 0] / 2**FIXED_POINT_BITS
+    
+    @traced("provider_id", _bytes_sent)
+    async def measure_topk_fairness(self, pool, attribute_names, attribute_values, k, method="skew", conditionals=None, epsilon=1e-10):
+        """
+        Output fairness metric.
+        Supports top-k group fairness metrics including skew and discounted representation difference.
+
+        Parameters
+        ----------
+        pool : [string]
+            A ranked list of candidates: an ordered list of (user_id, secret_attribute_remote).
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure top-k fairness for.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names.
+
+        k : int
+            The cutoff rank (e.g., top-10 means k=10).
+
+        method : string
+            The fairness metric to compute. Supported options:
+                - "skew" : Log ratio between group representation in top-k and expected distribution.
+                - "discounted_rep_diff" : Difference in discounted representation across ranks.
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
+            The implementation assumes that len(pool) == len(conditionals).
+
+        epsilon : float, optional
+            (Optional) Small value to avoid division by zero or log(0).
+
+        Returns
+        -------
+        topk_fairness : float
+            The top-k fairness metric for the specified method.
+        """
+
+        if method not in ("skew", "discounted_rep_diff"):
+            raise ValueError(f"Unsupported top-k fairness method: {method}")
+
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+        return (await self.measure_topk_curve(pool, attribute_names, attribute_values, [k], [method], epsilon=epsilon))[method][0]
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_topk_curve(self, pool, attribute_names, attribute_values, ks=None, metrics=("skew", "discounted_rep_diff"), conditionals=None,
+                                 epsilon=1e-10):
+        """
+        Output fairness metric.
+        Measures top-k fairness metrics for many cutoff ranks at once, with two-party computation.
+        The secure group membership of the ranking is computed once, the group counts and discounted counts at all cutoff ranks
+        are evaluated as one public linear map of the membership (prefix sums, for many cutoff ranks), locally on the shares,
+        and only these values are opened, together in one output round.
+        Every value equals the one returned by measure_topk_fairness for the corresponding k.
+
+        Parameters
+        ----------
+        pool : [string]
+            A ranked list of candidates: an ordered list of user IDs.
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure top-k fairness for.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names.
+
+        ks : [int], optional
+            The cutoff ranks (default: 1..len(pool)).
+
+        metrics : [string], optional
+            The metrics to compute (default: both), "skew" and/or "discounted_rep_diff", see measure_topk_fairness.
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation.
+            The implementation assumes that len(pool) == len(conditionals).
+
+        epsilon : float, optional
+            (Optional) Small value to avoid division by zero or log(0) in "skew".
+
+        Returns
+        -------
+        curves : {string: np.ndarray[float]}
+            For each requested metric, its value for every cutoff rank, in the order of ks.
+        """
+        for metric in metrics:
+            if metric not in ("skew", "discounted_rep_diff"):
+                raise ValueError(f"Unsupported top-k fairness method: {metric}")
+
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+        ks, cuts = fairness_metrics.topk_cuts(ks, len(pool))
+        if not pool:
+            return fairness_metrics.topk_curve_metrics(np.zeros(len(ks)), np.zeros(len(ks)), 0, 0, ks, metrics, epsilon)
+
+        in_groups = await self._get_group_matrix(pool, [(attribute_names, attribute_values)])
+
+        # the group count, the top-k counts and the discounted top-k counts at all cuts, opened in one output round
+        terms = [(np.ones(len(pool), dtype=np.int64), [len(pool)] + (cuts.tolist() if "skew" in metrics else []))]
+        if "discounted_rep_diff" in metrics:
+            terms.append((self._fixed_point_weights(fairness_metrics.rank_discounts(len(pool))), cuts))
+        opened = await self._open_truncated_sums(in_groups, terms)
+
+        count = opened[0][0, 0]
+        topk_counts = opened[0][0, 1:] if "skew" in metrics else np.zeros(len(ks))
+        discounted_counts = opened[1][0] / 2**FIXED_POINT_BITS if "discounted_rep_diff" in metrics else np.zeros(len(ks))
+        return fairness_metrics.topk_curve_metrics(topk_counts, discounted_counts, count, len(pool), ks, metrics, epsilon)
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_accept_rate(self, pool, pool_stage, attribute_names, attribute_values, conditionals=None):
+        """
+        Outcome fairnss metric. 
+        For demographic parity, measure the proportion of individuals from a given protected group who are finally accepted (accept rate).
+        For equal opportunity, measure the proportion of qualified individuals from a given protected group who are correctly classified (true positive rate).
+        
+        Parameters
+        ----------
+        pool : [string]
+            A pool of candidates: an unordered list of user IDs generated by the service provider during attribute donation.
+
+        pool_stage : [(string, bool, bool)]
+            A pool of candidates: an unordered list of pairs (user_id, targeted, accepted), 
+            where the user_id is the user ID corresponding to the pool,
+            targeted is True/False indicating whether the candidate is selected as a target, 
+            and accepted is True/False indicating whether the candidate actually receives positive outcomes.
+            Example for demographic parity: 
+                targeted: all set 1, to include all potential candidates; 
+                accepted: final interview or recruitment decisions.
+            Example for equal opportunity: 
+                targeted: whether the candidate is qualified or not, e.g., based on evaluations by a group of experts; 
+                accepted: final interview or recruitment decisions.
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute to measure outcome fairness for, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
+            The implementation assumes that len(pool) == len(conditionals).
+        
+        Returns
+        -------
+        accept rate : float
+            The fraction of the members of a selected group who receive positive outcomes. 
+            A float number in the [0,1] range.
+        """
+        
+        pool, attribute_names, attribute_values = self._assert_pool_attribute_names_values(pool, attribute_names, attribute_values, conditionals)
+
+        if conditionals:
+            pool_stage = [ps for ps, cond in zip(pool_stage, conditionals) if cond]
+
+        targeted, accepted = fairness_metrics.stage_flags(pool, pool_stage)
+        in_groups = await self._get_group_matrix(pool, [(attribute_names, attribute_values)])
+
+        (count_actual_positive,), (count_true_positive,) = (row[0] for row in await self._open_truncated_sums(
+            in_groups, [(targeted.astype(np.int64), [len(pool)]), ((targeted & accepted).astype(np.int64), [len(pool)])]))
+        return count_true_positive/count_actual_positive if count_actual_positive else 0
+
+
+    def _assert_report_arguments(self, pool, groups, metrics, conditionals=None, k=None, pool_stage=None):
+        #assertions
+        for metric in metrics:
+            if metric not in REPORT_METRICS:
+                raise ValueError(f"Unsupported report metric: {metric}")
+        if "skew" in metrics or "discounted_rep_diff" in metrics:
+            assert k is not None, "Top-k metrics require the cutoff rank k"
+        if "accept_rate" in metrics:
+            assert pool_stage is not None, "The accept rate requires the pool stage"
+
+        groups = [self.catalogue.group(attribute_names, attribute_values) for attribute_names, attribute_values in groups]
+
+        if conditionals: 
+            assert (len(pool) == len(conditionals)), "Size of the conditionals array needs to be equal to the size of the pool"
+            pool = [p for p, cond in zip(pool, conditionals) if cond]
+            if pool_stage is not None:
+                pool_stage = [ps for ps, cond in zip(pool_stage, conditionals) if cond]
+
+        return pool, groups, pool_stage
+
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_report(self, pool, groups, metrics=REPORT_METRICS, conditionals=None, browsing_model="inverse_log", browsing_param=None, 
+                             k=None, pool_stage=None, epsilon=1e-10):
+        """
+        Computes several fairness metrics for several groups in a single pass.
+        The protected attributes of the pool are secret-shared only once (one input round per attribute), all requested metrics 
+        of all requested groups are computed from them, and the results are opened together.
+
+        Parameters
+        ----------
+        pool : [string]
+            A ranked list of candidates: an ordered list of user IDs generated by the service provider during attribute donation.
+
+        groups : [(attribute_names, attribute_values)]
+            The groups to measure, as pairs of attribute names and values in the format accepted by measure_pool_diversity, 
+            e.g. [('gender', 'female'), ('gender', 'male'), (['gender', 'disabled'], ['female', 'True'])].
+
+        metrics : [string], optional
+            The metrics to compute (all by default). Supported options:
+                - "pool_diversity" : see measure_pool_diversity
+                - "group_exposure" : see measure_group_exposure, computed with browsing_model and browsing_param
+                - "skew", "discounted_rep_diff" : see measure_topk_fairness, computed with k and epsilon
+                - "accept_rate" : see measure_accept_rate, computed with pool_stage
+
+        conditionals : [bool], optional
+            (Optional) A list indicating whether individuals at a given position in the pool should be included in the computation. 
+            The implementation assumes that len(pool) == len(conditionals).
+
+        browsing_model : [float] or string, optional
+            The browsing model for "group_exposure" (default 'inverse_log'), see measure_group_exposure.
+
+        browsing_param : float, optional
+            (Optional) parameter to customize browsing model, such as gamma for exp_decay
+
+        k : int, optional
+            The cutoff rank for "skew" and "discounted_rep_diff".
+
+        pool_stage : [(string, bool, bool)], optional
+            The pool stage for "accept_rate", see measure_accept_rate.
+
+        epsilon : float, optional
+            (Optional) Small value to avoid division by zero or log(0) in "skew".
+
+        Returns
+        -------
+        report : {((string), (string)): {string: float}}
+            For each group, keyed by the tuples (attribute_names, attribute_values), the value of each requested metric.
+        """
+
+        pool, groups, pool_stage = self._assert_report_arguments(pool, groups, metrics, conditionals, k, pool_stage)
+
+        in_groups = await self._get_group_matrix(pool, groups)
+
+        # secure statistics of all groups, opened together in one output round
+        statistics, discounts_total = await self._open_group_statistics(in_groups, pool, metrics, browsing_model, browsing_param, k, pool_stage)
+        values = fairness_metrics.cell_metrics(statistics, metrics, len(pool), k, epsilon, discounts_total)
+
+        return {(tuple(group_names), tuple(group_values)): {metric: float(values[metric][idx]) for metric in metrics}
+                for idx, (group_names, group_values) in enumerate(groups)}
+
+    async def _get_cell_arrays(self, pool, attribute_names):
+        """
+        Secure membership of the pool members in every (intersectional) group over the given attributes.
+        The attributes are reconstructed only once, each attribute is compared with all its catalogue values at once,
+        and the memberships of the cells are the products of the memberships of their values.
+
+        Returns
+        -------
+        in_cells : secure array
+            A 0/1 matrix with one row per cell (in the order of CompiledCatalogue.groups) and one column per pool member.
+        """
+        secint = mpc.SecInt(sys.maxsize.bit_length()+1)
+        attribute_codes = [self.catalogue.attribute_codes[attribute_name] for attribute_name in attribute_names]
+        if not pool:
+            return secint.array(np.zeros((math.prod(len(codes) for codes in attribute_codes), 0), dtype=np.int64))
+
+        attribute_array = await self._reconstruct_secret_attribute_array(pool, attribute_names)
+        attribute_rows = [attribute_array[row] for row in range(len(attribute_names))]
+
+        in_cells = None
+        with trace_phase(self.tracer, "groups"):
+            for attribute_row, codes in zip(attribute_rows, attribute_codes):
+                in_values = attribute_row == codes[:, None]
+                if in_cells is None:
+                    in_cells = in_values
+                else:
+                    in_cells = (in_cells[:, None, :] * in_values[None, :, :]).reshape(len(in_cells) * len(codes), len(pool))
+        return in_cells
+
+    @traced("provider_id", _bytes_sent)
+    async def measure_all_groups(self, pool, attribute_names, metrics=("pool_diversity",), conditionals=None, browsing_model="inverse_log", 
+                                 browsing_param=None, k=None, pool_stage=None, epsilon=1e-10):
+        """
+        Computes fairness metrics for every (intersectional) group over the given attributes, i.e., for every combination 
+        of their catalogue values (e.g., gender x disabled), with two-party computation.
+        The protected attributes of the pool are secret shared only once, the statistics of all groups are computed
+        as secure sums and dot products of one membership matrix, and they are opened together in one output round.
+
+        Parameters
+        ----------
+        pool : [string]
+            A ranked list of user IDs.
+
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute spanning the groups, as specified in the third party's SENSITIVE_ATTRIBUTE_CATALOGUE
+
+        metrics : [string], optional
+            The metrics to compute (default: pool diversity only), see measure_report.
+
+        conditionals, browsing_model, browsing_param, k, pool_stage, epsilon : optional
+            See measure_report.
+
+        Returns
+        -------
+        table : pandas.DataFrame
+            One row per group, see MultipartyFairnessMeasurement.measure_all_groups.
+        """
+        groups = self.catalogue.groups(attribute_names)
+        pool, groups, pool_stage = self._assert_report_arguments(pool, groups, metrics, conditionals, k, pool_stage)
+        in_cells = await self._get_cell_arrays(pool, groups[0].attribute_names)
+
+        # secure statistics of all cells, opened together in one output round
+        statistics, discounts_total = await self._open_group_statistics(in_cells, pool, metrics, browsing_model, browsing_param, k, pool_stage,
+                                                                        counts=True)
+
+        values = fairness_metrics.cell_metrics(statistics, metrics, len(pool), k, epsilon, discounts_total)
+        return fairness_metrics.cell_table(groups, statistics, values)
+    
+
+
+    def _compute_confidence_intervals(self, p, n, N=None, confidence=0.95, method="wald"):
+        # see findhr.monitoring.intervals.confidence_intervals
+        lower, upper, SE = confidence_intervals(p, n, N, confidence, method)
+        CI = list(zip(lower.tolist(), upper.tolist()))
+
+        return CI, SE.tolist()
+
+    def _plot_confidence_intervals(self, p, n, N=None, labels=None, confidence=0.95, method="wald"):
+        # matplotlib is only imported when plotting, see findhr.monitoring.plotting
+        from findhr.monitoring.plotting import plot_confidence_intervals
+        plot_confidence_intervals(p, n, N, labels, confidence, method)
@@ -0,0 +1,212 @@
+import asyncio
+import concurrent.futures
+import copy
+import functools
+import multiprocessing
+import os
+import types
+
+from findhr.monitoring.fingerprint import request_fingerprint
+from findhr.monitoring.sharded_store import ShardedShareStore
+
+# the measurements served, all of them taking the pool as first argument
+MEASUREMENT_METHODS = ("measure_pool_diversity", "measure_group_exposure", "measure_topk_fairness", "measure_accept_rate",
+                       "measure_report", "measure_all_groups", "measure_rankings", "measure_coverage", "measure_topk_curve")
+
+# pools from this size are measured in the worker processes (if any)
+OFFLOAD_SIZE = 10000
+
+_worker_measurement = None
+
+
+def _init_worker(measurement):
+    global _worker_measurement
+    _worker_measurement = measurement
+
+
+def _measure_in_worker(method, args, kwargs):
+    return getattr(_worker_measurement, method)(*args, **kwargs)
+
+
+class FairnessMonitoringService():
+
+    """
+    Asyncio front end of a MultipartyFairnessMeasurement, for a third party serving many concurrent metric requests.
+
+    Requests are run outside of the event loop, so that the loop keeps accepting requests while metrics are computed:
+    small pools in a thread pool that reads the live store of the data handler, large pools (CPU-bound) in a pool
+    of worker processes. The worker processes are spawned, not forked, and every one of them holds a read-only copy
+    of the store, pickled when the workers are started (a SQLiteShareStore is reopened from its database, and sees
+    the committed components only): refresh must be called for them to see components stored afterwards.
+    A ShardedShareStore already measures in the worker processes of its shards, which cannot be shared with other
+    processes: with a sharded store, all requests are measured in threads. As with any spawned process, a script
+    starting the service with worker processes must do so under an if __name__ == "__main__" guard.
+
+    Identical requests (same method, pool, groups and parameters) received while one of them is running are coalesced:
+    they wait for the same computation. The number of requests computed at the same time is bounded, so that a burst
+    of requests queues up instead of slowing down every request in progress.
+
+    Every measurement of MEASUREMENT_METHODS is served by measure, and by a coroutine method of the same name
+    (e.g., await service.measure_report(pool, groups)).
+
+    Attributes
+    ----------
+    measurement : MultipartyFairnessMeasurement
+        The measurement handler.
+
+    offload_size : int
+        The pool size from which requests are measured in the worker processes.
+
+    requests : int
+        The number of requests received.
+
+    coalesced : int
+        The number of requests answered by the computation of an identical request.
+    """
+
+    def __init__(self, measurement, max_concurrency=None, thread_workers=None, process_workers=0, offload_size=OFFLOAD_SIZE):
+        """
+        Parameters
+        ----------
+        measurement : MultipartyFairnessMeasurement
+            The measurement handler.
+
+        max_concurrency : int, optional
+            The maximum number of requests computed at the same time (default: the number of threads and processes).
+
+        thread_workers : int, optional
+            The number of threads measuring small pools (default: as concurrent.futures.ThreadPoolExecutor).
+
+        process_workers : int, optional
+            The number of worker processes measuring large pools (default 0: all requests are measured in threads).
+            Ignored with a ShardedShareStore.
+
+        offload_size : int, optional
+            The pool size from which requests are measured in the worker processes (default OFFLOAD_SIZE).
+        """
+        assert process_workers >= 0, "The number of worker processes must be non-negative"
+        assert max_concurrency is None or max_concurrency > 0, "The maximum concurrency must be positive"
+
+        self.measurement = measurement
+        self.offload_size = offload_size
+        self.requests = 0
+        self.coalesced = 0
+
+        if thread_workers is None:
+            thread_workers = min(32, (os.cpu_count() or 1) + 4)
+        self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=thread_workers)
+        self._process_workers = process_workers
+        self._process_pool = None
+        self._start_process_pool()
+        if max_concurrency is None:
+            max_concurrency = thread_workers + process_workers
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        self._inflight = {}
+
+
+    def _start_process_pool(self):
+        local_data = self.measurement.data_handler.local_data
+        if not self._process_workers or isinstance(local_data, ShardedShareStore):
+            return
+        # the workers get the measurement with its store only, not the rest of the data handler (e.g., an open journal)
+        measurement = copy.copy(self.measurement)
+        measurement.data_handler = types.SimpleNamespace(local_data=local_data)
+        # the workers would not see the invalidations of the result cache, and their traces would not reach the tracer
+        measurement.result_cache = None
+        measurement.tracer = None
+        # forked workers would inherit the threads and open connections of the store (e.g., a SQLite connection) in
+        # whatever state they are in: spawned workers unpickle the measurement, and reopen what the store needs
+        self._process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self._process_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                                    initializer=_init_worker, initargs=(measurement,))
+
+
+    def refresh(self):
+        """
+        Restarts the worker processes, so that they measure with the components stored since they were started.
+        Requests already submitted to the previous workers complete normally.
+        """
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+        self._start_process_pool()
+
+
+    def close(self):
+        """
+        Shuts down the threads and the worker processes, after the requests in progress complete.
+        """
+        self._thread_pool.shutdown()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+    async def _compute(self, method, args, kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            if self._process_pool is not None and len(args[0]) >= self.offload_size:
+                return await loop.run_in_executor(self._process_pool, _measure_in_worker, method, args, kwargs)
+            return await loop.run_in_executor(self._thread_pool, functools.partial(getattr(self.measurement, method), *args, **kwargs))
+
+
+    async def measure(self, method, pool, *args, **kwargs):
+        """
+        Serves a measurement request.
+
+        Parameters
+        ----------
+        method : string
+            The name of the measurement method of MultipartyFairnessMeasurement, one of MEASUREMENT_METHODS.
+
+        pool : [(string, int | dict)]
+            The pool, as for the measurement method.
+
+        *args, **kwargs :
+            The other arguments of the measurement method.
+
+        Returns
+        -------
+        The result of the measurement method. Coalesced requests share the same result object.
+        """
+        if method not in MEASUREMENT_METHODS:
+            raise ValueError(f"Unsupported measurement: {method}")
+
+        self.requests += 1
+        args = (pool,) + args
+        key = request_fingerprint(self.measurement.model_owner_id, method, args, kwargs)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._compute(method, args, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # a cancelled request does not cancel the computation shared with identical requests
+        return await asyncio.shield(task)
+
+
+def _serve(method):
+    # a coroutine method of FairnessMonitoringService serving the measurement method of the same name
+    async def serve(self, pool, *args, **kwargs):
+        return await self.measure(method, pool, *args, **kwargs)
+
+    serve.__name__ = method
+    serve.__qualname__ = f"FairnessMonitoringService.{method}"
+    serve.__doc__ = f"""
+        See MultipartyFairnessMeasurement.{method}.
+        """
+    return serve
+
+
+for _method in MEASUREMENT_METHODS:
+    setattr(FairnessMonitoringService, _method, _serve(_method))
@@ -0,0 +1,317 @@
+# Share store partitioned across worker processes.
+# Users are assigned to shards by a stable hash of their identifier, and every shard is a ShareStore held by its own
+# worker process. Lookups and group counts of a pool fan out to the shards holding its users, and the partial results
+# are merged: counts and weighted sums (e.g., exposure) of group members are exact sums over the shards.
+import concurrent.futures
+
+import numpy as np
+
+from findhr.monitoring import metrics as fairness_metrics
+from findhr.monitoring.share_store import ShareStore, _ProviderView
+
+_shard_store = None
+
+
+def _store_columns(store, provider_columns, shard=None, n_shards=None):
+    # writes the columns of the providers of a store (see ShareStore.columns), those of the users of one shard only
+    # if a shard is given: one vectorized write per provider and attribute
+    for provider_id, (user_ids, columns) in provider_columns.items():
+        selected = shard_of(user_ids, n_shards) == shard if shard is not None else True
+        for attribute_name, (secret_values, present) in columns.items():
+            stored = present & selected
+            store.set_many(provider_id, user_ids[stored], attribute_name, secret_values[stored])
+
+
+def _columns(store):
+    return {provider_id: store.columns(provider_id) for provider_id in store.providers()}
+
+
+def _init_shard(filename, shard, n_shards):
+    # every worker reads the file itself and keeps the components of its own users only
+    global _shard_store
+    _shard_store = ShareStore()
+    if filename is not None:
+        _store_columns(_shard_store, _columns(ShareStore.load(filename)), shard, n_shards)
+
+
+def _call_shard(method, *args):
+    return getattr(_shard_store, method)(*args)
+
+
+def _shard_columns():
+    return _columns(_shard_store)
+
+
+def _shard_group_sums(provider_id, user_ids, remote_secrets, groups, weights):
+    # reconstructs the attributes of the users of the shard and sums the weights of the members of every group
+    # (users with missing components are members of no group)
+    local_secrets = _shard_store.gather_many(provider_id, user_ids, list(remote_secrets))
+    doubled_attributes = {attribute_name: remote_secrets[attribute_name] + local_secrets[attribute_name][0]
+                          for attribute_name in remote_secrets}
+    valid = np.ones(len(user_ids), dtype=bool)
+    for _, found in local_secrets.values():
+        valid &= found
+    masks = np.array([fairness_metrics.group_mask(doubled_attributes, attribute_names, attribute_codes, len(user_ids))
+                      for attribute_names, attribute_codes in groups], dtype=bool).reshape(len(groups), len(user_ids)) & valid
+    counts = np.count_nonzero(masks, axis=1)
+    sums = masks.astype(np.float64) @ weights if weights is not None else None
+    return counts, sums, int(np.count_nonzero(valid))
+
+
+# parameters of the 64-bit FNV-1a hash
+_FNV_OFFSET, _FNV_PRIME = np.uint64(14695981039346656037), np.uint64(1099511628211)
+
+
+def shard_of(user_ids, n_shards):
+    """
+    The shard of every user: a 64-bit FNV-1a hash of the code points of the identifier modulo the number of shards,
+    computed column by column over a NumPy string array, and stable across processes and sessions.
+    """
+    user_ids = np.asarray(user_ids, dtype=str)
+    hashes = np.full(len(user_ids), _FNV_OFFSET, dtype=np.uint64)
+    if len(user_ids):
+        code_points = user_ids.view(np.uint32).reshape(len(user_ids), -1)
+        for column in code_points.T:
+            # the NUL padding of shorter identifiers is skipped
+            hashes = np.where(column != 0, (hashes ^ column.astype(np.uint64)) * _FNV_PRIME, hashes)
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+class ShardedShareStore():
+
+    """
+    Storage of secret attribute components partitioned by user into shards, each held by a worker process,
+    with the interface of ShareStore.
+
+    The components of a user are in the shard shard_of(user_id), so the store can grow beyond the memory of a single
+    process, and the lookups of a pool run in parallel in the shards. The store is loaded by the worker processes
+    themselves: from a binary snapshot, every worker memory-maps the file and copies the components of its own users
+    only, so the whole store is never held by a single process (a csv file is parsed by every worker, and then
+    dropped but for its own users). With group_sums, the shards also reconstruct
+    the protected attributes of their users and count the group members, so that only partial counts are merged.
+
+    Attributes
+    ----------
+    n_shards : int
+        The number of shards (and worker processes).
+    """
+
+    def __init__(self, n_shards, filename=None):
+        """
+        Parameters
+        ----------
+        n_shards : int
+            The number of shards.
+
+        filename : string, optional
+            A binary snapshot or csv file to load the store from, see ShareStore.load (default: the store is empty).
+        """
+        assert n_shards > 0, "The number of shards must be positive"
+
+        self.n_shards = n_shards
+        self._shards = [concurrent.futures.ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=(filename, shard, n_shards))
+                        for shard in range(n_shards)]
+        # the workers are started lazily: make them load their partitions now, so that a file that cannot be loaded
+        # fails here (with BrokenProcessPool) rather than at the first lookup
+        self._all_shards(_call_shard, "__len__")
+
+
+    def to_csv(self, filename):
+        """
+        Writes the store to a csv file, see ShareStore.to_csv.
+        """
+        self.save(filename, snapshot=False)
+
+
+    def save(self, filename, snapshot=None):
+        """
+        Writes the store to a binary snapshot or to a csv file, see ShareStore.save.
+        The columns of the shards are gathered into a single ShareStore, which is then written.
+        """
+        store = ShareStore()
+        for provider_columns in self._all_shards(_shard_columns):
+            _store_columns(store, provider_columns)
+        store.save(filename, snapshot)
+
+
+    def close(self):
+        """
+        Stops the worker processes of the shards.
+        """
+        for shard in self._shards:
+            shard.shutdown()
+
+
+    def _partition(self, user_ids):
+        # positions of the given users in every shard
+        shards = shard_of(user_ids, self.n_shards)
+        order = np.argsort(shards, kind="stable")
+        bounds = np.searchsorted(shards[order], np.arange(self.n_shards + 1))
+        return [order[bounds[shard]:bounds[shard + 1]] for shard in range(self.n_shards)]
+
+
+    def _shard(self, user_id):
+        return self._shards[int(shard_of([user_id], self.n_shards)[0])]
+
+
+    def _all_shards(self, function, *args):
+        return [future.result() for future in [shard.submit(function, *args) for shard in self._shards]]
+
+
+    def get(self, provider_id, user_id, attribute_name, default=0):
+        """
+        Returns the secret component stored for a provider, user and attribute (default if there is none).
+        """
+        return self._shard(user_id).submit(_call_shard, "get", provider_id, user_id, attribute_name, default).result()
+
+
+    def set(self, provider_id, user_id, attribute_name, secret_value):
+        """
+        Stores the secret component of a provider, user and attribute.
+        """
+        self.set_many(provider_id, [user_id], attribute_name, [secret_value])
+
+
+    def set_many(self, provider_id, user_ids, attribute_name, secret_values):
+        """
+        Vectorized version of set, see ShareStore.set_many: the components are written by the shards in parallel.
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        secret_values = np.asarray(secret_values, dtype=np.int64)
+        assert len(user_ids) == len(secret_values), "Number of users must be equal to the number of secret values"
+
+        futures = [self._shards[shard].submit(_call_shard, "set_many", provider_id, user_ids[positions], attribute_name,
+                                              secret_values[positions])
+                   for shard, positions in enumerate(self._partition(user_ids)) if len(positions)]
+        for future in futures:
+            future.result()
+
+
+    def gather(self, provider_id, user_ids, attribute_name):
+        """
+        Vectorized lookup of the secret components of one attribute for many users of a provider, see ShareStore.gather.
+        """
+        return self.gather_many(provider_id, user_ids, [attribute_name])[attribute_name]
+
+
+    def gather_many(self, provider_id, user_ids, attribute_names):
+        """
+        Vectorized lookup of the secret components of several attributes for many users of a provider, see ShareStore.gather_many.
+        The shards look up their users in parallel.
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        components = {attribute_name: (np.zeros(len(user_ids), dtype=np.int64), np.zeros(len(user_ids), dtype=bool))
+                      for attribute_name in attribute_names}
+        partition = [(positions, self._shards[shard].submit(_call_shard, "gather_many", provider_id, user_ids[positions], list(attribute_names)))
+                     for shard, positions in enumerate(self._partition(user_ids)) if len(positions)]
+        for positions, future in partition:
+            for attribute_name, (secret_values, found) in future.result().items():
+                components[attribute_name][0][positions] = secret_values
+                components[attribute_name][1][positions] = found
+        return components
+
+
+    def group_sums(self, provider_id, user_ids, remote_secrets, groups, weights=None):
+        """
+        Counts the members of groups in a pool, with the attributes reconstructed in the shards.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider.
+
+        user_ids : [string]
+            The users of the pool.
+
+        remote_secrets : {string: np.ndarray[int64]}
+            For every attribute of the groups, the remote components of the users, in the order of user_ids.
+
+        groups : [((string), (int))]
+            The groups, as pairs of attribute names and codes (e.g., GroupSpec attribute_names and attribute_codes).
+
+        weights : np.ndarray[float], optional
+            A weight for every user, e.g., exposure weights of the positions of a ranking.
+
+        Returns
+        -------
+        counts : np.ndarray[int]
+            The number of members of every group.
+
+        sums : np.ndarray[float] | None
+            The sum of the weights of the members of every group (None without weights).
+
+        covered : int
+            The number of users with all the components of the attributes (users with missing components are members of no group).
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        groups = [(tuple(attribute_names), tuple(attribute_codes)) for attribute_names, attribute_codes in groups]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)[:len(user_ids)]
+        futures = [self._shards[shard].submit(_shard_group_sums, provider_id, user_ids[positions],
+                                              {attribute_name: np.asarray(secrets)[positions] for attribute_name, secrets in remote_secrets.items()},
+                                              groups, None if weights is None else weights[positions])
+                   for shard, positions in enumerate(self._partition(user_ids)) if len(positions)]
+
+        counts = np.zeros(len(groups), dtype=np.int64)
+        sums = np.zeros(len(groups), dtype=np.float64) if weights is not None else None
+        covered = 0
+        for future in futures:
+            shard_counts, shard_sums, shard_covered = future.result()
+            counts += shard_counts
+            covered += shard_covered
+            if sums is not None:
+                sums += shard_sums
+        return counts, sums, covered
+
+
+    def providers(self):
+        return list(dict.fromkeys(provider_id for providers in self._all_shards(_call_shard, "providers") for provider_id in providers))
+
+
+    def users(self, provider_id):
+        return [user_id for users in self._all_shards(_call_shard, "users", provider_id) for user_id in users]
+
+
+    def has_user(self, provider_id, user_id):
+        return self._shard(user_id).submit(_call_shard, "has_user", provider_id, user_id).result()
+
+
+    def count_users(self, provider_id):
+        return sum(self._all_shards(_call_shard, "count_users", provider_id))
+
+
+    def attributes(self, provider_id, user_id):
+        return self._shard(user_id).submit(_call_shard, "attributes", provider_id, user_id).result()
+
+
+    def rows(self):
+        """
+        Iterates over all stored components as (provider_id, user_id, attribute_name, secret_value) tuples, shard by shard.
+        The shards return their columns (see ShareStore.columns), from which the rows are read as in ShareStore.rows.
+        """
+        for provider_columns in self._all_shards(_shard_columns):
+            store = ShareStore()
+            _store_columns(store, provider_columns)
+            yield from store.rows()
+
+
+    def __len__(self):
+        return sum(self._all_shards(_call_shard, "__len__"))
+
+
+    # dictionary-style access: store[provider_id][user_id][attribute_name]
+
+    def __getitem__(self, provider_id):
+        return _ProviderView(self, provider_id)
+
+
+    def __contains__(self, provider_id):
+        return any(self._all_shards(_call_shard, "__contains__", provider_id))
+
+
+    def __iter__(self):
+        return iter(self.providers())
+
+
+    def keys(self):
+        return self.providers()
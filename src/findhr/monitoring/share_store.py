@@ -0,0 +1,748 @@
+import csv
+import json
+import os
+import struct
+
+import numpy as np
+
+# Binary snapshots of a ShareStore (see ShareStore.to_snapshot):
+#   - the magic bytes SNAPSHOT_MAGIC and the length of the header, as a little-endian uint64,
+#   - the header, a JSON object {"version": 1, "attributes": [attribute names, by code],
+#     "providers": [{"provider_id": ..., "ids": section, "sorter": section, "columns": {attribute code: [shares section, present section]}}],
+#     "sections": [[offset, dtype, length]]},
+#   - the sections: the interned user IDs of every provider (a fixed-width unicode array), their sort order (int64),
+#     and the int64 share and boolean presence columns, each at an offset (from the end of the header) aligned to 64 bytes.
+SNAPSHOT_MAGIC = b"FINDHRSS"
+SNAPSHOT_VERSION = 1
+
+# files with this suffix are loaded and saved as binary snapshots by ShareStore.load and ShareStore.save
+SNAPSHOT_SUFFIX = ".snapshot"
+
+_SNAPSHOT_ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return -(-offset // _SNAPSHOT_ALIGNMENT) * _SNAPSHOT_ALIGNMENT
+
+
+class _IdIndex():
+
+    """
+    Interned string identifiers with vectorized lookup.
+
+    Identifiers receive dense integer codes in insertion order. Lookups run a binary search over a sorted view
+    of the identifiers; codes assigned after the sorted view was last rebuilt are kept in a small hash table
+    until there are enough of them to justify re-sorting.
+    """
+
+    def __init__(self, ids=()):
+        ids = np.asarray(ids, dtype=str)
+        self._ids = ids.copy()
+        self._size = len(ids)
+        self._reindex()
+
+
+    @classmethod
+    def _from_sorted(cls, ids, sorter):
+        # an index over identifiers with their sort order already computed (e.g., read-only arrays mapped from a snapshot)
+        index = cls.__new__(cls)
+        index._ids = ids
+        index._size = len(ids)
+        index._sorter = sorter
+        index._sorted_size = len(ids)
+        index._recent = {}
+        index._recent_sorter = None
+        return index
+
+
+    def __len__(self):
+        return self._size
+
+
+    def __getitem__(self, code):
+        return str(self._ids[code])
+
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+
+    def _reindex(self):
+        self._sorter = np.argsort(self._ids[:self._size], kind='stable')
+        self._sorted_size = self._size
+        self._recent = {}
+        self._recent_sorter = None
+
+
+    def _reserve(self, extra, itemsize):
+        # grows the identifier buffer geometrically, widening the string dtype if needed
+        needed = self._size + extra
+        width = max(self._ids.dtype.itemsize // 4, itemsize, 1)
+        if needed > len(self._ids) or width > self._ids.dtype.itemsize // 4:
+            grown = np.empty(max(needed, 2 * len(self._ids), 16), dtype=f'U{width}')
+            grown[:self._size] = self._ids[:self._size]
+            self._ids = grown
+
+
+    def get(self, user_id):
+        """
+        Returns the code of a single identifier, or -1 if it is unknown.
+        """
+        user_id = str(user_id)
+        code = self._recent.get(user_id)
+        if code is not None:
+            return code
+
+        n = self._sorted_size
+        if n == 0 or len(user_id) > self._ids.dtype.itemsize // 4:
+            return -1
+
+        pos = int(np.searchsorted(self._ids[:n], user_id, sorter=self._sorter))
+        if pos < n and self._ids[self._sorter[pos]] == user_id:
+            return int(self._sorter[pos])
+        return -1
+
+
+    def get_many(self, user_ids):
+        """
+        Returns an int64 array with the codes of the given identifiers (-1 for unknown identifiers).
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        codes = np.full(len(user_ids), -1, dtype=np.int64)
+
+        n = self._sorted_size
+        if n:
+            pos = np.searchsorted(self._ids[:n], user_ids, sorter=self._sorter)
+            candidates = self._sorter[np.minimum(pos, n - 1)]
+            found = (pos < n) & (self._ids[candidates] == user_ids)
+            codes[found] = candidates[found]
+
+        if self._size > n:
+            missing = np.flatnonzero(codes < 0)
+            if len(missing):
+                recent = self._ids[n:self._size]
+                if self._recent_sorter is None:
+                    self._recent_sorter = np.argsort(recent, kind='stable')
+                pos = np.searchsorted(recent, user_ids[missing], sorter=self._recent_sorter)
+                candidates = self._recent_sorter[np.minimum(pos, len(recent) - 1)]
+                found = (pos < len(recent)) & (recent[candidates] == user_ids[missing])
+                codes[missing[found]] = n + candidates[found]
+
+        return codes
+
+
+    def add(self, user_id):
+        """
+        Returns the code of an identifier, interning it first if it is unknown.
+        """
+        user_id = str(user_id)
+        code = self.get(user_id)
+        if code >= 0:
+            return code
+
+        self._reserve(1, len(user_id))
+        code = self._size
+        self._ids[code] = user_id
+        self._size += 1
+        self._recent[user_id] = code
+        self._recent_sorter = None
+        self._maybe_reindex()
+        return code
+
+
+    def add_many(self, user_ids):
+        """
+        Vectorized version of add: returns the codes of all given identifiers, interning the unknown ones
+        in order of first appearance.
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        codes = self.get_many(user_ids)
+        missing = np.flatnonzero(codes < 0)
+        if len(missing) == 0:
+            return codes
+
+        new_ids, first, inverse = np.unique(user_ids[missing], return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        start = self._size
+        self._reserve(len(new_ids), user_ids.dtype.itemsize // 4)
+        self._ids[start:start + len(new_ids)] = new_ids[order]
+        self._size += len(new_ids)
+        codes[missing] = start + rank[inverse.reshape(-1)]
+
+        self._recent.update(zip(new_ids[order].tolist(), range(start, self._size)))
+        self._recent_sorter = None
+        self._maybe_reindex()
+        return codes
+
+
+    def _maybe_reindex(self):
+        # re-sorting is O(n log n), so only do it once the unsorted tail is a sizeable fraction of the index
+        if self._size - self._sorted_size > max(1024, self._sorted_size // 8):
+            self._reindex()
+
+
+
+class _ProviderTable():
+
+    """
+    Share columns of a single service provider.
+
+    Users are interned to dense codes; each attribute is an int64 column indexed by user code,
+    with a boolean column marking which users have donated that attribute.
+    """
+
+    def __init__(self, users=None):
+        self.users = users if users is not None else _IdIndex()
+        self.capacity = max(len(self.users), 16)
+        self.shares = {}    # attribute code -> int64 share column
+        self.present = {}   # attribute code -> bool column
+
+
+    def column(self, attribute_code):
+        if attribute_code not in self.shares:
+            self.shares[attribute_code] = np.zeros(self.capacity, dtype=np.int64)
+            self.present[attribute_code] = np.zeros(self.capacity, dtype=bool)
+        return self.shares[attribute_code], self.present[attribute_code]
+
+
+    def reserve(self, size):
+        if size <= self.capacity:
+            return
+        capacity = max(size, 2 * self.capacity)
+        for attribute_code in self.shares:
+            shares = np.zeros(capacity, dtype=np.int64)
+            shares[:self.capacity] = self.shares[attribute_code]
+            present = np.zeros(capacity, dtype=bool)
+            present[:self.capacity] = self.present[attribute_code]
+            self.shares[attribute_code], self.present[attribute_code] = shares, present
+        self.capacity = capacity
+
+
+    def __len__(self):
+        return int(sum(np.count_nonzero(present[:len(self.users)]) for present in self.present.values()))
+
+
+
+class ShareStore():
+
+    """
+    Compact, array-backed storage of secret attribute components.
+
+    Replaces the three-level dictionary local_data[provider_id][user_id][attribute_name] = secret_value
+    used by the CSV handlers. Provider, user and attribute identifiers are interned to integer codes and the
+    secret components are kept in int64 NumPy columns (one per provider and attribute), indexed by user code.
+    The store can be read and written with the same three-level item access as the dictionary it replaces:
+    as with the defaultdict, reading a missing component returns 0.
+
+    Besides the item access, the store offers vectorized bulk operations (set_many, gather, gather_many)
+    and fast CSV loading for large numbers of donated attributes.
+
+    A store can also be saved as a binary snapshot (to_snapshot) and memory-mapped from it (from_snapshot):
+    opening a snapshot does not parse anything, and processes mapping the same snapshot share one copy of it
+    in the page cache. Components stored afterwards are copied to private memory, the snapshot file is never modified.
+    """
+
+    def __init__(self):
+        self._providers = {}    # provider_id -> _ProviderTable
+        self._attributes = {}   # attribute_name -> attribute code
+
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Loads a store from a csv file with rows of the following comma-separated values:
+        provider id, user id, attribute name, secret value. Rows with a different number of values are ignored.
+
+        Parameters
+        ----------
+        filename : string
+            Name of the csv file to load data from.
+
+        Returns
+        -------
+        store : ShareStore
+        """
+        import pandas as pd
+
+        store = cls()
+        columns = ['provider_id', 'user_id', 'attribute_name', 'secret_value']
+        read_options = dict(header=None, names=columns, keep_default_na=False, on_bad_lines='skip', engine='c')
+        try:
+            frame = pd.read_csv(filename, na_filter=False, dtype={
+                'provider_id': object, 'user_id': object, 'attribute_name': object, 'secret_value': np.int64}, **read_options)
+        except pd.errors.EmptyDataError:
+            return store
+        except ValueError:
+            # slow path for files with incomplete rows: parse the secret values as text and skip the empty ones
+            frame = pd.read_csv(filename, dtype=object, **read_options).dropna()
+            frame = frame[frame['secret_value'] != '']
+            frame['secret_value'] = frame['secret_value'].astype(np.int64)
+
+        if frame.empty:
+            return store
+        values = frame['secret_value'].to_numpy(dtype=np.int64)
+
+        attribute_codes, attribute_names = pd.factorize(frame['attribute_name'].to_numpy(), sort=False)
+        attribute_codes = np.array([store._attribute_code(a) for a in attribute_names])[attribute_codes]
+
+        provider_codes, provider_ids = pd.factorize(frame['provider_id'].to_numpy(), sort=False)
+        user_ids = frame['user_id'].to_numpy()
+        del frame
+        provider_rows = np.split(np.argsort(provider_codes, kind='stable'), np.cumsum(np.bincount(provider_codes))[:-1])
+        for provider_id, rows in zip(provider_ids, provider_rows):
+            user_codes, users = pd.factorize(user_ids[rows], sort=False)
+            table = _ProviderTable(_IdIndex(users))
+            store._providers[provider_id] = table
+
+            # later rows overwrite earlier ones, as when filling a dictionary row by row
+            keys = user_codes.astype(np.int64) * (len(store._attributes) + 1) + attribute_codes[rows]
+            keep = ~pd.Series(keys).duplicated(keep='last').to_numpy()
+            for attribute_code in np.unique(attribute_codes[rows]):
+                selected = keep & (attribute_codes[rows] == attribute_code)
+                shares, present = table.column(int(attribute_code))
+                shares[user_codes[selected]] = values[rows[selected]]
+                present[user_codes[selected]] = True
+
+        return store
+
+
+    @classmethod
+    def from_snapshot(cls, filename, mmap=True):
+        """
+        Opens a binary snapshot written by to_snapshot.
+
+        Parameters
+        ----------
+        filename : string
+            Name of the snapshot file.
+
+        mmap : bool, optional
+            Whether the columns are memory-mapped from the file (copy-on-write), instead of read into memory (default True).
+
+        Returns
+        -------
+        store : ShareStore
+
+        Raises
+        ------
+        ValueError
+            If the file is not a snapshot, or a snapshot of an unsupported version.
+        """
+        with open(filename, 'rb') as f_in:
+            magic, header_length = f_in.read(len(SNAPSHOT_MAGIC)), f_in.read(8)
+            if magic != SNAPSHOT_MAGIC or len(header_length) != 8:
+                raise ValueError(f"Not a share store snapshot: {filename}")
+            header_length, = struct.unpack('<Q', header_length)
+            header = json.loads(f_in.read(header_length).decode('utf-8'))
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version")
+
+        data = np.memmap(filename, dtype=np.uint8, mode='c') if mmap else np.fromfile(filename, dtype=np.uint8)
+        start = _aligned(len(SNAPSHOT_MAGIC) + 8 + header_length)
+        sections = [data[start + offset:start + offset + length * np.dtype(dtype).itemsize].view(dtype)
+                    for offset, dtype, length in header["sections"]]
+
+        store = cls()
+        store._attributes = {attribute_name: code for code, attribute_name in enumerate(header["attributes"])}
+        for provider in header["providers"]:
+            table = _ProviderTable(_IdIndex._from_sorted(sections[provider["ids"]], sections[provider["sorter"]]))
+            table.capacity = len(table.users)
+            for attribute_code, (shares, present) in provider["columns"].items():
+                table.shares[int(attribute_code)], table.present[int(attribute_code)] = sections[shares], sections[present]
+            store._providers[provider["provider_id"]] = table
+        return store
+
+
+    def to_snapshot(self, filename):
+        """
+        Writes the store to a binary snapshot file (see SNAPSHOT_MAGIC), which can be memory-mapped with from_snapshot.
+        The snapshot is written to a temporary file that then replaces filename, so that stores mapping
+        a previous snapshot with the same name keep reading it.
+
+        Parameters
+        ----------
+        filename : string
+            Name of the snapshot file.
+        """
+        arrays, sections = [], []
+
+        def section(array):
+            # registers an array to write, and returns its section number
+            array = np.ascontiguousarray(array)
+            offset = _aligned(sections[-1][0] + arrays[-1].nbytes) if arrays else 0
+            arrays.append(array)
+            sections.append([offset, array.dtype.str, len(array)])
+            return len(arrays) - 1
+
+        providers = []
+        for provider_id, table in self._providers.items():
+            n_users = len(table.users)
+            ids = table.users.ids
+            providers.append({
+                "provider_id": provider_id,
+                "ids": section(ids),
+                "sorter": section(np.argsort(ids, kind='stable').astype(np.int64)),
+                "columns": {str(attribute_code): [section(table.shares[attribute_code][:n_users]),
+                                                  section(table.present[attribute_code][:n_users])]
+                            for attribute_code in table.shares}})
+
+        header = json.dumps({"version": SNAPSHOT_VERSION, "attributes": list(self._attributes),
+                             "providers": providers, "sections": sections}).encode('utf-8')
+        start = _aligned(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+        temporary_filename = filename + '.tmp'
+        with open(temporary_filename, 'wb') as f_out:
+            f_out.write(SNAPSHOT_MAGIC + struct.pack('<Q', len(header)) + header)
+            for array, (offset, _, _) in zip(arrays, sections):
+                f_out.write(b'\0' * (start + offset - f_out.tell()))
+                f_out.write(array.tobytes())
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(temporary_filename, filename)
+
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a store from a binary snapshot if filename ends with SNAPSHOT_SUFFIX (see from_snapshot), or else from a csv file.
+        """
+        if filename.endswith(SNAPSHOT_SUFFIX):
+            return cls.from_snapshot(filename)
+        return cls.from_csv(filename)
+
+
+    def save(self, filename, snapshot=None):
+        """
+        Writes the store to a binary snapshot (see to_snapshot) or to a csv file (see to_csv).
+        By default, a snapshot is written if filename ends with SNAPSHOT_SUFFIX.
+        """
+        if snapshot is None:
+            snapshot = filename.endswith(SNAPSHOT_SUFFIX)
+        if snapshot:
+            self.to_snapshot(filename)
+        else:
+            self.to_csv(filename)
+
+
+    def to_csv(self, filename):
+        """
+        Writes the store to a csv file with rows of the following comma-separated values:
+        provider id, user id, attribute name, secret value.
+
+        Parameters
+        ----------
+        filename : string
+            Name of the csv file to save data to.
+        """
+        with open(filename, 'w', newline='') as f_out:
+            writer = csv.writer(f_out, delimiter=',', lineterminator='\n')
+            writer.writerows(self.rows())
+
+
+    def _attribute_code(self, attribute_name):
+        code = self._attributes.get(attribute_name)
+        if code is None:
+            code = self._attributes[attribute_name] = len(self._attributes)
+        return code
+
+
+    def _table(self, provider_id, create=False):
+        table = self._providers.get(provider_id)
+        if table is None and create:
+            table = self._providers[provider_id] = _ProviderTable()
+        return table
+
+
+    def get(self, provider_id, user_id, attribute_name, default=0):
+        """
+        Returns the secret component stored for a provider, user and attribute (default if there is none).
+        """
+        table = self._providers.get(provider_id)
+        attribute_code = self._attributes.get(attribute_name)
+        if table is None or attribute_code not in table.shares:
+            return default
+
+        user_code = table.users.get(user_id)
+        if user_code < 0 or not table.present[attribute_code][user_code]:
+            return default
+        return int(table.shares[attribute_code][user_code])
+
+
+    def set(self, provider_id, user_id, attribute_name, secret_value):
+        """
+        Stores the secret component of a provider, user and attribute.
+        """
+        table = self._table(provider_id, create=True)
+        user_code = table.users.add(user_id)
+        table.reserve(len(table.users))
+        shares, present = table.column(self._attribute_code(attribute_name))
+        shares[user_code] = int(secret_value)
+        present[user_code] = True
+
+
+    def set_many(self, provider_id, user_ids, attribute_name, secret_values):
+        """
+        Vectorized version of set: stores the secret components of one attribute for many users of a provider.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
+
+        user_ids : [string] | np.ndarray
+            The identifiers of the users
+
+        attribute_name : string
+            The name of the attribute
+
+        secret_values : [int] | np.ndarray
+            The secret components, in the same order as user_ids
+        """
+        secret_values = np.asarray(secret_values, dtype=np.int64)
+        assert len(user_ids) == len(secret_values), "Number of users must be equal to the number of secret values"
+
+        table = self._table(provider_id, create=True)
+        user_codes = table.users.add_many(user_ids)
+        table.reserve(len(table.users))
+        shares, present = table.column(self._attribute_code(attribute_name))
+        shares[user_codes] = secret_values
+        present[user_codes] = True
+
+
+    def gather(self, provider_id, user_ids, attribute_name):
+        """
+        Vectorized lookup of the secret components of one attribute for many users of a provider.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
+
+        user_ids : [string] | np.ndarray
+            The identifiers of the users
+
+        attribute_name : string
+            The name of the attribute
+
+        Returns
+        -------
+        secret_values : np.ndarray[int64]
+            The secret components in the order of user_ids (0 where missing).
+
+        found : np.ndarray[bool]
+            Whether a secret component is stored for each of the users.
+        """
+        return self.gather_many(provider_id, user_ids, [attribute_name])[attribute_name]
+
+
+    def gather_many(self, provider_id, user_ids, attribute_names):
+        """
+        Vectorized lookup of the secret components of several attributes for many users of a provider.
+        The users are looked up only once for all attributes.
+
+        Returns
+        -------
+        components : {string: (np.ndarray[int64], np.ndarray[bool])}
+            For each attribute name, the secret components and found mask as returned by gather.
+        """
+        table = self._providers.get(provider_id)
+        user_codes = table.users.get_many(user_ids) if table is not None and len(user_ids) else None
+
+        components = {}
+        for attribute_name in attribute_names:
+            secret_values = np.zeros(len(user_ids), dtype=np.int64)
+            found = np.zeros(len(user_ids), dtype=bool)
+
+            attribute_code = self._attributes.get(attribute_name)
+            if user_codes is not None and attribute_code in table.shares:
+                known = user_codes >= 0
+                found[known] = table.present[attribute_code][user_codes[known]]
+                secret_values[found] = table.shares[attribute_code][user_codes[found]]
+            components[attribute_name] = (secret_values, found)
+
+        return components
+
+
+    def providers(self):
+        return list(self._providers)
+
+
+    def users(self, provider_id):
+        table = self._providers.get(provider_id)
+        return table.users.ids.tolist() if table is not None else []
+
+
+    def has_user(self, provider_id, user_id):
+        table = self._providers.get(provider_id)
+        return table is not None and table.users.get(user_id) >= 0
+
+
+    def count_users(self, provider_id):
+        table = self._providers.get(provider_id)
+        return len(table.users) if table is not None else 0
+
+
+    def attributes(self, provider_id, user_id):
+        table = self._providers.get(provider_id)
+        if table is None:
+            return []
+        user_code = table.users.get(user_id)
+        if user_code < 0:
+            return []
+        names = list(self._attributes)
+        return [names[a] for a in table.shares if table.present[a][user_code]]
+
+
+    def columns(self, provider_id):
+        """
+        The components of a provider as columns, for vectorized scans of the whole store.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
+
+        Returns
+        -------
+        user_ids : np.ndarray[str]
+            The users of the provider, in the order they were first stored.
+
+        columns : {string: (np.ndarray[int64], np.ndarray[bool])}
+            For each attribute stored for the provider, the secret components (0 where missing) and whether they
+            are stored, in the order of user_ids. The arrays are views of the store and must not be modified.
+        """
+        table = self._providers.get(provider_id)
+        if table is None:
+            return np.empty(0, dtype=str), {}
+        n_users = len(table.users)
+        names = list(self._attributes)
+        return table.users.ids, {names[a]: (table.shares[a][:n_users], table.present[a][:n_users]) for a in table.shares}
+
+
+    def rows(self):
+        """
+        Iterates over all stored components as (provider_id, user_id, attribute_name, secret_value) tuples.
+        The rows of a provider are selected from its columns at once, and grouped by user, in the order users were first stored.
+        """
+        attribute_names = np.array(list(self._attributes), dtype=object)
+        for provider_id, table in self._providers.items():
+            n_users = len(table.users)
+            user_codes, attribute_codes, values = [], [], []
+            for attribute_code in table.shares:
+                codes = np.flatnonzero(table.present[attribute_code][:n_users])
+                user_codes.append(codes)
+                attribute_codes.append(np.full(len(codes), attribute_code))
+                values.append(table.shares[attribute_code][codes])
+            if not user_codes:
+                continue
+
+            user_codes, attribute_codes, values = (np.concatenate(a) for a in (user_codes, attribute_codes, values))
+            order = np.lexsort((attribute_codes, user_codes))
+            yield from zip(
+                [provider_id] * len(order),
+                table.users.ids[user_codes[order]].tolist(),
+                attribute_names[attribute_codes[order]].tolist(),
+                values[order].tolist())
+
+
+    def __len__(self):
+        return sum(len(table) for table in self._providers.values())
+
+
+    # dictionary-style access: store[provider_id][user_id][attribute_name]
+
+    def __getitem__(self, provider_id):
+        return _ProviderView(self, provider_id)
+
+
+    def __contains__(self, provider_id):
+        return provider_id in self._providers
+
+
+    def __iter__(self):
+        return iter(self.providers())
+
+
+    def keys(self):
+        return self.providers()
+
+
+
+class _ProviderView():
+
+    """
+    Dictionary-style view of the shares of one provider: view[user_id][attribute_name].
+    """
+
+    def __init__(self, store, provider_id):
+        self._store = store
+        self._provider_id = provider_id
+
+
+    def __getitem__(self, user_id):
+        return _UserView(self._store, self._provider_id, user_id)
+
+
+    def __contains__(self, user_id):
+        return self._store.has_user(self._provider_id, user_id)
+
+
+    def __iter__(self):
+        return iter(self._store.users(self._provider_id))
+
+
+    def __len__(self):
+        return self._store.count_users(self._provider_id)
+
+
+    def keys(self):
+        return self._store.users(self._provider_id)
+
+
+
+class _UserView():
+
+    """
+    Dictionary-style view of the shares of one user: view[attribute_name] = secret_value.
+    """
+
+    def __init__(self, store, provider_id, user_id):
+        self._store = store
+        self._provider_id = provider_id
+        self._user_id = user_id
+
+
+    def __getitem__(self, attribute_name):
+        return self._store.get(self._provider_id, self._user_id, attribute_name)
+
+
+    def __setitem__(self, attribute_name, secret_value):
+        self._store.set(self._provider_id, self._user_id, attribute_name, secret_value)
+
+
+    def get(self, attribute_name, default=None):
+        return self._store.get(self._provider_id, self._user_id, attribute_name, default)
+
+
+    def __contains__(self, attribute_name):
+        return attribute_name in self.keys()
+
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+    def __len__(self):
+        return len(self.keys())
+
+
+    def keys(self):
+        return self._store.attributes(self._provider_id, self._user_id)
+
+
+    def items(self):
+        return [(attribute_name, self[attribute_name]) for attribute_name in self.keys()]
@@ -0,0 +1,224 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+from findhr.monitoring.share_store import _ProviderView
+
+# number of bound parameters per IN-list query (below the SQLITE_MAX_VARIABLE_NUMBER of older SQLite builds)
+IN_LIST_SIZE = 900
+
+# number of rows fetched per query when iterating over the whole store
+ROWS_BATCH_SIZE = 10000
+
+
+class SQLiteShareStore():
+
+    """
+    Storage of secret attribute components in a SQLite database, with the interface of ShareStore.
+
+    The components are kept on disk in a single table keyed by (provider_id, user_id, attribute_name), so memory
+    stays flat however many components are stored, and lookups use the primary key index. The database runs in
+    WAL mode: readers are not blocked by a writer. Writes are grouped in a transaction until commit is called.
+
+    The store can be used from several threads (the statements are serialized on one connection), and it can be pickled,
+    e.g., to be sent to worker processes, which then open their own connection to the same database.
+
+    Attributes
+    ----------
+    filename : string
+        Name of the SQLite database file (created if missing).
+
+    connection : sqlite3.Connection
+        The connection to the database.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS shares ("
+            "provider_id TEXT NOT NULL, user_id TEXT NOT NULL, attribute_name TEXT NOT NULL, secret_value INTEGER NOT NULL, "
+            "PRIMARY KEY (provider_id, user_id, attribute_name)) WITHOUT ROWID")
+        self.connection.commit()
+
+
+    def __getstate__(self):
+        return {"filename": self.filename}
+
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"])
+
+
+    def _query(self, query, parameters=()):
+        # runs a query and fetches all its rows, one thread at a time
+        with self._lock:
+            return self.connection.execute(query, parameters).fetchall()
+
+
+    def commit(self):
+        """
+        Commits the components stored since the last commit.
+        """
+        with self._lock:
+            self.connection.commit()
+
+
+    def close(self):
+        with self._lock:
+            self.connection.commit()
+            self.connection.close()
+
+
+    def get(self, provider_id, user_id, attribute_name, default=0):
+        """
+        Returns the secret component stored for a provider, user and attribute (default if there is none).
+        """
+        rows = self._query("SELECT secret_value FROM shares WHERE provider_id = ? AND user_id = ? AND attribute_name = ?",
+                           (str(provider_id), str(user_id), attribute_name))
+        return rows[0][0] if rows else default
+
+
+    def set(self, provider_id, user_id, attribute_name, secret_value):
+        """
+        Stores the secret component of a provider, user and attribute.
+        """
+        self.set_many(provider_id, [user_id], attribute_name, [secret_value])
+
+
+    def set_many(self, provider_id, user_ids, attribute_name, secret_values):
+        """
+        Vectorized version of set: stores the secret components of one attribute for many users of a provider,
+        with a single prepared upsert.
+
+        Parameters
+        ----------
+        provider_id : string
+            The identifier of the service provider
+
+        user_ids : [string] | np.ndarray
+            The identifiers of the users
+
+        attribute_name : string
+            The name of the attribute
+
+        secret_values : [int] | np.ndarray
+            The secret components, in the same order as user_ids
+        """
+        secret_values = np.asarray(secret_values, dtype=np.int64)
+        assert len(user_ids) == len(secret_values), "Number of users must be equal to the number of secret values"
+
+        self.set_rows((provider_id, user_id, attribute_name, secret_value) for user_id, secret_value in zip(user_ids, secret_values.tolist()))
+
+
+    def set_rows(self, rows):
+        """
+        Stores many components given as (provider_id, user_id, attribute_name, secret_value) tuples with a single prepared upsert,
+        e.g., the rows of a ShareStore loaded from a csv file.
+        """
+        with self._lock:
+            self.connection.executemany(
+                "INSERT INTO shares (provider_id, user_id, attribute_name, secret_value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (provider_id, user_id, attribute_name) DO UPDATE SET secret_value = excluded.secret_value",
+                ((str(provider_id), str(user_id), attribute_name, int(secret_value)) for provider_id, user_id, attribute_name, secret_value in rows))
+
+
+    def gather(self, provider_id, user_ids, attribute_name):
+        """
+        Vectorized lookup of the secret components of one attribute for many users of a provider, see ShareStore.gather.
+        """
+        return self.gather_many(provider_id, user_ids, [attribute_name])[attribute_name]
+
+
+    def gather_many(self, provider_id, user_ids, attribute_names):
+        """
+        Vectorized lookup of the secret components of several attributes for many users of a provider.
+        The distinct users are fetched with batched IN-list queries on the primary key.
+
+        Returns
+        -------
+        components : {string: (np.ndarray[int64], np.ndarray[bool])}
+            For each attribute name, the secret components (0 where missing) and whether they are stored, in the order of user_ids.
+        """
+        users, inverse = np.unique(np.asarray([str(user_id) for user_id in user_ids], dtype=object), return_inverse=True)
+        user_positions = {user_id: position for position, user_id in enumerate(users.tolist())}
+        attribute_rows = {attribute_name: row for row, attribute_name in enumerate(attribute_names)}
+        secret_values = np.zeros((len(attribute_names), len(users)), dtype=np.int64)
+        found = np.zeros((len(attribute_names), len(users)), dtype=bool)
+
+        attribute_list = list(attribute_rows)
+        batch_size = max(IN_LIST_SIZE - len(attribute_list) - 1, 1)
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size].tolist()
+            query = ("SELECT user_id, attribute_name, secret_value FROM shares WHERE provider_id = ? "
+                     f"AND user_id IN ({', '.join('?' * len(batch))}) AND attribute_name IN ({', '.join('?' * len(attribute_list))})")
+            for user_id, attribute_name, secret_value in self._query(query, [str(provider_id)] + batch + attribute_list):
+                row, position = attribute_rows[attribute_name], user_positions[user_id]
+                secret_values[row, position] = secret_value
+                found[row, position] = True
+
+        return {attribute_name: (secret_values[row][inverse], found[row][inverse]) for attribute_name, row in attribute_rows.items()}
+
+
+    def providers(self):
+        return [row[0] for row in self._query("SELECT DISTINCT provider_id FROM shares")]
+
+
+    def users(self, provider_id):
+        return [row[0] for row in self._query("SELECT DISTINCT user_id FROM shares WHERE provider_id = ?", (str(provider_id),))]
+
+
+    def has_user(self, provider_id, user_id):
+        return bool(self._query("SELECT 1 FROM shares WHERE provider_id = ? AND user_id = ? LIMIT 1", (str(provider_id), str(user_id))))
+
+
+    def count_users(self, provider_id):
+        return self._query("SELECT COUNT(DISTINCT user_id) FROM shares WHERE provider_id = ?", (str(provider_id),))[0][0]
+
+
+    def attributes(self, provider_id, user_id):
+        return [row[0] for row in self._query("SELECT attribute_name FROM shares WHERE provider_id = ? AND user_id = ?",
+                                              (str(provider_id), str(user_id)))]
+
+
+    def rows(self):
+        """
+        Iterates over all stored components as (provider_id, user_id, attribute_name, secret_value) tuples,
+        in primary key order. The rows are fetched in batches of ROWS_BATCH_SIZE, each starting after the last key
+        of the previous one, so memory stays flat and the database is not locked between batches.
+        """
+        query = "SELECT provider_id, user_id, attribute_name, secret_value FROM shares"
+        order = " ORDER BY provider_id, user_id, attribute_name LIMIT ?"
+        batch = self._query(query + order, (ROWS_BATCH_SIZE,))
+        while batch:
+            yield from batch
+            if len(batch) < ROWS_BATCH_SIZE:
+                return
+            batch = self._query(query + " WHERE (provider_id, user_id, attribute_name) > (?, ?, ?)" + order,
+                                (*batch[-1][:3], ROWS_BATCH_SIZE))
+
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM shares")[0][0]
+
+
+    # dictionary-style access: store[provider_id][user_id][attribute_name]
+
+    def __getitem__(self, provider_id):
+        return _ProviderView(self, provider_id)
+
+
+    def __contains__(self, provider_id):
+        return bool(self._query("SELECT 1 FROM shares WHERE provider_id = ? LIMIT 1", (str(provider_id),)))
+
+
+    def __iter__(self):
+        return iter(self.providers())
+
+
+    def keys(self):
+        return self.providers()
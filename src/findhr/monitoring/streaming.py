@@ -0,0 +1,273 @@
+import numpy as np
+
+# rows of the per-group counters
+IN_POOL, TARGETED, ACCEPTED = 0, 1, 2
+
+
+class StreamingFairnessMonitor():
+
+    """
+    Incremental fairness monitor over a stream of ranking and hiring-stage events.
+
+    Every event (user_id, remote_secret_component, stage) is desecritized on arrival, like a pool member in
+    MultipartyFairnessMeasurement, and only counted: for each monitored group, the monitor keeps the number of
+    events of group members, of targeted group members and of targeted and accepted group members. The pool diversity
+    and the accept rate of a group are then available in constant time at any moment, without going over the history.
+    Only these two metrics are maintained incrementally: exposure and top-k metrics depend on the positions of the members
+    in a ranking, so they are measured over the ranking itself (see MultipartyFairnessMeasurement).
+
+    Besides the counters over the whole stream, the monitor can keep counters over a window of events:
+    a sliding window over the last `window` events, or consecutive tumbling windows of `window` events each.
+
+    Attributes
+    ----------
+    measurement : MultipartyFairnessMeasurement
+        The measurement handler that desecritizes the protected attributes of the events.
+
+    groups : [GroupSpec]
+        The monitored groups, which unpack as pairs (attribute_names, attribute_values).
+
+    window : int
+        The size of the window, in events (None: counters over the whole stream only).
+
+    tumbling : bool
+        Whether the window is tumbling (restarted every `window` events) instead of sliding.
+    """
+
+    def __init__(self, measurement, groups, window=None, tumbling=False):
+
+        assert window is None or window > 0, "The window size must be positive"
+
+        self.measurement = measurement
+        self.groups = [measurement.catalogue.group(attribute_names, attribute_values) for attribute_names, attribute_values in groups]
+        self.window = window
+        self.tumbling = tumbling
+
+        self._group_index = {group: idx for idx, group in enumerate(self.groups)}
+        self._attribute_names = list(dict.fromkeys(name for group in self.groups for name in group.attribute_names))
+
+        self._total_counts, self._total_events = np.zeros((3, len(self.groups)), dtype=np.int64), 0
+        if window is not None:
+            self._window_counts, self._window_events = np.zeros((3, len(self.groups)), dtype=np.int64), 0
+            if tumbling:
+                # counters of the last completed window
+                self._previous_counts, self._previous_events = np.zeros((3, len(self.groups)), dtype=np.int64), 0
+            else:
+                # ring buffer with the group membership and stage of the events in the window
+                self._members = np.zeros((window, len(self.groups)), dtype=bool)
+                self._targeted = np.zeros(window, dtype=bool)
+                self._accepted = np.zeros(window, dtype=bool)
+                self._position = 0
+
+
+    @staticmethod
+    def _stage_flags(stages):
+        # a stage is None (ranking event: neither targeted nor accepted), a bool (accepted, with targeted set to True)
+        # or a pair (targeted, accepted)
+        flags = [(False, False) if stage is None else (True, stage) if np.ndim(stage) == 0 else stage for stage in stages]
+        targeted = np.fromiter((bool(targeted) for targeted, _ in flags), dtype=bool, count=len(flags))
+        accepted = np.fromiter((bool(accepted) for _, accepted in flags), dtype=bool, count=len(flags))
+        return targeted, accepted & targeted
+
+
+    @staticmethod
+    def _count(members, targeted, accepted):
+        return np.stack([np.count_nonzero(members, axis=0),
+                         np.count_nonzero(members & targeted[:, None], axis=0),
+                         np.count_nonzero(members & accepted[:, None], axis=0)]).astype(np.int64)
+
+
+    def ingest(self, user_id, remote_secret_component, stage=None):
+        """
+        Adds a single event to the monitor, see ingest_many.
+        """
+        self.ingest_many([(user_id, remote_secret_component, stage)])
+
+
+    def ingest_many(self, events):
+        """
+        Adds a batch of events to the monitor, in order.
+
+        Parameters
+        ----------
+        events : [(string, int | {string: int}, stage)]
+            A list of events (user_id, remote_secret_component, stage), where remote_secret_component is given
+            as for the pool of MultipartyFairnessMeasurement, and stage is:
+                - None for a ranking event (the user was in a pool),
+                - a bool for the outcome of a targeted user (accepted or not),
+                - a pair (targeted, accepted) of bools.
+            Every event counts: a user appearing in several events is counted several times.
+        """
+        events = list(events)
+        if not events:
+            return
+
+        pool = [(user_id, remote_secret_component) for user_id, remote_secret_component, _ in events]
+        doubled_attributes, _ = self.measurement.reconstruct_attributes(pool, self._attribute_names)
+        members = np.zeros((len(pool), len(self.groups)), dtype=bool)
+        for idx, group in enumerate(self.groups):
+            members[:, idx] = group.mask(doubled_attributes, len(pool))
+        targeted, accepted = self._stage_flags([stage for _, _, stage in events])
+
+        self._total_counts += self._count(members, targeted, accepted)
+        self._total_events += len(events)
+
+        if self.window is not None and self.tumbling:
+            self._tumble(members, targeted, accepted)
+        elif self.window is not None:
+            self._slide(members, targeted, accepted)
+
+
+    def _tumble(self, members, targeted, accepted):
+        start = 0
+        while start < len(members):
+            end = start + min(len(members) - start, self.window - self._window_events)
+            self._window_counts += self._count(members[start:end], targeted[start:end], accepted[start:end])
+            self._window_events += end - start
+            if self._window_events == self.window:
+                self._previous_counts, self._previous_events = self._window_counts, self._window_events
+                self._window_counts, self._window_events = np.zeros_like(self._previous_counts), 0
+            start = end
+
+
+    def _slide(self, members, targeted, accepted):
+        if len(members) >= self.window:
+            # the batch replaces the whole window
+            members, targeted, accepted = members[-self.window:], targeted[-self.window:], accepted[-self.window:]
+            self._members[:], self._targeted[:], self._accepted[:] = members, targeted, accepted
+            self._window_counts = self._count(members, targeted, accepted)
+            self._window_events, self._position = self.window, 0
+            return
+
+        start = 0
+        while start < len(members):
+            # the new events overwrite the oldest ones in the ring buffer, whose counts are removed from the window
+            size = min(len(members) - start, self.window - self._position)
+            slots = slice(self._position, self._position + size)
+            if self._window_events == self.window:
+                self._window_counts -= self._count(self._members[slots], self._targeted[slots], self._accepted[slots])
+            new = slice(start, start + size)
+            self._members[slots], self._targeted[slots], self._accepted[slots] = members[new], targeted[new], accepted[new]
+            self._window_counts += self._count(members[new], targeted[new], accepted[new])
+            self._window_events = min(self._window_events + size, self.window)
+            self._position = (self._position + size) % self.window
+            start += size
+
+
+    def _get_counts(self, attribute_names, attribute_values, scope):
+        group = self.measurement.catalogue.group(attribute_names, attribute_values)
+        assert group in self._group_index, f"Group {tuple(group)} is not monitored"
+
+        if scope == "total":
+            counts, events = self._total_counts, self._total_events
+        elif scope == "window":
+            assert self.window is not None, "The monitor has no window"
+            counts, events = self._window_counts, self._window_events
+        elif scope == "previous":
+            assert self.window is not None and self.tumbling, "Only tumbling windows have a previous window"
+            counts, events = self._previous_counts, self._previous_events
+        else:
+            raise ValueError(f"Unsupported scope: {scope}")
+        return counts[:, self._group_index[group]], events
+
+
+    def pool_diversity(self, attribute_names, attribute_values, scope="total"):
+        """
+        The fraction of events of members of a given group, see MultipartyFairnessMeasurement.measure_pool_diversity.
+
+        Parameters
+        ----------
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute of a monitored group.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order.
+
+        scope : string, optional
+            The events to consider:
+                - "total" : all events ingested so far (default)
+                - "window" : the events in the current (sliding or tumbling) window
+                - "previous" : the events of the last completed tumbling window
+
+        Returns
+        -------
+        pool_diversity : float
+            A float number in the [0,1] range (0 if there are no events).
+        """
+        counts, events = self._get_counts(attribute_names, attribute_values, scope)
+        return float(counts[IN_POOL]) / events if events else 0
+
+
+    def accept_rate(self, attribute_names, attribute_values, scope="total"):
+        """
+        The fraction of targeted members of a given group who were accepted, see MultipartyFairnessMeasurement.measure_accept_rate.
+
+        Parameters
+        ----------
+        attribute_names : [string] | (string) | string
+            The names/name of the attributes/attribute of a monitored group.
+
+        attribute_values : [string] | (string) | string
+            The values/value of the selected attributes in attribute_names in the same order.
+
+        scope : string, optional
+            The events to consider, see pool_diversity.
+
+        Returns
+        -------
+        accept_rate : float
+            A float number in the [0,1] range (0 if no member of the group was targeted).
+        """
+        counts, _ = self._get_counts(attribute_names, attribute_values, scope)
+        return float(counts[ACCEPTED]) / counts[TARGETED] if counts[TARGETED] else 0
+
+
+    def snapshot(self):
+        """
+        Returns the state of the monitor as a JSON-serializable dictionary, to be restored with restore.
+        """
+        state = {"groups": [[list(attribute_names), list(attribute_values)] for attribute_names, attribute_values in self.groups],
+                 "window": self.window, "tumbling": self.tumbling,
+                 "total_counts": self._total_counts.tolist(), "total_events": self._total_events}
+        if self.window is not None:
+            state.update(window_counts=self._window_counts.tolist(), window_events=self._window_events)
+            if self.tumbling:
+                state.update(previous_counts=self._previous_counts.tolist(), previous_events=self._previous_events)
+            else:
+                state.update(members=self._members.tolist(), targeted=self._targeted.tolist(), accepted=self._accepted.tolist(),
+                             position=self._position)
+        return state
+
+
+    @classmethod
+    def restore(cls, measurement, state):
+        """
+        Recreates a monitor from a snapshot.
+
+        Parameters
+        ----------
+        measurement : MultipartyFairnessMeasurement
+            The measurement handler that desecritizes the protected attributes of new events.
+
+        state : dict
+            A state returned by snapshot.
+
+        Returns
+        -------
+        monitor : StreamingFairnessMonitor
+        """
+        monitor = cls(measurement, state["groups"], state["window"], state["tumbling"])
+        monitor._total_counts = np.array(state["total_counts"], dtype=np.int64).reshape(3, len(monitor.groups))
+        monitor._total_events = state["total_events"]
+        if monitor.window is not None:
+            monitor._window_counts = np.array(state["window_counts"], dtype=np.int64).reshape(3, len(monitor.groups))
+            monitor._window_events = state["window_events"]
+            if monitor.tumbling:
+                monitor._previous_counts = np.array(state["previous_counts"], dtype=np.int64).reshape(3, len(monitor.groups))
+                monitor._previous_events = state["previous_events"]
+            else:
+                monitor._members = np.array(state["members"], dtype=bool).reshape(monitor.window, len(monitor.groups))
+                monitor._targeted = np.array(state["targeted"], dtype=bool)
+                monitor._accepted = np.array(state["accepted"], dtype=bool)
+                monitor._position = state["position"]
+        return monitor
@@ -0,0 +1,273 @@
+# Tracing of measurements.
+# A measurement created with a Tracer records, for every call of a measure_* method, the time spent in each of its
+# phases (share lookup, reconstruction, group checks, secure inputs and outputs) and counters (users, attributes,
+# rounds, bytes), and passes the trace to the exporters. Without a tracer, every phase costs a single None check.
+import collections
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# the trace of the measurement running in the current thread or asyncio task
+_current_trace = contextvars.ContextVar("findhr_monitoring_trace", default=None)
+
+
+class _NoPhase():
+    # phase of an untraced measurement: does nothing
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Phase():
+
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.trace.phases[self.name] = self.trace.phases.get(self.name, 0.0) + elapsed
+        return False
+
+
+class MeasurementTrace():
+
+    """
+    The timings and counters of one call of a measurement method.
+
+    Attributes
+    ----------
+    method : string
+        The name of the measurement method, e.g., "measure_report".
+
+    provider_id : string
+        The identifier of the service provider.
+
+    seconds : float
+        The wall-clock time of the call.
+
+    phases : {string: float}
+        The seconds spent in each phase: "lookup" (local components), "reconstruction" (sums of the components),
+        "groups" (group membership), "shards" (counts in the shards of a ShardedShareStore), and with two-party
+        computation "input" and "output" (secure inputs and openings). The rest of the time is in no phase.
+
+    counters : {string: int}
+        E.g., "users" and "attributes" (looked up), "rounds" (secure inputs and outputs), "bytes" (sent to the other parties),
+        "cache_hits" (answered by the result cache).
+
+    error : string | None
+        The type of the exception raised by the call, if any.
+    """
+
+    def __init__(self, method, provider_id):
+        self.method = method
+        self.provider_id = provider_id
+        self.seconds = 0.0
+        self.phases = {}
+        self.counters = {}
+        self.error = None
+
+
+    def to_dict(self):
+        return {"method": self.method, "provider_id": self.provider_id, "seconds": self.seconds,
+                "phases": dict(self.phases), "counters": dict(self.counters), "error": self.error}
+
+
+    def __repr__(self):
+        return f"MeasurementTrace({self.to_dict()!r})"
+
+
+class Tracer():
+
+    """
+    Records the traces of the measurements of the handlers created with it, see MeasurementTrace.
+
+    Every trace is passed to the exporters, callables taking a MeasurementTrace (e.g., writing trace.to_dict() to a log
+    or to a metrics system), and aggregated per method (see stats). Exceptions raised by an exporter are logged, and
+    do not affect the measurement. The tracer is thread-safe, and traces measurements
+    running concurrently in threads or asyncio tasks separately.
+
+    Attributes
+    ----------
+    exporters : [callable]
+        The callables receiving every trace.
+
+    traces : collections.deque
+        The most recent traces (at most keep).
+    """
+
+    def __init__(self, exporters=(), keep=1000):
+        """
+        Parameters
+        ----------
+        exporters : [callable], optional
+            The callables receiving every trace (default: none).
+
+        keep : int, optional
+            The number of recent traces kept in traces (default 1000).
+        """
+        self.exporters = list(exporters)
+        self.traces = collections.deque(maxlen=keep)
+        self._lock = threading.Lock()
+        # method -> [calls, seconds, {phase: seconds}, {counter: total}]
+        self._totals = {}
+
+
+    def phase(self, name):
+        """
+        Context manager timing a phase of the running measurement (no-op outside of a traced measurement).
+        """
+        trace = _current_trace.get()
+        return _Phase(trace, name) if trace is not None else _NO_PHASE
+
+
+    def count(self, **counters):
+        """
+        Adds to the counters of the running measurement (ignored outside of a traced measurement).
+        """
+        trace = _current_trace.get()
+        if trace is not None:
+            for name, value in counters.items():
+                trace.counters[name] = trace.counters.get(name, 0) + value
+
+
+    def _start(self, method, provider_id):
+        # a measurement called by another traced measurement is part of its trace
+        if _current_trace.get() is not None:
+            return None, None
+        trace = MeasurementTrace(method, provider_id)
+        return trace, _current_trace.set(trace)
+
+
+    def _finish(self, trace, token, start, error):
+        trace.seconds = time.perf_counter() - start
+        if error is not None:
+            trace.error = type(error).__name__
+        _current_trace.reset(token)
+        with self._lock:
+            self.traces.append(trace)
+            totals = self._totals.setdefault(trace.method, [0, 0.0, {}, {}])
+            totals[0] += 1
+            totals[1] += trace.seconds
+            for name, seconds in trace.phases.items():
+                totals[2][name] = totals[2].get(name, 0.0) + seconds
+            for name, value in trace.counters.items():
+                totals[3][name] = totals[3].get(name, 0) + value
+        # a failing exporter (e.g., a broken log sink) neither fails the measurement nor masks its own error
+        for exporter in self.exporters:
+            try:
+                exporter(trace)
+            except Exception:
+                _logger.exception("Trace exporter %r failed on a trace of %s", exporter, trace.method)
+
+
+    def stats(self):
+        """
+        The totals of the traces, per measurement method.
+
+        Returns
+        -------
+        stats : {string: dict}
+            For each method, the number of calls, the total seconds, the seconds per phase and the totals of the counters.
+        """
+        with self._lock:
+            return {method: {"calls": calls, "seconds": seconds, "phases": dict(phases), "counters": dict(counters)}
+                    for method, (calls, seconds, phases, counters) in self._totals.items()}
+
+
+    def clear(self):
+        """
+        Drops the recent traces and the totals.
+        """
+        with self._lock:
+            self.traces.clear()
+            self._totals.clear()
+
+
+def trace_phase(tracer, name):
+    """
+    Context manager timing a phase of the running measurement with the given tracer (None: no tracing).
+    """
+    return _NO_PHASE if tracer is None else tracer.phase(name)
+
+
+def traced(provider_attribute, bytes_sent=None):
+    """
+    Decorator of the measurement methods (plain or coroutine functions) of a handler with a tracer attribute:
+    when the tracer is set, the call is recorded as a MeasurementTrace.
+
+    Parameters
+    ----------
+    provider_attribute : string
+        The attribute of the handler holding the identifier of the service provider.
+
+    bytes_sent : callable, optional
+        A function returning the number of bytes sent so far to the other parties: the trace counts the bytes sent during the call.
+    """
+    def decorator(method):
+
+        def start(self):
+            trace, token = self.tracer._start(method.__name__, getattr(self, provider_attribute))
+            if trace is not None and bytes_sent is not None:
+                trace.counters["bytes"] = -bytes_sent()
+            return trace, token, time.perf_counter()
+
+        def finish(self, trace, token, start_time, error):
+            if bytes_sent is not None:
+                trace.counters["bytes"] += bytes_sent()
+            self.tracer._finish(trace, token, start_time, error)
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                if self.tracer is None:
+                    return await method(self, *args, **kwargs)
+                trace, token, start_time = start(self)
+                if trace is None:
+                    return await method(self, *args, **kwargs)
+                try:
+                    result = await method(self, *args, **kwargs)
+                except BaseException as error:
+                    finish(self, trace, token, start_time, error)
+                    raise
+                finish(self, trace, token, start_time, None)
+                return result
+        else:
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                if self.tracer is None:
+                    return method(self, *args, **kwargs)
+                trace, token, start_time = start(self)
+                if trace is None:
+                    return method(self, *args, **kwargs)
+                try:
+                    result = method(self, *args, **kwargs)
+                except BaseException as error:
+                    finish(self, trace, token, start_time, error)
+                    raise
+                finish(self, trace, token, start_time, None)
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,68 @@
+import base64
+import json
+
+import pytest
+
+from findhr.monitoring.envelope import seal_envelope
+from findhr.monitoring.monitoring import MultipartyDataHandlerCSV
+
+DONATIONS = [{"providerId": "P", "userId": f"u{i}", "gender": 2 * i - 5, "disabled": -i} for i in range(6)] + \
+            [{"providerId": "P", "userId": "u6", "gender": "abc"}]
+
+
+@pytest.fixture(scope="module")
+def private_key():
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def new_handler(tmp_path):
+    def new_handler(name):
+        local_filename = tmp_path / f"{name}.csv"
+        local_filename.touch()
+        return MultipartyDataHandlerCSV(str(local_filename))
+    return new_handler
+
+
+@pytest.fixture
+def envelope(private_key):
+    # a header and four chunks of two donations
+    return seal_envelope(DONATIONS, private_key.public_key(), chunk_size=2)
+
+
+def encrypt(donation, private_key):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    oaep = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    return base64.b64encode(private_key.public_key().encrypt(json.dumps(donation).encode("utf-8"), oaep))
+
+
+def flip_bit(line):
+    ciphertext = bytearray(base64.b64decode(line))
+    ciphertext[len(ciphertext) // 2] ^= 1
+    return base64.b64encode(bytes(ciphertext)).decode("ascii")
+
+
+def test_envelope_stores_as_many_payloads(new_handler, envelope, private_key):
+    enveloped, payloads = new_handler("enveloped"), new_handler("payloads")
+    errors = enveloped.store_encrypted_envelope("\n".join(envelope), private_key)
+    assert errors == payloads.store_encrypted_data_many([encrypt(donation, private_key) for donation in DONATIONS], private_key, workers=1)
+    assert errors[-1] == {"error": "Invalid secret value for attribute 'gender'"}
+    assert len(enveloped.local_data) == 12
+    assert list(enveloped.local_data.rows()) == list(payloads.local_data.rows())
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda lines: [lines[0], lines[2], lines[1], lines[3], lines[4]],    # reordered chunks
+    lambda lines: [lines[0], lines[1], lines[3], lines[4]],              # dropped chunk
+    lambda lines: lines[:4],                                             # dropped last chunk
+    lambda lines: lines[:4] + [lines[4][:len(lines[4]) // 2]],           # truncated chunk
+    lambda lines: [lines[0], flip_bit(lines[1])] + lines[2:],            # flipped ciphertext bit
+    lambda lines: lines[:-1] + [flip_bit(lines[-1])],
+])
+def test_tampered_envelope_stores_nothing(new_handler, envelope, private_key, tamper):
+    handler = new_handler("local")
+    result = handler.store_encrypted_envelope(tamper(envelope), private_key)
+    assert isinstance(result, dict) and "error" in result
+    assert len(handler.local_data) == 0
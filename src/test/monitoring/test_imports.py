@@ -0,0 +1,13 @@
+from findhr.monitoring.benchmark import HEAVY_MODULES, measure_import_time
+
+
+def test_monitoring_import_loads_no_heavy_module():
+    # mpyc, matplotlib, scipy, cryptography and pandas are only imported when they are used
+    _, loaded = measure_import_time("findhr.monitoring", repeats=1)
+    assert not loaded, f"importing findhr.monitoring loads {loaded} (of {HEAVY_MODULES})"
+
+
+def test_benchmark_import_loads_no_heavy_module():
+    # the mpyc runtime is only imported by the parties of the loopback benchmark
+    _, loaded = measure_import_time("findhr.monitoring.benchmark", repeats=1)
+    assert not loaded, f"importing findhr.monitoring.benchmark loads {loaded} (of {HEAVY_MODULES})"
@@ -0,0 +1,52 @@
+import base64
+import json
+
+import pytest
+
+from findhr.monitoring.monitoring import MultipartyDataHandlerCSV, ServiceProviderHandlerCSV
+
+INVALID_DONATIONS = [
+    ({"providerId": "P", "userId": "u1", "disabled": 1, "gender": 2**70}, "Secret value out of range for attribute 'gender'"),
+    ({"providerId": "P", "userId": "u1", "disabled": 1, "gender": "abc"}, "Invalid secret value for attribute 'gender'"),
+    ({"providerId": "P", "disabled": 1}, "Invalid data format"),
+]
+
+
+@pytest.fixture(scope="module")
+def private_key():
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def encrypt(donation, private_key):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    oaep = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    return base64.b64encode(private_key.public_key().encrypt(json.dumps(donation).encode("utf-8"), oaep))
+
+
+@pytest.fixture(params=[MultipartyDataHandlerCSV, ServiceProviderHandlerCSV])
+def handler(request, tmp_path):
+    local_filename = tmp_path / "local.csv"
+    local_filename.touch()
+    return request.param(str(local_filename))
+
+
+def test_store_encrypted_data(handler, private_key):
+    assert handler.store_encrypted_data(encrypt({"providerId": "P", "userId": "u1", "gender": -5}, private_key), private_key) is None
+    assert handler.local_data.get("P", "u1", "gender") == -5
+
+
+@pytest.mark.parametrize("donation, error", INVALID_DONATIONS)
+def test_invalid_donation_stores_nothing(handler, private_key, donation, error):
+    # the single and bulk entry points validate donations alike, and store none of the components of an invalid one
+    payload = encrypt(donation, private_key)
+    assert handler.store_encrypted_data(payload, private_key) == {"error": error}
+    assert handler.store_encrypted_data_many([payload], private_key, workers=1) == [{"error": error}]
+    assert len(handler.local_data) == 0
+
+
+def test_undecryptable_donation(handler, private_key):
+    result = handler.store_encrypted_data(b"not a payload", private_key)
+    assert result["error"].startswith("Decryption failed")
+    assert len(handler.local_data) == 0
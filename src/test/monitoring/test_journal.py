@@ -0,0 +1,87 @@
+import os
+import stat
+
+import pytest
+
+from findhr.monitoring.journal import ShareJournal
+from findhr.monitoring.share_store import ShareStore
+
+
+@pytest.fixture
+def journaled(tmp_path):
+    # a snapshot with one component, and a journal with two more (one of them overwriting it)
+    snapshot_filename = str(tmp_path / "local.csv")
+    store = ShareStore()
+    store.set("P", "u1", "gender", 1)
+    store.to_csv(snapshot_filename)
+
+    journal = ShareJournal(snapshot_filename)
+    for row in [("P", "u1", "gender", 5), ("P", "u2", "age", -3)]:
+        store.set(*row)
+        journal.append(*row)
+    journal.commit(sync=True)
+    return snapshot_filename, journal, store
+
+
+def recover(snapshot_filename):
+    store = ShareStore.load(snapshot_filename)
+    records = ShareJournal(snapshot_filename).replay(store)
+    return store, records
+
+
+def test_replay_stops_at_torn_record(journaled):
+    snapshot_filename, journal, store = journaled
+    journal.close()
+    with open(journal.segments()[-1], 'a') as f_out:
+        f_out.write("P,u3,gender,2,1234\nP,u4,gender,1,")
+
+    recovered, records = recover(snapshot_filename)
+    assert records == 2
+    assert sorted(recovered.rows()) == sorted(store.rows())
+
+
+def test_crash_between_replace_and_segment_removal(journaled, monkeypatch):
+    snapshot_filename, journal, store = journaled
+
+    def crash(segment):
+        raise OSError("crash")
+
+    monkeypatch.setattr(os, "remove", crash)
+    with pytest.raises(OSError):
+        journal.compact(store)
+    monkeypatch.undo()
+
+    # the new snapshot is in place, and replaying the leftover segments over it changes nothing
+    assert journal.segments()
+    recovered, records = recover(snapshot_filename)
+    assert records == 2
+    assert sorted(recovered.rows()) == sorted(store.rows())
+
+
+def test_compact_syncs_directory_before_removing_segments(journaled, monkeypatch):
+    snapshot_filename, journal, store = journaled
+    events = []
+    fsync, replace, remove = os.fsync, os.replace, os.remove
+
+    def traced_fsync(fd):
+        events.append("fsync directory" if stat.S_ISDIR(os.fstat(fd).st_mode) else "fsync file")
+        fsync(fd)
+
+    def traced_replace(source, destination):
+        events.append("replace" if destination == snapshot_filename else "replace temporary")
+        replace(source, destination)
+
+    def traced_remove(path):
+        events.append("remove")
+        remove(path)
+
+    monkeypatch.setattr(os, "fsync", traced_fsync)
+    monkeypatch.setattr(os, "replace", traced_replace)
+    monkeypatch.setattr(os, "remove", traced_remove)
+    journal.compact(store)
+
+    assert "remove" in events
+    replaced = events.index("replace")
+    assert "fsync directory" in events[replaced:events.index("remove")]
+    assert not journal.segments()
+    assert sorted(ShareStore.load(snapshot_filename).rows()) == sorted(store.rows())
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from findhr.monitoring import result_cache
+from findhr.monitoring.monitoring import MultipartyDataHandlerCSV, MultipartyFairnessMeasurement, ServiceProviderHandlerCSV
+from findhr.monitoring.result_cache import ResultCache
+
+N_USERS = 30
+
+
+@pytest.fixture
+def measurement(tmp_path):
+    # a measurement with a result cache over a csv handler, and a pool with the remote components
+    local_filename, remote_filename = tmp_path / "local.csv", tmp_path / "remote.csv"
+    local_filename.touch()
+    remote_filename.touch()
+    local, remote = MultipartyDataHandlerCSV(str(local_filename)), ServiceProviderHandlerCSV(str(remote_filename))
+    user_ids = [f"u{i}" for i in range(N_USERS)]
+    values = np.random.default_rng(0).choice(["male", "female", "non-binary"], N_USERS)
+    remote_components = local.generate_and_store_many("P", user_ids, "gender", values, remote)
+    local.save_session_data()
+    measurement = MultipartyFairnessMeasurement("P", local, result_cache=ResultCache())
+    return measurement, list(zip(user_ids, remote_components.tolist()))
+
+
+def test_put_rejects_results_over_users_invalidated_during_computation():
+    cache = ResultCache()
+    generation = cache.generation
+    cache.invalidate_users("P", ["u3"])
+    cache.invalidate_users("Q", ["u1"])
+    cache.put("other users", 1, "P", ["u1", "u2"], generation)
+    cache.put("invalidated user", 2, "P", ["u2", "u3"], generation)
+    assert cache.get("other users") == (True, 1)
+    assert cache.get("invalidated user") == (False, None)
+
+    # a computation started after the invalidation is cached
+    cache.put("invalidated user", 2, "P", ["u2", "u3"], cache.generation)
+    assert cache.get("invalidated user") == (True, 2)
+
+
+def test_put_rejects_results_older_than_the_invalidation_history(monkeypatch):
+    monkeypatch.setattr(result_cache, "INVALIDATION_HISTORY", 2)
+    cache = ResultCache()
+    generation = cache.generation
+    cache.invalidate_users("P", ["u1", "u2", "u3"])
+    cache.put("key", 1, "P", ["u4"], generation)
+    assert cache.get("key") == (False, None)
+
+
+def test_put_rejects_results_computed_across_clear():
+    cache = ResultCache()
+    generation = cache.generation
+    cache.clear()
+    cache.put("key", 1, "P", ["u1"], generation)
+    assert cache.get("key") == (False, None)
+
+
+def test_returned_results_are_copies(measurement):
+    measurement, pool = measurement
+    expected = measurement.measure_topk_curve(pool, "gender", "female", [1, 5, 10])
+    first = measurement.measure_topk_curve(pool, "gender", "female", [1, 5, 10])
+    first["skew"][:] = 99
+    second = measurement.measure_topk_curve(pool, "gender", "female", [1, 5, 10])
+    assert measurement.result_cache.hits == 2
+    np.testing.assert_array_equal(second["skew"], expected["skew"])
+
+    expected = measurement.measure_report(pool, [("gender", "female")], metrics=("pool_diversity",))
+    measurement.measure_report(pool, [("gender", "female")], metrics=("pool_diversity",))[(("gender",), ("female",))]["pool_diversity"] = 99
+    assert measurement.measure_report(pool, [("gender", "female")], metrics=("pool_diversity",)) == expected
+
+
+def test_reloading_the_store_clears_the_cache(measurement):
+    measurement, pool = measurement
+    measurement.measure_pool_diversity(pool, "gender", "female")
+    assert len(measurement.result_cache) == 1
+    handler = measurement.data_handler
+    handler.load_data(handler.local_filename)
+    assert len(measurement.result_cache) == 0
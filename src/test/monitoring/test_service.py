@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from findhr.monitoring.monitoring import (MultipartyDataHandlerCSV, MultipartyDataHandlerSharded, MultipartyDataHandlerSQLite,
+                                          MultipartyFairnessMeasurement, ServiceProviderHandlerCSV)
+from findhr.monitoring.service import FairnessMonitoringService
+from findhr.monitoring.share_store import ShareStore
+
+N_USERS = 40
+
+
+@pytest.fixture(scope="module")
+def donations(tmp_path_factory):
+    # the local components of a csv file, and a pool with the remote components
+    directory = tmp_path_factory.mktemp("service")
+    local_filename, remote_filename = directory / "local.csv", directory / "remote.csv"
+    local_filename.touch()
+    remote_filename.touch()
+    local, remote = MultipartyDataHandlerCSV(str(local_filename)), ServiceProviderHandlerCSV(str(remote_filename))
+
+    user_ids = [f"u{i}" for i in range(N_USERS)]
+    values = np.random.default_rng(0).choice(["male", "female", "non-binary"], N_USERS)
+    remote_components = local.generate_and_store_many("P", user_ids, "gender", values, remote)
+    local.save_session_data()
+    return str(local_filename), list(zip(user_ids, remote_components.tolist())), directory
+
+
+def open_handler(store_type, local_filename, directory):
+    if store_type == "csv":
+        return MultipartyDataHandlerCSV(local_filename)
+    if store_type == "sharded":
+        return MultipartyDataHandlerSharded(local_filename, 2)
+    handler = MultipartyDataHandlerSQLite(str(directory / f"local-{store_type}.db"))
+    handler.local_data.set_rows(ShareStore.load(local_filename).rows())
+    handler.save_session_data()
+    return handler
+
+
+@pytest.mark.parametrize("store_type", ["csv", "sqlite", "sharded"])
+def test_process_workers(donations, store_type):
+    local_filename, pool, directory = donations
+    handler = open_handler(store_type, local_filename, directory)
+    measurement = MultipartyFairnessMeasurement("P", handler)
+    expected = measurement.measure_pool_diversity(pool, "gender", "female")
+
+    async def serve():
+        async with FairnessMonitoringService(measurement, process_workers=1, offload_size=1) as service:
+            # a sharded store measures in its shards, the other stores in the worker process of the service
+            assert (service._process_pool is None) == (store_type == "sharded")
+            return await asyncio.wait_for(service.measure_pool_diversity(pool, "gender", "female"), timeout=60)
+
+    try:
+        assert asyncio.run(serve()) == expected
+    finally:
+        if store_type == "sharded":
+            handler.local_data.close()
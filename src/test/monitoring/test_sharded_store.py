@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from findhr.monitoring.share_store import ShareStore
+from findhr.monitoring.sharded_store import ShardedShareStore
+
+N_USERS = 500
+ATTRIBUTES = ("gender", "age")
+GROUPS = [(("gender",), (1,)), (("age",), (2,)), (("gender", "age"), (0, 1))]
+
+
+@pytest.fixture(scope="module")
+def components():
+    # attribute values, local and remote components of two providers, with some components missing locally
+    rng = np.random.default_rng(0)
+    user_ids = np.array([f"user-{i}" for i in range(N_USERS)])
+    values = {attribute_name: rng.integers(0, 3, N_USERS) for attribute_name in ATTRIBUTES}
+    secrets = {attribute_name: rng.integers(-2**40, 2**40, N_USERS) for attribute_name in ATTRIBUTES}
+    stored = {attribute_name: rng.random(N_USERS) > 0.1 for attribute_name in ATTRIBUTES}
+
+    store = ShareStore()
+    for provider_id in ("provider-a", "provider-b"):
+        for attribute_name in ATTRIBUTES:
+            selected = stored[attribute_name]
+            store.set_many(provider_id, user_ids[selected], attribute_name, (values[attribute_name] + secrets[attribute_name])[selected])
+    remote_secrets = {attribute_name: values[attribute_name] - secrets[attribute_name] for attribute_name in ATTRIBUTES}
+    return store, user_ids, values, stored, remote_secrets
+
+
+@pytest.fixture(scope="module", params=[(2, ".snapshot"), (3, ".csv")])
+def sharded(request, components, tmp_path_factory):
+    n_shards, suffix = request.param
+    filename = str(tmp_path_factory.mktemp("shards") / f"local{suffix}")
+    components[0].save(filename)
+    store = ShardedShareStore(n_shards, filename)
+    yield store
+    store.close()
+
+
+def test_gather_many(components, sharded):
+    store, user_ids, _, _, _ = components
+    pool = np.concatenate([user_ids[::-3], ["unknown-user"]])
+    for provider_id in ("provider-a", "provider-b", "unknown-provider"):
+        expected = store.gather_many(provider_id, pool, ATTRIBUTES)
+        result = sharded.gather_many(provider_id, pool, ATTRIBUTES)
+        for attribute_name in ATTRIBUTES:
+            np.testing.assert_array_equal(result[attribute_name][0], expected[attribute_name][0])
+            np.testing.assert_array_equal(result[attribute_name][1], expected[attribute_name][1])
+
+
+def test_group_sums(components, sharded):
+    _, user_ids, values, stored, remote_secrets = components
+    pool = np.arange(0, N_USERS, 2)
+    weights = 1 / np.log2(np.arange(len(pool)) + 2)
+    counts, sums, covered = sharded.group_sums("provider-a", user_ids[pool], {attribute_name: secrets[pool] for attribute_name, secrets in remote_secrets.items()},
+                                               GROUPS, weights)
+
+    # users with a missing component are members of no group
+    valid = np.logical_and.reduce([stored[attribute_name][pool] for attribute_name in ATTRIBUTES])
+    assert covered == np.count_nonzero(valid)
+    for group, (attribute_names, attribute_codes) in enumerate(GROUPS):
+        members = valid.copy()
+        for attribute_name, code in zip(attribute_names, attribute_codes):
+            members &= values[attribute_name][pool] == code
+        assert counts[group] == np.count_nonzero(members)
+        assert sums[group] == pytest.approx(weights[members].sum())
+
+
+def test_count_users(components, sharded):
+    store = components[0]
+    for provider_id in ("provider-a", "provider-b", "unknown-provider"):
+        assert sharded.count_users(provider_id) == store.count_users(provider_id)
+    assert len(sharded) == len(store)
+
+
+@pytest.mark.parametrize("suffix", [".snapshot", ".csv"])
+def test_save_load(components, sharded, tmp_path, suffix):
+    store = components[0]
+    filename = str(tmp_path / f"saved{suffix}")
+    sharded.save(filename)
+    assert sorted(ShareStore.load(filename).rows()) == sorted(store.rows())
@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+from findhr.monitoring.monitoring import MultipartyDataCollection, MultipartyFairnessMeasurement
+from findhr.monitoring.share_store import ShareStore
+from findhr.monitoring.tracing import Tracer
+
+POOL = [("u1", 1), ("u2", 3)]
+
+
+def failing_exporter(trace):
+    raise RuntimeError("log sink unavailable")
+
+
+@pytest.fixture
+def measurement():
+    # local components of 2 * gender - remote component: u1 is female, u2 is male
+    handler = MultipartyDataCollection()
+    handler.local_data = ShareStore()
+    handler.local_data.set_many("P", ["u1", "u2"], "gender", [1, -3])
+    return MultipartyFairnessMeasurement("P", handler, tracer=Tracer(exporters=[failing_exporter]))
+
+
+def test_failing_exporter_keeps_the_result(measurement, caplog):
+    with caplog.at_level(logging.ERROR, logger="findhr.monitoring.tracing"):
+        assert measurement.measure_pool_diversity(POOL, "gender", "female") == 0.5
+    assert "log sink unavailable" in caplog.text
+    assert len(measurement.tracer.traces) == 1
+
+
+def test_failing_exporter_keeps_the_measurement_error(measurement, caplog):
+    with caplog.at_level(logging.ERROR, logger="findhr.monitoring.tracing"):
+        with pytest.raises(ValueError, match="Unsupported top-k fairness method"):
+            measurement.measure_topk_fairness(POOL, "gender", "female", 1, method="unknown")
+    assert "log sink unavailable" in caplog.text
+    assert measurement.tracer.traces[-1].error == "ValueError"